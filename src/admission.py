@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Priority Admission Control
+Votes wait in one bounded queue per severity class and a single worker
+drains them by smooth weighted round-robin, so a CRITICAL exploit vote is
+not stuck behind a flood of INFO scan votes. When the queues pass
+ADMISSION_OVERLOAD votes the coordinator is overloaded: LOW and INFO votes
+are shed on arrival and every node is held to its token-bucket rate. A shed
+vote gets 429 with the shed severity and a retry delay, and ShedBackoff lets
+a detector hold back votes of that severity (and below) until then.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+from suricata_detector import SEVERITY_MAP
+from send_queue import SEVERITIES
+
+ADMISSION = os.environ.get("ADMISSION", "on")                      # "off" processes votes inline
+ADMISSION_QUEUE = int(os.environ.get("ADMISSION_QUEUE", 2000))      # Votes per severity queue
+ADMISSION_OVERLOAD = int(os.environ.get("ADMISSION_OVERLOAD", 1000))  # Queued votes that mean overload
+NODE_RATE = float(os.environ.get("NODE_RATE", 200))               # Votes/s per node while overloaded (0 = off)
+NODE_BURST = float(os.environ.get("NODE_BURST", 2 * NODE_RATE))
+WEIGHTS = {"CRITICAL": 16, "HIGH": 8, "MEDIUM": 4, "LOW": 2, "INFO": 1}
+SHED_FIRST = ("LOW", "INFO")  # Shed on arrival while overloaded
+RETRY_MIN, RETRY_MAX = 0.1, 5.0  # Seconds a shed detector is asked to wait
+
+
+def severity_of(vote):
+    """Severity class of a vote from its alert priority (MEDIUM when unknown)"""
+    alert = vote.get('alert')
+    priority = alert.get('priority') if isinstance(alert, dict) else None
+    try:
+        return SEVERITY_MAP.get(int(priority), "MEDIUM")
+    except (TypeError, ValueError, OverflowError):
+        return "MEDIUM"
+
+
+class TokenBucket:
+    """Per-node vote allowance"""
+
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst, now):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate, burst, now):
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class AdmissionQueue:
+    """Bounded per-severity queues, shedding, and the worker that drains them"""
+
+    def __init__(self, handler, capacity=ADMISSION_QUEUE, overload=ADMISSION_OVERLOAD,
+                 node_rate=NODE_RATE, node_burst=NODE_BURST, weights=WEIGHTS):
+        self.handler = handler        # Called with each admitted vote on the worker thread
+        self.capacity = capacity
+        self.overload = overload
+        self.node_rate = node_rate
+        self.node_burst = node_burst
+        self.weights = weights
+        self.queues = {s: deque() for s in SEVERITIES}
+        self.credit = {s: 0 for s in SEVERITIES}  # Smooth weighted round-robin state
+        self.buckets = {}             # node -> TokenBucket
+        self.depth = 0
+        self.service_time = 0.001     # Seconds per vote in the handler, smoothed; sizes retry_after
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.stats = {'admitted': 0, 'processed': 0, 'failed': 0, 'overloaded': 0,
+                      'shed': {s: 0 for s in SEVERITIES},
+                      'shed_reason': {'queue_full': 0, 'overload': 0, 'rate_limit': 0},
+                      'wait_ms': {s: 0.0 for s in SEVERITIES}}  # Smoothed queue wait per class
+
+    def offer(self, vote, node, severity, now=None):
+        """Queue a vote; returns None if admitted, else (reason, retry_after seconds)"""
+        now = time.time() if now is None else now
+        with self.lock:
+            reason = None
+            overloaded = self.depth >= self.overload
+            # Buckets drain even while not overloaded, so a flooding node is limited at once
+            within_rate = self.node_rate <= 0 or self.bucket(node, now).take(self.node_rate, self.node_burst, now)
+            if len(self.queues[severity]) >= self.capacity:
+                reason = 'queue_full'
+            elif overloaded and severity in SHED_FIRST:
+                reason = 'overload'
+            elif overloaded and not within_rate:
+                reason = 'rate_limit'
+            self.stats['overloaded'] += overloaded
+            if reason:
+                self.stats['shed'][severity] += 1
+                self.stats['shed_reason'][reason] += 1
+                return reason, self.retry_after()
+            self.queues[severity].append((now, vote))
+            self.depth += 1
+            self.stats['admitted'] += 1
+            self.ready.notify()
+        return None
+
+    def bucket(self, node, now):
+        bucket = self.buckets.get(node)
+        if bucket is None:
+            bucket = self.buckets[node] = TokenBucket(self.node_burst, now)
+        return bucket
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained (lock held)"""
+        return round(min(RETRY_MAX, max(RETRY_MIN, self.depth * self.service_time)), 2)
+
+    def take(self):
+        """Next vote by smooth weighted round-robin over the non-empty queues (lock held)"""
+        total, best = 0, None
+        for severity in SEVERITIES:
+            if self.queues[severity]:
+                self.credit[severity] += self.weights[severity]
+                total += self.weights[severity]
+                if best is None or self.credit[severity] > self.credit[best]:
+                    best = severity
+        self.credit[best] -= total
+        self.depth -= 1
+        return best, self.queues[best].popleft()
+
+    def run(self):
+        """Worker thread: hand votes to the handler in scheduling order"""
+        while True:
+            with self.lock:
+                while not self.depth:
+                    self.ready.wait()
+                severity, (queued, vote) = self.take()
+            now = time.time()
+            wait = self.stats['wait_ms']
+            wait[severity] += ((now - queued) * 1000 - wait[severity]) * 0.05
+            try:
+                self.handler(vote)
+            except Exception as e:
+                # One bad vote must not take the only worker down with it
+                self.stats['failed'] += 1
+                print(f"[ERROR] Admission handler failed on a vote from {vote.get('node')!r}: {e!r}")
+            self.service_time += (time.time() - now - self.service_time) * 0.05
+            self.stats['processed'] += 1
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, depth={s: len(q) for s, q in self.queues.items()}, capacity=self.capacity,
+                        overload=self.overload, overloaded_now=self.depth >= self.overload,
+                        wait_ms={s: round(w, 1) for s, w in self.stats['wait_ms'].items()},
+                        shed=dict(self.stats['shed']), shed_reason=dict(self.stats['shed_reason']))
+
+
+class ShedBackoff:
+    """Detector side: after a 429, hold back votes at or below the shed severity until retry_after"""
+
+    def __init__(self):
+        self.until = 0.0
+        self.rank = len(SEVERITIES)  # Votes with rank >= this are held back
+        self.held = 0
+        self.lock = threading.Lock()
+
+    def allow(self, severity, now=None):
+        now = time.time() if now is None else now
+        with self.lock:
+            if now < self.until and SEVERITIES.index(severity) >= self.rank:
+                self.held += 1
+                return False
+            return True
+
+    def record(self, response, now=None):
+        """Note a coordinator response; returns True if the vote was shed"""
+        if response.status_code != 429:
+            return False
+        now = time.time() if now is None else now
+        try:
+            reply = response.json()
+            rank = SEVERITIES.index(reply['severity'])
+            retry = float(reply['retry_after'])
+        except (ValueError, KeyError, TypeError):
+            rank, retry = 0, RETRY_MIN
+        with self.lock:
+            self.rank = min(self.rank, rank) if now < self.until else rank
+            self.until = max(self.until, now + min(retry, RETRY_MAX))
+        return True
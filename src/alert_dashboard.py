@@ -5,17 +5,42 @@ Beautiful, organized visualization of security alerts
 Author: Research Project - MSU
 """
 
-import json
+import io
+import re
 import time
+import shutil
+import threading
+import contextlib
+import unicodedata
 from datetime import datetime
-from collections import defaultdict, Counter
+from collections import defaultdict
 import os
 import sys
 
+from suricata_detector import SuricataAlertParser, EventTally
+from heavy_hitters import make_top_counter
+from rollups import RollupStore, RESOLUTIONS
+
 # Suricata paths
 SURICATA_FAST_LOG = "/usr/local/var/log/suricata/fast.log"
 SURICATA_EVE_JSON = "/usr/local/var/log/suricata/eve.json"
 
+# Incremental loading
+TAIL_LINES = 1000                 # Lines read from the end of eve.json on first load
+TAIL_BLOCK = 64 * 1024            # Reverse-seek block size for the initial tail
+MAX_READ_BYTES = 16 * 1024 * 1024 # Cap per refresh so a burst can't stall rendering
+TIMELINE_LIMIT = 1000             # Timeline entries kept for the recent-alerts view
+RATE_MINUTES = 10                 # Minutes shown in the alert-rate section (from rollups)
+
+# Top-N tables use a Space-Saving summary so a spoofed-source flood can't grow
+# them without bound; counts are within total/capacity. 0 = exact counting.
+TOP_N_CAPACITY = int(os.environ.get("DASHBOARD_TOPN_CAPACITY", 1000))
+
+# Rendering is decoupled from ingestion: new alerts are read every
+# INGEST_INTERVAL seconds, frames are drawn at most MAX_FPS times per second
+INGEST_INTERVAL = 1.0
+MAX_FPS = 2
+
 # Color codes for terminal output
 class Colors:
     HEADER = '\033[95m'
@@ -49,6 +74,149 @@ CATEGORY_EMOJI = {
 }
 
 
+ESCAPE_RE = re.compile(r'(\033\[[0-9;]*[A-Za-z])')
+CHAR_WIDTHS = {}  # Non-ASCII character -> terminal cells, filled as characters are seen
+UNSEEN_RE = re.compile(r'[^\x00-\x7f]')  # Non-ASCII characters not in CHAR_WIDTHS yet
+SPECIAL_RE = re.compile(r'(?!)')        # Seen characters that do not take exactly one cell
+
+
+def char_width(char):
+    """Terminal cells a character takes"""
+    width = CHAR_WIDTHS.get(char)
+    if width is None:
+        width = 0 if unicodedata.combining(char) else 2 if unicodedata.east_asian_width(char) in 'WF' else 1
+        CHAR_WIDTHS[char] = width
+    return width
+
+
+def learn_widths(text):
+    """Add the widths of text's unseen characters and rebuild the patterns over them"""
+    global UNSEEN_RE, SPECIAL_RE
+    for char in set(UNSEEN_RE.findall(text)):
+        char_width(char)
+    seen = sorted(CHAR_WIDTHS)
+    UNSEEN_RE = re.compile('[^\\x00-\\x7f' + ''.join(re.escape(c) for c in seen) + ']')
+    special = ''.join(re.escape(c) for c in seen if CHAR_WIDTHS[c] != 1)
+    SPECIAL_RE = re.compile(f'[{special}]' if special else r'(?!)')
+
+
+def text_width(text):
+    """Terminal cells of text without escape codes"""
+    if text.isascii():
+        return len(text)
+    if UNSEEN_RE.search(text):
+        learn_widths(text)
+    width = len(text)
+    for char in SPECIAL_RE.findall(text):  # Box drawing and bars take one cell, like ASCII
+        width += CHAR_WIDTHS[char] - 1
+    return width
+
+
+def cut_at(text, cells):
+    """Length of the longest prefix of text that fits in `cells` terminal cells (widths learned)"""
+    end = 0
+    for match in SPECIAL_RE.finditer(text):
+        run = match.start() - end  # One-cell characters before this one
+        if run > cells:
+            return end + cells
+        cells -= run + CHAR_WIDTHS[match.group()]
+        if cells < 0:
+            return match.start()
+        end = match.end()
+    return min(len(text), end + cells)
+
+
+def fit_width(line, columns):
+    """Cut a line to `columns` terminal cells; escape codes take none, wide characters two"""
+    if len(line) <= columns and line.isascii() or 2 * len(line) <= columns:
+        return line  # No character takes more than two cells, escape codes take none
+    plain = ESCAPE_RE.sub('', line) if '\033' in line else line
+    # A character never takes more cells than its UTF-8 bytes, so most lines fit without counting widths
+    if len(plain.encode('utf-8', 'surrogatepass')) <= columns:
+        return line
+    if plain is line:
+        # No escape codes: the longest prefix that fits is the whole line or the cut
+        if UNSEEN_RE.search(line):
+            learn_widths(line)
+        end = cut_at(line, columns)
+        return line if end == len(line) else line[:end] + Colors.ENDC
+    if text_width(plain) <= columns:
+        return line
+    parts, cells = [], 0
+    # Split keeps the escape codes at odd indices
+    for i, piece in enumerate(ESCAPE_RE.split(line)):
+        if i % 2:
+            parts.append(piece)
+            continue
+        width = text_width(piece)
+        if cells + width <= columns:
+            cells += width
+            parts.append(piece)
+            continue
+        parts.append(piece[:cut_at(piece, columns - cells)])
+        parts.append(Colors.ENDC)  # The cut may fall inside a coloured span
+        return ''.join(parts)
+    return line
+
+
+class TerminalRenderer:
+    """Keeps the last frame and redraws only the lines that changed"""
+    
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self.frame = None        # Lines currently on screen
+        self.raw = None          # The same lines before they were cut to the terminal width
+        self.size = None         # Terminal size the frame was drawn for
+        self.fitted = {}         # Line -> line cut to the terminal width (most lines repeat across frames)
+        self.bytes_written = 0
+        self.frames = 0
+    
+    def draw(self, lines):
+        """Draw a frame using cursor positioning for changed lines only"""
+        size = shutil.get_terminal_size()
+        resized = size != self.size
+        # Rows past the screen can't be addressed, and a line that wraps would shift every row below it
+        if resized or len(self.fitted) > 4096:
+            self.fitted = {}
+        lines = lines[:size.lines - 1]
+        
+        if self.frame is None or resized:
+            # First frame or resize: clear once and paint everything
+            frame = [self.fit(line, size.columns) for line in lines]
+            parts = ['\033[H\033[2J', '\033[K\n'.join(frame)]
+        else:
+            # A line equal to the one drawn from last time is already fitted and on screen
+            raw, drawn = self.raw, self.frame
+            frame, parts = [], []
+            for row, line in enumerate(lines):
+                if row < len(raw) and raw[row] == line:
+                    frame.append(drawn[row])
+                    continue
+                cut = self.fit(line, size.columns)
+                frame.append(cut)
+                if row >= len(drawn) or drawn[row] != cut:
+                    parts.append(f'\033[{row + 1};1H{cut}\033[K')
+            if len(frame) < len(drawn):
+                parts.append(f'\033[{len(frame) + 1};1H\033[J')  # Erase leftover rows
+        
+        data = ''.join(parts)
+        if data:
+            self.out.write(data)
+            self.out.flush()
+        self.bytes_written += len(data.encode('utf-8'))
+        self.frames += 1
+        self.raw = lines
+        self.frame = frame
+        self.size = size
+    
+    def fit(self, line, columns):
+        """Line cut to the terminal width (most lines repeat across frames)"""
+        cut = self.fitted.get(line)
+        if cut is None:
+            cut = self.fitted[line] = fit_width(line, columns)
+        return cut
+
+
 class AlertDashboard:
     """Real-time alert dashboard with presentation-quality formatting"""
     
@@ -59,16 +227,22 @@ class AlertDashboard:
             'by_severity': defaultdict(int),
             'by_category': defaultdict(int),
             'by_protocol': defaultdict(int),
-            'top_signatures': Counter(),
-            'top_sources': Counter(),
-            'top_destinations': Counter(),
+            'top_signatures': make_top_counter(TOP_N_CAPACITY),
+            'top_sources': make_top_counter(TOP_N_CAPACITY),
+            'top_destinations': make_top_counter(TOP_N_CAPACITY),
             'timeline': []
         }
+        # Only minutes are shown, so alerts are counted per minute; ingest and render share main()'s lock
+        self.rollups = RollupStore({name: RESOLUTIONS[name] for name in ('minute', 'hour')}, threadsafe=False)
+        self.tally = EventTally(self.rollups, threadsafe=False)
+        self.rate_rows = {}  # (minute, count, category, bar length) -> alert-rate row; older minutes repeat
         self.start_time = time.time()
+        self.renderer = TerminalRenderer()
     
     def clear_screen(self):
-        """Clear terminal screen"""
-        os.system('clear' if os.name == 'posix' else 'cls')
+        """Clear terminal screen (escape sequence, no shell process)"""
+        sys.stdout.write('\033[H\033[2J')
+        sys.stdout.flush()
     
     def print_header(self):
         """Print dashboard header"""
@@ -130,6 +304,37 @@ class AlertDashboard:
         
         print()
     
+    def print_alert_rate(self):
+        """Print alerts per minute with the leading category, read from the rollups"""
+        print(f"{Colors.BOLD}{Colors.OKGREEN}{f'ALERT RATE (Last {RATE_MINUTES} minutes)':^100}{Colors.ENDC}")
+        print(f"{Colors.OKGREEN}{'─'*100}{Colors.ENDC}\n")
+        
+        self.tally.flush()
+        end = self.rollups.latest('minute')
+        if end is None:
+            print()
+            return
+        start = end - (RATE_MINUTES - 1) * 60
+        # Every alert has a category, so the category counts also give each minute's total
+        minutes = [(minute, sum(by_category.values()), by_category)
+                   for minute, by_category in self.rollups.query('minute', start, end, by='category')]
+        peak = max(count for _, count, _ in minutes) or 1
+        
+        rows = []
+        for minute, count, by_category in minutes:
+            top = max(by_category, key=by_category.get) if by_category else ""
+            key = (minute, count, top, int(count / peak * 50))
+            row = self.rate_rows.get(key)
+            if row is None:
+                if len(self.rate_rows) >= 1024:
+                    self.rate_rows.clear()
+                emoji = CATEGORY_EMOJI.get(top, "❓") if top else " "
+                row = self.rate_rows[key] = (f"{time.strftime('%H:%M', time.localtime(minute)):<8} │ "
+                                             f"{count:>6,} alerts │ {emoji} {top:<10} │ {'█' * key[3]}")
+            rows.append(row)
+        print('\n'.join(rows))
+        print()
+    
     def print_top_signatures(self):
         """Print most frequent attack signatures"""
         print(f"{Colors.BOLD}{Colors.OKCYAN}{'TOP 10 ATTACK SIGNATURES':^100}{Colors.ENDC}")
@@ -142,19 +347,24 @@ class AlertDashboard:
         
         print()
     
+    def approx_note(self, table):
+        """Error note for sketch-backed top-N tables (empty until the sketch has evicted a key)"""
+        bound = self.stats[table].error_bound()
+        return f"(counts may be high by up to {bound:,.0f})" if bound > 0 else ""
+    
     def print_network_stats(self):
         """Print network-related statistics"""
         print(f"{Colors.BOLD}{Colors.OKGREEN}{'NETWORK STATISTICS':^100}{Colors.ENDC}")
         print(f"{Colors.OKGREEN}{'─'*100}{Colors.ENDC}\n")
         
         # Top source IPs
-        print(f"{'Top Source IPs (Attackers):':<50}")
+        print(f"{'Top Source IPs (Attackers):':<50}{self.approx_note('top_sources')}")
         for i, (ip, count) in enumerate(self.stats['top_sources'].most_common(5), 1):
             print(f"  {i}. {ip:<20} → {count:>5,} alerts")
         print()
         
         # Top destination IPs
-        print(f"{'Top Destination IPs (Targets):':<50}")
+        print(f"{'Top Destination IPs (Targets):':<50}{self.approx_note('top_destinations')}")
         for i, (ip, count) in enumerate(self.stats['top_destinations'].most_common(5), 1):
             print(f"  {i}. {ip:<20} → {count:>5,} alerts")
         print()
@@ -196,12 +406,16 @@ class AlertDashboard:
         self.stats['by_severity'][alert['severity']] += 1
         self.stats['by_category'][alert['category']] += 1
         self.stats['by_protocol'][alert['protocol']] += 1
-        self.stats['top_signatures'][alert['signature']] += 1
-        self.stats['top_sources'][alert['src_ip']] += 1
-        self.stats['top_destinations'][alert['dst_ip']] += 1
+        self.stats['top_signatures'].add(alert['signature'])
+        self.stats['top_sources'].add(alert['src_ip'])
+        self.stats['top_destinations'].add(alert['dst_ip'])
+        self.tally.add(alert)
         
-        # Add to timeline
-        self.stats['timeline'].append({
+        # Add to timeline (trimmed in bulk so appends stay O(1) amortized)
+        timeline = self.stats['timeline']
+        if len(timeline) >= 2 * TIMELINE_LIMIT:
+            del timeline[:-TIMELINE_LIMIT]
+        timeline.append({
             'timestamp': alert['timestamp'],
             'severity': alert['severity'],
             'category': alert['category'],
@@ -212,9 +426,8 @@ class AlertDashboard:
             'dst_port': alert['dst_port']
         })
     
-    def render(self):
-        """Render the complete dashboard"""
-        self.clear_screen()
+    def print_dashboard(self):
+        """Print every dashboard section"""
         self.print_header()
         
         if self.stats['total'] == 0:
@@ -227,85 +440,146 @@ class AlertDashboard:
         self.print_summary_stats()
         self.print_severity_breakdown()
         self.print_category_breakdown()
+        self.print_alert_rate()
         self.print_top_signatures()
         self.print_network_stats()
         self.print_recent_timeline()
         
         print(f"{Colors.BOLD}{Colors.HEADER}{'='*100}{Colors.ENDC}\n")
+    
+    def frame_lines(self):
+        """Capture the dashboard as a list of screen lines"""
+        buf = io.StringIO()
+        with contextlib.redirect_stdout(buf):
+            self.print_dashboard()
+        return buf.getvalue().split('\n')
+    
+    def render(self):
+        """Render the complete dashboard (only changed lines are rewritten)"""
+        self.renderer.draw(self.frame_lines())
 
 
-def load_alerts_from_logs():
-    """Load and parse alerts from Suricata logs"""
-    # This is a simplified version - integrate with your actual alert parser
-    # For demo purposes, this simulates some sample data
+class EveTailer:
+    """Reads only newly appended eve.json alerts, following log rotation"""
+    
+    def __init__(self, filepath, initial_lines=TAIL_LINES):
+        self.filepath = filepath
+        self.initial_lines = initial_lines
+        self.offset = None   # Byte offset of the next unread byte
+        self.inode = None
+        self.partial = b''   # Trailing bytes of a line Suricata hasn't finished writing
+    
+    def tail_offset(self, f, size):
+        """Offset where the last `initial_lines` lines start (reverse seek)"""
+        pos = size
+        newlines = 0
+        while pos > 0:
+            step = min(TAIL_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            newlines += block.count(b'\n')
+            # One extra newline: the last line normally ends with one
+            if newlines > self.initial_lines:
+                excess = newlines - self.initial_lines - 1
+                idx = -1
+                for _ in range(excess + 1):
+                    idx = block.index(b'\n', idx + 1)
+                return pos + idx + 1
+        return 0
     
+    def read_new_lines(self):
+        """Return complete lines appended since the previous call"""
+        try:
+            st = os.stat(self.filepath)
+        except OSError:
+            return []
+        
+        with open(self.filepath, 'rb') as f:
+            if self.offset is None:
+                self.offset = self.tail_offset(f, st.st_size)
+            elif st.st_ino != self.inode or st.st_size < self.offset:
+                # Rotated or truncated: start the new file from the beginning
+                self.offset = 0
+                self.partial = b''
+            self.inode = st.st_ino
+            
+            f.seek(self.offset)
+            data = f.read(MAX_READ_BYTES)
+        
+        self.offset += len(data)
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+        return lines
+
+
+def parse_dashboard_alert(line):
+    """Decode one eve.json line into a dashboard alert (None for non-alerts)"""
+    # Skip flow/stats/dns records without paying for json.loads
+    if b'"alert"' not in line:
+        return None
+    alert = SuricataAlertParser.parse_eve_json(line)
+    if alert:
+        alert['category'] = SuricataAlertParser.categorize_attack(
+            alert['signature'], alert['classification'])
+    return alert
+
+
+def load_alerts_from_logs(tailer):
+    """Load alerts appended to eve.json since the last refresh"""
     alerts = []
     
-    # Try to read from eve.json
     try:
-        if os.path.exists(SURICATA_EVE_JSON):
-            with open(SURICATA_EVE_JSON, 'r') as f:
-                # Read last 1000 lines
-                lines = f.readlines()[-1000:]
-                
-                for line in lines:
-                    try:
-                        data = json.loads(line)
-                        if data.get('event_type') == 'alert':
-                            alert_data = data.get('alert', {})
-                            alerts.append({
-                                'timestamp': data.get('timestamp', ''),
-                                'severity': data.get('alert', {}).get('severity', 3),
-                                'category': data.get('alert', {}).get('category', 'OTHER'),
-                                'signature': alert_data.get('signature', 'Unknown'),
-                                'protocol': data.get('proto', 'N/A'),
-                                'src_ip': data.get('src_ip', '0.0.0.0'),
-                                'src_port': data.get('src_port', 0),
-                                'dst_ip': data.get('dest_ip', '0.0.0.0'),
-                                'dst_port': data.get('dest_port', 0)
-                            })
-                    except json.JSONDecodeError:
-                        continue
+        for line in tailer.read_new_lines():
+            alert = parse_dashboard_alert(line)
+            if alert:
+                alerts.append(alert)
     except Exception as e:
         print(f"Error reading logs: {e}")
     
     return alerts
 
 
+def ingest_alerts(dashboard, tailer, lock, stop):
+    """Background loop feeding new alerts into the dashboard statistics"""
+    while not stop.is_set():
+        # Statistics are updated incrementally with only the new alerts,
+        # so refresh cost tracks alert rate rather than file size
+        alerts = load_alerts_from_logs(tailer)
+        if alerts:
+            with lock:
+                for alert in alerts:
+                    dashboard.update_stats(alert)
+        stop.wait(INGEST_INTERVAL)
+
+
 def main():
     """Main dashboard loop"""
     dashboard = AlertDashboard()
+    tailer = EveTailer(SURICATA_EVE_JSON)
+    lock = threading.Lock()
+    stop = threading.Event()
     
     print(f"\n{Colors.OKGREEN}Loading Suricata alerts...{Colors.ENDC}\n")
+    threading.Thread(target=ingest_alerts, args=(dashboard, tailer, lock, stop), daemon=True).start()
     
     while True:
         try:
-            # Load alerts
-            alerts = load_alerts_from_logs()
-            
-            # Update dashboard
-            dashboard.stats = {
-                'total': 0,
-                'by_severity': defaultdict(int),
-                'by_category': defaultdict(int),
-                'by_protocol': defaultdict(int),
-                'top_signatures': Counter(),
-                'top_sources': Counter(),
-                'top_destinations': Counter(),
-                'timeline': []
-            }
+            # Build the frame under the lock, write it after releasing it so a
+            # slow terminal doesn't hold up ingestion
+            with lock:
+                lines = dashboard.frame_lines()
+            dashboard.renderer.draw(lines)
             
-            for alert in alerts:
-                dashboard.update_stats(alert)
-            
-            # Render dashboard
-            dashboard.render()
-            
-            # Refresh every 5 seconds
-            time.sleep(5)
+            # Frame rate cap
+            time.sleep(1.0 / MAX_FPS)
             
         except KeyboardInterrupt:
-            print(f"\n\n{Colors.WARNING}Dashboard stopped.{Colors.ENDC}\n")
+            stop.set()
+            renderer = dashboard.renderer
+            print(f"\n\n{Colors.WARNING}Dashboard stopped.{Colors.ENDC} "
+                  f"({renderer.bytes_written / max(renderer.frames, 1):,.0f} bytes/frame "
+                  f"over {renderer.frames} frames)\n")
             break
         except Exception as e:
             print(f"\n{Colors.FAIL}Error: {e}{Colors.ENDC}\n")
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Consensus Alert Store
+Append-only, time-partitioned columnar segments for confirmed alerts.
+Each segment is a directory with one fixed-width file per column; strings
+(messages, categories, protocols, node names) live in side dictionaries.
+Queries memory-map the columns and filter them with NumPy.
+"""
+
+import os
+import json
+import time
+import socket
+import struct
+import argparse
+import threading
+from pathlib import Path
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# Column name -> fixed-width dtype (little-endian on disk)
+COLUMNS = {
+    'ts': '<f8',         # Consensus time, epoch seconds
+    'sid': '<u4',        # Suricata signature ID (0 = unknown)
+    'src_ip': '<u4',     # Packed IPv4 (0 = unknown / IPv6)
+    'dst_ip': '<u4',
+    'src_port': '<u2',
+    'dst_port': '<u2',
+    'category': '<u2',   # Code in the category dictionary
+    'severity': '<u1',   # Suricata priority 1-5 (0 = unknown)
+    'protocol': '<u1',   # Code in the protocol dictionary
+    'nodes': '<u8',      # Bitmap of voting nodes (bit = node dictionary code)
+    'message': '<u4',    # Code in the message dictionary
+}
+ROW_DTYPE = np.dtype([(name, dtype) for name, dtype in COLUMNS.items()])
+COLUMN_MAX = {name: np.iinfo(dtype).max for name, dtype in COLUMNS.items() if np.dtype(dtype).kind == 'u'}
+# Dictionary -> most distinct values kept. Messages are bounded by memory, not the column width
+DICTIONARIES = {'category': 0xFFFF, 'protocol': 0xFF, 'node': 64, 'message': 1 << 18}
+OTHER = "<other>"  # Value stored for anything past a full dictionary (except nodes: bitmap bits)
+
+PARTITION_SECONDS = 3600   # One segment directory per hour
+FLUSH_ROWS = 1000          # Buffered rows written per column file append
+SEGMENT_PREFIX = "seg-"
+
+
+def pack_ip(ip):
+    """Dotted IPv4 -> uint32 (0 for missing or IPv6 addresses)"""
+    try:
+        return struct.unpack('!I', socket.inet_aton(ip))[0]
+    except (OSError, TypeError, ValueError):
+        return 0
+
+
+def unpack_ip(value):
+    """uint32 -> dotted IPv4 ('' for 0)"""
+    return socket.inet_ntoa(struct.pack('!I', int(value))) if value else ""
+
+
+def to_int(value, default=0):
+    """Int from a vote field that may be missing or 'N/A'"""
+    try:
+        return int(value)
+    except (TypeError, ValueError, OverflowError):
+        return default
+
+
+def to_str(value):
+    """Str from a vote field that may be missing (None) or not a scalar (None too)"""
+    if value is None or isinstance(value, (dict, list)):
+        return None
+    return str(value)
+
+
+def column_int(name, value):
+    """Int for an unsigned column; 0 (unknown) if missing or outside the column's range"""
+    value = to_int(value)
+    return value if 0 <= value <= COLUMN_MAX[name] else 0
+
+
+class StringDictionary:
+    """Append-only value <-> code mapping persisted as one JSON string per line"""
+
+    def __init__(self, path, limit, other=None):
+        self.path = Path(path)
+        self.limit = limit
+        self.other = other  # Takes the last code once the others are used up; None: raise instead
+        self.values = []
+        self.codes = {}
+        if self.path.exists():
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        value = json.loads(line)
+                        self.codes[value] = len(self.values)
+                        self.values.append(value)
+
+    def code(self, value):
+        """Code for value, assigning (and persisting) a new one if needed"""
+        code = self.codes.get(value)
+        if code is None:
+            if self.other is not None and len(self.values) >= self.limit - 1:
+                value = self.other
+                code = self.codes.get(value)
+                if code is not None:
+                    return code
+            elif len(self.values) >= self.limit:
+                raise ValueError(f"{self.path.name}: more than {self.limit} distinct values")
+            code = len(self.values)
+            # Written before any row that references it
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(value) + "\n")
+            self.codes[value] = code
+            self.values.append(value)
+        return code
+
+    def lookup(self, code):
+        return self.values[code] if 0 <= code < len(self.values) else ""
+
+
+class AlertStore:
+    """Writer and reader for a directory of columnar alert segments"""
+
+    def __init__(self, root, partition_seconds=PARTITION_SECONDS):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.partition_seconds = partition_seconds
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.checked = set()  # Segments whose column lengths were verified this run
+        self.dicts = {
+            name: StringDictionary(self.root / f"dict_{name}.jsonl", limit, None if name == 'node' else OTHER)
+            for name, limit in DICTIONARIES.items()
+        }
+
+    # -- Writing ------------------------------------------------------------
+
+    def append(self, ts, message, nodes=(), category="OTHER", sid=0, src_ip=None,
+               dst_ip=None, src_port=0, dst_port=0, protocol="", priority=0):
+        """Buffer one confirmed alert; written out every FLUSH_ROWS rows"""
+        with self.lock:
+            bitmap = 0
+            for node in nodes:
+                try:
+                    bitmap |= 1 << self.dicts['node'].code(node)
+                except ValueError:
+                    pass  # Beyond 64 nodes: the alert is kept, the vote bit is not
+            self.buffer.append((
+                ts, column_int('sid', sid), pack_ip(src_ip), pack_ip(dst_ip),
+                column_int('src_port', src_port), column_int('dst_port', dst_port),
+                self.dicts['category'].code(category), column_int('severity', priority),
+                self.dicts['protocol'].code(protocol or ""), bitmap,
+                self.dicts['message'].code(message),
+            ))
+            if len(self.buffer) >= FLUSH_ROWS:
+                self._flush()
+
+    def flush(self):
+        """Write buffered rows to their segments"""
+        with self.lock:
+            self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        # Swapped out first: a batch that fails to convert or write is dropped, not retried forever
+        buffer, self.buffer = self.buffer, []
+        self.write_rows(np.array(buffer, dtype=ROW_DTYPE))
+
+    def write_rows(self, rows):
+        """Append a structured array (ROW_DTYPE) to the segments its timestamps fall in"""
+        partitions = (rows['ts'] // self.partition_seconds).astype(np.int64)
+        distinct = np.unique(partitions)
+        for partition in distinct:
+            part = rows if len(distinct) == 1 else rows[partitions == partition]
+            seg = self.segment_path(int(partition) * self.partition_seconds)
+            seg.mkdir(exist_ok=True)
+            if seg not in self.checked:
+                self.repair_segment(seg)
+                self.checked.add(seg)
+            for name in COLUMNS:
+                with open(seg / f"{name}.col", "ab") as f:
+                    f.write(np.ascontiguousarray(part[name]).tobytes())
+
+    @staticmethod
+    def repair_segment(seg):
+        """Truncate columns to a common row count after an interrupted append"""
+        sizes = {name: os.path.getsize(seg / f"{name}.col") // np.dtype(dtype).itemsize
+                 if (seg / f"{name}.col").exists() else 0
+                 for name, dtype in COLUMNS.items()}
+        rows = min(sizes.values())
+        for name, size in sizes.items():
+            if size > rows:
+                os.truncate(seg / f"{name}.col", rows * np.dtype(COLUMNS[name]).itemsize)
+
+    def segment_path(self, start):
+        stamp = datetime.fromtimestamp(start, timezone.utc).strftime('%Y%m%dT%H%M%S')
+        return self.root / f"{SEGMENT_PREFIX}{stamp}"
+
+    # -- Reading ------------------------------------------------------------
+
+    def segments(self, start=None, end=None):
+        """(segment start, path) for segments overlapping [start, end), oldest first"""
+        found = []
+        for path in self.root.glob(f"{SEGMENT_PREFIX}*"):
+            try:
+                seg_start = datetime.strptime(path.name[len(SEGMENT_PREFIX):], '%Y%m%dT%H%M%S') \
+                    .replace(tzinfo=timezone.utc).timestamp()
+            except ValueError:
+                continue
+            if start is not None and seg_start + self.partition_seconds <= start:
+                continue
+            if end is not None and seg_start >= end:
+                continue
+            found.append((seg_start, path))
+        return sorted(found)
+
+    @staticmethod
+    def open_segment(path):
+        """Memory-map every column; rows beyond the shortest column (torn write) are ignored"""
+        rows = min(
+            (os.path.getsize(path / f"{name}.col") // np.dtype(dtype).itemsize
+             if (path / f"{name}.col").exists() else 0)
+            for name, dtype in COLUMNS.items()
+        )
+        if rows == 0:
+            return None
+        return {
+            name: np.memmap(path / f"{name}.col", dtype=dtype, mode='r', shape=(rows,))
+            for name, dtype in COLUMNS.items()
+        }
+
+    def filter_mask(self, cols, start, end, seg_start, sid=None, src_ip=None, dst_ip=None,
+                    category=None, node=None, min_severity=None):
+        """Boolean row mask for one segment (None means every row matches)"""
+        mask = None
+
+        def both(m):
+            return m if mask is None else mask & m
+
+        # Only partially covered segments need a timestamp comparison
+        if start is not None and seg_start < start:
+            mask = both(cols['ts'] >= start)
+        if end is not None and seg_start + self.partition_seconds > end:
+            mask = both(cols['ts'] < end)
+        if sid is not None:
+            mask = both(cols['sid'] == sid)
+        if src_ip is not None:
+            mask = both(cols['src_ip'] == pack_ip(src_ip))
+        if dst_ip is not None:
+            mask = both(cols['dst_ip'] == pack_ip(dst_ip))
+        if category is not None:
+            code = self.dicts['category'].codes.get(category, -1)
+            mask = both(cols['category'] == code)
+        if node is not None:
+            code = self.dicts['node'].codes.get(node)
+            bit = np.uint64(1 << code) if code is not None else np.uint64(0)
+            mask = both((cols['nodes'] & bit) != 0)
+        if min_severity is not None:
+            # Priority 1 is the most severe; 0 is unknown
+            sev = cols['severity']
+            mask = both((sev > 0) & (sev <= min_severity))
+        return mask
+
+    def count(self, start=None, end=None, **filters):
+        """Number of stored alerts matching the filters, without materializing rows"""
+        self.flush()
+        total = 0
+        for seg_start, path in self.segments(start, end):
+            cols = self.open_segment(path)
+            if cols is None:
+                continue
+            mask = self.filter_mask(cols, start, end, seg_start, **filters)
+            total += len(cols['ts']) if mask is None else int(np.count_nonzero(mask))
+        return total
+
+    def scan(self, start=None, end=None, columns=None, **filters):
+        """Matching rows as {column: ndarray} (raw codes, packed IPs)"""
+        self.flush()
+        columns = columns or list(COLUMNS)
+        parts = {name: [] for name in columns}
+        for seg_start, path in self.segments(start, end):
+            cols = self.open_segment(path)
+            if cols is None:
+                continue
+            mask = self.filter_mask(cols, start, end, seg_start, **filters)
+            for name in columns:
+                parts[name].append(np.array(cols[name] if mask is None else cols[name][mask]))
+        return {
+            name: np.concatenate(arrays) if arrays else np.empty(0, COLUMNS[name])
+            for name, arrays in parts.items()
+        }
+
+    def query(self, start=None, end=None, limit=None, **filters):
+        """Matching alerts as a DataFrame with strings and IPs decoded (newest last)"""
+        rows = self.scan(start, end, **filters)
+        if limit is not None:
+            rows = {name: values[-limit:] for name, values in rows.items()}
+        frame = pd.DataFrame(rows)
+        for name in ('category', 'protocol', 'message'):
+            values = self.dicts[name].values
+            frame[name] = [values[c] if c < len(values) else "" for c in frame[name]]
+        nodes = self.dicts['node'].values
+        frame['nodes'] = [
+            ",".join(n for bit, n in enumerate(nodes) if int(mask) >> bit & 1)
+            for mask in frame['nodes']
+        ]
+        frame['src_ip'] = [unpack_ip(v) for v in frame['src_ip']]
+        frame['dst_ip'] = [unpack_ip(v) for v in frame['dst_ip']]
+        frame['time'] = pd.to_datetime(frame['ts'], unit='s', utc=True)
+        return frame
+
+
+def parse_time(value):
+    """Epoch seconds or ISO-8601 (UTC if no offset) from the command line"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def main():
+    """Query a consensus alert store from the command line"""
+    parser = argparse.ArgumentParser(description="Query stored consensus alerts")
+    parser.add_argument("--dir", default=os.environ.get("ALERT_STORE_DIR", "alert_store"),
+                        help="Store directory (default: $ALERT_STORE_DIR or ./alert_store)")
+    parser.add_argument("--from", dest="start", help="Start time (epoch or ISO-8601)")
+    parser.add_argument("--to", dest="end", help="End time (epoch or ISO-8601)")
+    parser.add_argument("--sid", type=int)
+    parser.add_argument("--src-ip")
+    parser.add_argument("--dst-ip")
+    parser.add_argument("--category")
+    parser.add_argument("--node")
+    parser.add_argument("--limit", type=int, default=50, help="Newest rows shown (default: 50)")
+    parser.add_argument("--count", action="store_true", help="Only print the number of matches")
+    parser.add_argument("--csv", help="Write matching rows to this CSV file")
+    args = parser.parse_args()
+
+    store = AlertStore(args.dir)
+    filters = {'sid': args.sid, 'src_ip': args.src_ip, 'dst_ip': args.dst_ip,
+               'category': args.category, 'node': args.node}
+    filters = {k: v for k, v in filters.items() if v is not None}
+    start, end = parse_time(args.start), parse_time(args.end)
+
+    started = time.perf_counter()
+    if args.count:
+        print(store.count(start, end, **filters))
+    else:
+        frame = store.query(start, end, limit=None if args.csv else args.limit, **filters)
+        if args.csv:
+            frame.to_csv(args.csv, index=False)
+            print(f"Wrote {len(frame):,} rows to {args.csv}")
+        else:
+            columns = ['time', 'sid', 'category', 'severity', 'protocol',
+                       'src_ip', 'src_port', 'dst_ip', 'dst_port', 'nodes', 'message']
+            print(frame[columns].to_string(index=False) if len(frame) else "No matching alerts")
+    print(f"({time.perf_counter() - started:.3f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,89 +7,612 @@ Aggregates votes from detector nodes and reaches Byzantine consensus
 from flask import Flask, request, jsonify
 from rich.console import Console
 from rich.table import Table
-from collections import defaultdict
+from collections import defaultdict, deque
+import os
+import sys
+import json
+import math
 import time
+import heapq
+import itertools
+import atexit
 import threading
+from pathlib import Path
+
+from rollups import RollupStore, RESOLUTIONS
+from alert_store import AlertStore, parse_time, to_int, to_str
+from recent_alerts import RecentAlertIndex
+from suricata_detector import SuricataAlertParser
+from fingerprint import BUCKET_MASK
+from vote_auth import VOTE_AUTH, AUTH_KEYS_DIR, VoteVerifier, AuthError, SESSION_HEADER, MAC_HEADER
+from upstream import UpstreamForwarder
+from replication import REPLICAS, REPLICA_ID, Replica, HttpTransport
+from vote_window import VOTE_WINDOW_MODE, AdaptiveWindow
+from admission import ADMISSION, AdmissionQueue, severity_of
+from hot_config import HotConfig, ConfigError, positive_int
 
 app = Flask(__name__)
 console = Console()
 
-# Vote storage: {alert_message: {node_id: timestamp}}
+# Vote storage: {alert_key: {node_id: timestamp}}, keyed by the 64-bit
+# fingerprint when the detector sends one, otherwise by the message text
 votes = defaultdict(dict)
-VOTE_WINDOW = 20  # seconds
-THRESHOLD = 2     # 2 out of 3 nodes must agree
-processed_alerts = set()
+VOTE_WINDOW = int(os.environ.get("VOTE_WINDOW", 20))  # seconds
+THRESHOLD = int(os.environ.get("THRESHOLD", 2))       # 2 out of 3 nodes must agree
+PORT = int(os.environ.get("COORDINATOR_PORT", 5000))
+processed_alerts = {}  # Decided alert key -> its first vote time (late votes still teach lag)
+flow_keys = {}  # fingerprint >> 16 (flow hash) -> live vote key for that flow
+votes_lock = threading.Lock()  # Flask serves requests on multiple threads
+
+# Recent consensus decisions, numbered so clients can poll incrementally
+decisions = deque(maxlen=10000)
+stats = {'votes_received': 0, 'consensus_reached': 0, 'incidents_decided': 0, 'incident_alerts': 0,
+         'auth_failures': 0, 'vote_requests': 0, 'expired_alerts': 0, 'rejected_nodes': 0,
+         'started': time.time()}
+
+# Undecided alerts are dropped once their window has passed: VOTE_WINDOW after
+# the newest vote, or with VOTE_WINDOW_MODE=adaptive a per-alert window sized
+# from the nodes' observed vote lag
+adaptive_window = AdaptiveWindow(THRESHOLD) if VOTE_WINDOW_MODE == "adaptive" else None
+alert_deadline = {}  # alert_key -> time its votes expire
+expiry_heap = []     # (deadline, tiebreak, alert_key), stale entries skipped
+expiry_order = itertools.count()
+
+# Confirmed alerts are persisted for forensics ("" disables the store)
+ALERT_STORE_DIR = os.environ.get("ALERT_STORE_DIR", "alert_store")
+alert_store = AlertStore(ALERT_STORE_DIR) if ALERT_STORE_DIR else None
+alert_meta = {}  # alert_message -> optional metadata from the first vote carrying it
+incident_votes = defaultdict(dict)  # incident message -> {node: incident summary}
+
+# Indexed recent decisions for /alerts (bounded by count and age)
+recent_alerts = RecentAlertIndex(
+    capacity=int(os.environ.get("RECENT_ALERTS", 100000)),
+    max_age=int(os.environ.get("RECENT_ALERT_SECONDS", 3600))
+)
+QUERY_LIMIT = 1000  # Largest /alerts page
+
+# Vote authentication: with VOTE_AUTH=required every vote needs a session MAC
+verifier = VoteVerifier(AUTH_KEYS_DIR) if VOTE_AUTH == "required" else None
+
+# Sub-coordinator role: with UPSTREAM_URL set, accepted votes are also
+# forwarded to the parent coordinator in per-alert batches
+COORDINATOR_ID = os.environ.get("COORDINATOR_ID", "coordinator")
+UPSTREAM_URL = os.environ.get("UPSTREAM_URL", "")
+upstream = UpstreamForwarder(UPSTREAM_URL, COORDINATOR_ID, authenticate=verifier is not None) if UPSTREAM_URL else None
 
-def check_consensus(alert_key):
+# Root role: the detectors each sub-coordinator may report votes for
+# ({"sub-lab": ["rp6", "rp7"], ...}); a sub not listed has its nodes rejected
+SUBCOORDINATORS_FILE = os.environ.get(
+    "SUBCOORDINATORS_FILE", str(Path(__file__).resolve().parent.parent / "config" / "subcoordinators.json"))
+
+def load_subcoordinators(path=SUBCOORDINATORS_FILE):
+    """Sub-coordinator ID -> set of detector IDs it speaks for ({} without a file)"""
+    try:
+        with open(path) as f:
+            return {str(sub): {str(node) for node in nodes} for sub, nodes in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+
+sub_detectors = load_subcoordinators()
+
+# Pre-aggregated timelines for /timeline (votes by node, decisions by category/node)
+vote_rollups = RollupStore()
+consensus_rollups = RollupStore()
+
+def check_consensus(alert_key, now=None, window=None):
     """Check if consensus threshold is met for given alert"""
-    now = time.time()
+    now = time.time() if now is None else now
+    window = VOTE_WINDOW if window is None else window
     active_votes = {
         node: ts for node, ts in votes[alert_key].items()
-        if now - ts <= VOTE_WINDOW
+        if now - ts <= window
     }
     
     if len(active_votes) >= THRESHOLD:
         return True, list(active_votes.keys())
     return False, []
 
+def vote_key(fingerprint):
+    """Consensus key for a fingerprinted vote, joining a neighbouring time bucket (lock held)"""
+    if fingerprint in votes:
+        return fingerprint  # Later votes for an open key skip the flow index entirely
+    flow = fingerprint >> 16
+    key = flow_keys.get(flow)
+    # Detector clocks (or the event) may straddle a bucket boundary
+    if key is not None and ((fingerprint - key) & BUCKET_MASK) in (0, 1, BUCKET_MASK):
+        return key
+    flow_keys[flow] = fingerprint
+    return fingerprint
+
+def expire_votes(now):
+    """Drop undecided alerts whose window has passed (lock held)"""
+    while expiry_heap and expiry_heap[0][0] < now:
+        deadline, _, key = heapq.heappop(expiry_heap)
+        if alert_deadline.get(key) == deadline:
+            del alert_deadline[key]
+            votes.pop(key, None)
+            alert_meta.pop(key, None)
+            incident_votes.pop(key, None)
+            stats['expired_alerts'] += 1
+
+def schedule_expiry(key, deadline):
+    """Set an undecided alert's expiry time (lock held)"""
+    if alert_deadline.get(key) != deadline:
+        alert_deadline[key] = deadline
+        heapq.heappush(expiry_heap, (deadline, next(expiry_order), key))
+
+def valid_fingerprint(value):
+    """A detector fingerprint is an unsigned 64-bit int; anything else is ignored"""
+    if isinstance(value, int) and not isinstance(value, bool) and 0 <= value < 1 << 64:
+        return value
+    return None
+
+def valid_meta(meta):
+    """Vote metadata (sid, IPs, ports, protocol, priority) is an object of scalars, if present"""
+    return isinstance(meta or {}, dict) and all(
+        value is None or isinstance(value, (str, int, float)) for value in (meta or {}).values())
+
+def valid_incident(incident):
+    """An incident summary has a numeric count and first/last seen and a samples list, if present"""
+    return isinstance(incident or {}, dict) and all(
+        isinstance((incident or {}).get(k, 0), (int, float)) for k in ('count', 'first_seen', 'last_seen')
+    ) and isinstance((incident or {}).get('samples', []), list)
+
+def valid_vote(data):
+    """Field types a vote must have before it is queued or counted"""
+    return (isinstance(data, dict) and isinstance(data.get('node', ''), str)
+            and isinstance(data.get('message', ''), str)
+            and valid_meta(data.get('alert')) and valid_incident(data.get('incident')))
+
+def valid_summary(summary):
+    """Field types a sub-coordinator's vote summary must have before any of its batch is counted"""
+    return (isinstance(summary, dict) and isinstance(summary.get('message', ''), str)
+            and isinstance(summary.get('nodes') or [], list)
+            and valid_meta(summary.get('alert'))
+            and isinstance(summary.get('incidents') or {}, dict)
+            and all(isinstance(incident, dict) and valid_incident(incident)
+                    for incident in (summary.get('incidents') or {}).values()))
+
+def authenticate(node, data):
+    """401 response when vote auth is required and the request fails it, else None"""
+    if verifier is None:
+        return None
+    try:
+        verifier.verify(request.headers.get(SESSION_HEADER), request.headers.get(MAC_HEADER),
+                        request.get_data(), node, data.get('seq'))
+    except AuthError as e:
+        stats['auth_failures'] += 1
+        console.print(f"[red]Vote rejected → Node: {node}, {e}[/red]")
+        return jsonify({"error": str(e)}), 401
+    return None
+
+def record_votes(nodes, message, fingerprint=None, meta=None, incidents=None, now=None):
+    """
+    Record votes for one alert from one or more nodes and check consensus
+    (`now`: vote time, the batch timestamp when replicated).
+    Returns (consensus, voting_nodes, decided).
+    """
+    now = time.time() if now is None else now
+    vote_rollups.add(now, node=list(nodes))
+    with votes_lock:
+        expire_votes(now)
+        alert_key = message if fingerprint is None else vote_key(fingerprint)
+        stats['votes_received'] += len(nodes)
+        for node in nodes:
+            if adaptive_window is not None and alert_key in processed_alerts:
+                adaptive_window.observe(node, now - processed_alerts[alert_key])  # Late voter
+            votes[alert_key][node] = now
+            incident = (incidents or {}).get(node)
+            if isinstance(incident, dict):
+                incident_votes[alert_key][node] = incident
+            if upstream is not None:
+                upstream.add(alert_key, message, node, alert_key if fingerprint is not None else None,
+                             meta, incident)
+        if isinstance(meta, dict) and alert_key not in alert_meta:
+            alert_meta[alert_key] = meta
+        first_vote = min(votes[alert_key].values())
+        # Adaptive windows expire whole alerts (expire_votes), so every vote still held counts
+        window = VOTE_WINDOW if adaptive_window is None else now - first_vote
+        consensus, voters = check_consensus(alert_key, now, window)
+        decided = consensus and alert_key not in processed_alerts
+        if not decided:
+            schedule_expiry(alert_key, now + VOTE_WINDOW if adaptive_window is None
+                            else first_vote + adaptive_window.window(votes[alert_key]))
+        if decided:
+            processed_alerts[alert_key] = first_vote
+            # Clear votes for this alert first, so a failing decision can't leave them behind
+            alert_votes = votes.pop(alert_key, None)
+            alert_deadline.pop(alert_key, None)
+            first_meta = alert_meta.pop(alert_key, None)
+            reports = incident_votes.pop(alert_key, None)
+            if adaptive_window is not None:
+                for node, ts in alert_votes.items():
+                    adaptive_window.observe(node, ts - first_vote)
+            record_decision(message, voters, first_vote, first_meta, merge_incident(reports, voters),
+                            alert_key if fingerprint is not None else None)
+    return consensus, voters, decided
+
+def print_consensus(message, nodes):
+    """Display consensus table"""
+    table = Table(
+        title="\n[bold green]✓ CONSENSUS REACHED[/bold green]",
+        show_header=True,
+        header_style="bold white on blue",
+        border_style="green"
+    )
+    
+    table.add_column("ATTACK DETECTED", style="bold cyan", width=45)
+    table.add_column("NODES VOTING", style="bold yellow", width=25, justify="center")
+    table.add_column("VOTE", style="bold green", width=8, justify="center")
+    
+    nodes_str = ", ".join(sorted(nodes))
+    table.add_row(message, nodes_str, f"{len(nodes)}/{THRESHOLD}")
+    
+    console.print(table)
+    console.print()
+
 @app.route('/alert', methods=['POST'])
 def receive_alert():
     """Receive and process alert vote from detector node"""
     data = request.json
+    if not valid_vote(data):
+        return jsonify({"error": "node and message must be strings, alert an object of scalars and "
+                                 "incident an object with numeric count and times"}), 400
+    node = data.get('node', 'unknown')
+    denied = authenticate(node, data)
+    if denied:
+        return denied
+    stats['vote_requests'] += 1
+    if replica is not None:
+        # Replicated: counted once the replicas have agreed on its batch
+        replica.submit(data)
+        return jsonify({"status": "ok", "consensus": None})
+    if admission is not None:
+        severity = severity_of(data)
+        shed = admission.offer(data, node, severity)
+        if shed:
+            reason, retry_after = shed
+            return jsonify({"status": "shed", "severity": severity, "reason": reason,
+                            "retry_after": retry_after}), 429, {'Retry-After': str(math.ceil(retry_after))}
+        return jsonify({"status": "queued", "severity": severity})
+    return jsonify({"status": "ok", "consensus": process_vote(data)})
+
+def process_vote(data):
+    """Record one detector vote and announce consensus; returns whether it was reached"""
     node = data.get('node', 'unknown')
     message = data.get('message', 'Unknown')
+    meta = data.get('alert')  # Optional: sid, src_ip, dst_ip, ports, protocol, priority
+    incident = data.get('incident')  # Optional: coalesced count, first/last seen, samples
+    fingerprint = valid_fingerprint(data.get('fingerprint'))  # Optional: 64-bit canonical alert key
     
     # Show vote received
     console.print(f"[yellow]Vote received → Node: {node}, Msg: {message}[/yellow]")
     
-    # Record vote
-    alert_key = message
-    votes[alert_key][node] = time.time()
-    
-    # Check for consensus
-    consensus, nodes = check_consensus(alert_key)
-    
-    if consensus and alert_key not in processed_alerts:
-        processed_alerts.add(alert_key)
-        
-        # Display consensus table
-        table = Table(
-            title="\n[bold green]✓ CONSENSUS REACHED[/bold green]",
-            show_header=True,
-            header_style="bold white on blue",
-            border_style="green"
+    # Record vote and check for consensus
+    consensus, nodes, decided = record_votes([node], message, fingerprint, meta, {node: incident})
+    if decided:
+        print_consensus(message, nodes)
+    return consensus
+
+# Admission control: votes wait in per-severity queues for a single worker, and
+# LOW/INFO votes and over-rate nodes are shed with 429 when overloaded
+admission = AdmissionQueue(process_vote) if ADMISSION == "on" and not REPLICAS else None
+
+@app.route('/votes', methods=['POST'])
+def receive_summaries():
+    """Pre-counted vote summaries from a sub-coordinator, one request per batch"""
+    data = request.json or {}
+    if replica is not None:
+        return jsonify({"error": "vote summaries are not supported by a replicated coordinator"}), 501
+    # Checked for the whole batch first: a bad summary must not leave the ones before it counted
+    if not (isinstance(data, dict) and isinstance(data.get('node', ''), str)
+            and isinstance(data.get('summaries') or [], list)
+            and all(valid_summary(summary) for summary in data.get('summaries') or [])):
+        return jsonify({"error": "node must be a string and summaries a list of objects with a string "
+                                 "message, a nodes list, an alert object of scalars and incident "
+                                 "objects with numeric count and times"}), 400
+    sub = data.get('node', 'unknown')
+    denied = authenticate(sub, data)
+    if denied:
+        return denied
+    stats['vote_requests'] += 1
+    decided_count = rejected = 0
+    allowed = sub_detectors.get(sub, ())
+    summaries = data.get('summaries') or []
+    console.print(f"[yellow]Vote batch received → Sub-coordinator: {sub}, {len(summaries)} alerts[/yellow]")
+    for summary in summaries:
+        claimed = [str(n) for n in summary.get('nodes') or []]
+        # A sub only speaks for its own detectors; otherwise one compromised
+        # sub could supply every vote an alert needs
+        nodes = [n for n in claimed if n in allowed]
+        rejected += len(claimed) - len(nodes)
+        if not nodes:
+            continue
+        message = summary.get('message', 'Unknown')
+        _, voters, decided = record_votes(nodes, message, valid_fingerprint(summary.get('fingerprint')),
+                                          summary.get('alert'), summary.get('incidents'))
+        if decided:
+            decided_count += 1
+            print_consensus(message, voters)
+    if rejected:
+        stats['rejected_nodes'] += rejected
+        console.print(f"[red]Votes rejected → Sub-coordinator: {sub}, {rejected} from detectors it does not serve[/red]")
+    return jsonify({"status": "ok", "decided": decided_count, "rejected": rejected})
+
+@app.route('/replica', methods=['POST'])
+def replica_messages():
+    """Agreement messages from the other coordinator replicas"""
+    if replica is None:
+        return jsonify({"error": "replication is disabled"}), 404
+    replica.receive((request.json or {}).get('messages') or [])
+    return jsonify({"status": "ok"})
+
+@app.route('/session', methods=['POST'])
+def open_session():
+    """Authenticate a detector and agree on a vote session key"""
+    if verifier is None:
+        return jsonify({"error": "vote authentication is disabled"}), 404
+    try:
+        return jsonify(verifier.handshake(request.json or {}))
+    except AuthError as e:
+        stats['auth_failures'] += 1
+        return jsonify({"error": str(e)}), 401
+
+def merge_incident(reports, nodes):
+    """Combine the incident summaries of the agreeing nodes (None for plain alerts)"""
+    reports = {node: reports[node] for node in nodes if reports and node in reports}
+    if not reports:
+        return None
+    first = min(reports.values(), key=lambda r: r.get('first_seen', 0))
+    return {
+        'count': max(r.get('count', 1) for r in reports.values()),
+        'counts': {node: r.get('count', 1) for node, r in reports.items()},
+        'first_seen': first.get('first_seen'),
+        'last_seen': max(r.get('last_seen', 0) for r in reports.values()),
+        'samples': first.get('samples', [])
+    }
+
+def record_decision(message, nodes, first_vote, meta=None, incident=None, fingerprint=None):
+    """Append a consensus decision to the decision log, recent-alert index and alert store"""
+    stats['consensus_reached'] += 1
+    meta = meta or {}
+    decided_at = time.time()
+    decision = {
+        'seq': stats['consensus_reached'],
+        'message': message,
+        'nodes': sorted(nodes),
+        'first_vote': first_vote,
+        'decided_at': decided_at,
+        'category': SuricataAlertParser.categorize_attack(message, ""),
+        'sid': to_int(meta.get('sid')),
+        'src_ip': to_str(meta.get('src_ip')),
+        'dst_ip': to_str(meta.get('dst_ip')),
+        'src_port': to_int(meta.get('src_port')),
+        'dst_port': to_int(meta.get('dst_port')),
+        'protocol': to_str(meta.get('protocol')),
+        'priority': to_int(meta.get('priority'))
+    }
+    if fingerprint is not None:
+        decision['fingerprint'] = f"{fingerprint:016x}"
+    if incident:
+        decision['incident'] = incident
+        stats['incidents_decided'] += 1
+        stats['incident_alerts'] += incident['count']
+    decisions.append(decision)
+    recent_alerts.add(decision)
+    consensus_rollups.add(decided_at, category=decision['category'], node=nodes)
+    if alert_store is not None:
+        alert_store.append(
+            decided_at, message, nodes=decision['nodes'], category=decision['category'],
+            sid=decision['sid'], src_ip=decision['src_ip'], dst_ip=decision['dst_ip'],
+            src_port=decision['src_port'], dst_port=decision['dst_port'],
+            protocol=decision['protocol'], priority=decision['priority']
         )
-        
-        table.add_column("ATTACK DETECTED", style="bold cyan", width=45)
-        table.add_column("NODES VOTING", style="bold yellow", width=25, justify="center")
-        table.add_column("VOTE", style="bold green", width=8, justify="center")
-        
-        nodes_str = ", ".join(sorted(nodes))
-        table.add_row(message, nodes_str, f"{len(nodes)}/{THRESHOLD}")
-        
-        console.print(table)
-        console.print()
-        
-        # Clear votes for this alert
-        votes.pop(alert_key, None)
+
+def apply_config(changed):
+    """Derived state for reloaded settings (votes_lock held)"""
+    if replica is not None and config.stats['reloads']:
+        # Replicas must decide identically; a reload on one would fork them
+        # (the start-up load is fine: each replica reads its file before serving)
+        raise ConfigError("THRESHOLD and VOTE_WINDOW cannot change on a running replica")
+    if adaptive_window is not None:
+        adaptive_window.threshold = THRESHOLD
+
+# Reloadable from CONFIG_FILE on SIGHUP or POST /admin/reload; votes and decisions are kept
+config = HotConfig(sys.modules[__name__], {
+    'THRESHOLD': ('THRESHOLD', positive_int),
+    'VOTE_WINDOW': ('VOTE_WINDOW', positive_int),
+}, lock=votes_lock, apply=apply_config)
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """Reload CONFIG_FILE (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"error": "admin endpoints are local only"}), 403
+    result = config.reload()
+    return jsonify(result), 200 if result['status'] == "applied" else 400
+
+@app.route('/status', methods=['GET'])
+def status():
+    """Health check and vote/consensus counters"""
+    with votes_lock:
+        pending = len(votes)
+        window_status = adaptive_window.status() if adaptive_window else None
+    return jsonify({
+        "status": "ok",
+        "threshold": THRESHOLD,
+        "vote_window": VOTE_WINDOW,
+        "votes_received": stats['votes_received'],
+        "consensus_reached": stats['consensus_reached'],
+        "incidents_decided": stats['incidents_decided'],
+        "incident_alerts": stats['incident_alerts'],
+        "vote_requests": stats['vote_requests'],
+        "rejected_nodes": stats['rejected_nodes'],
+        "vote_auth": VOTE_AUTH,
+        "auth_failures": stats['auth_failures'],
+        "pending_alerts": pending,
+        "expired_alerts": stats['expired_alerts'],
+        "adaptive_window": window_status,
+        "upstream": dict(upstream.stats, url=UPSTREAM_URL) if upstream else None,
+        "replication": replica.status() if replica else None,
+        "admission": admission.status() if admission else None,
+        "config": config.status(),
+        "uptime": time.time() - stats['started']
+    })
+
+@app.route('/consensus', methods=['GET'])
+def consensus_feed():
+    """
+    Consensus decisions with seq greater than ?since= (oldest first), the
+    newest seq and the start time, so pollers notice a restart
+    """
+    since = request.args.get('since', 0, type=int)
+    with votes_lock:
+        recent = [d for d in decisions if d['seq'] > since]
+        latest = stats['consensus_reached']
+    return jsonify({"decisions": recent, "latest": latest, "started": stats['started']})
+
+@app.route('/alerts', methods=['GET'])
+def recent_alert_query():
+    """
+    Recent consensus alerts, newest first:
+    ?src_ip= &dst_ip= &sid= &category= &node= &from= &to= (epoch or ISO-8601)
+    &limit= (default 100) &cursor= (next_cursor from the previous page)
+    """
+    args = request.args
+    try:
+        filters = {
+            'src_ip': args.get('src_ip'),
+            'dst_ip': args.get('dst_ip'),
+            'sid': int(args['sid']) if args.get('sid') else None,
+            'category': args.get('category'),
+            'node': args.get('node'),
+        }
+        start, end = parse_time(args.get('from')), parse_time(args.get('to'))
+        limit = min(int(args.get('limit', 100)), QUERY_LIMIT)
+        if limit < 1:
+            raise ValueError(f"limit must be at least 1, got {limit}")
+        cursor = int(args['cursor']) if args.get('cursor') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    started = time.perf_counter()
+    alerts, next_cursor = recent_alerts.query(start, end, limit=limit, cursor=cursor, **filters)
+    return jsonify({
+        "alerts": alerts,
+        "next_cursor": next_cursor,
+        "retained": len(recent_alerts),
+        "query_ms": round((time.perf_counter() - started) * 1000, 3)
+    })
+
+@app.route('/timeline', methods=['GET'])
+def timeline():
+    """
+    Bucketed counts from the rollups:
+    ?series=consensus|votes &resolution=second|minute|hour &by=category|node
+    &from=&to= (epoch seconds; default the last 60 buckets)
+    """
+    series = request.args.get('series', 'consensus')
+    resolution = request.args.get('resolution', 'minute')
+    by = request.args.get('by') or None
+    store = {'consensus': consensus_rollups, 'votes': vote_rollups}.get(series)
+    if store is None or resolution not in RESOLUTIONS:
+        return jsonify({"error": "unknown series or resolution"}), 400
     
-    return jsonify({"status": "ok", "consensus": consensus})
+    width = RESOLUTIONS[resolution][0]
+    end = request.args.get('to', time.time(), type=float)
+    start = request.args.get('from', end - 59 * width, type=float)
+    try:
+        rows = store.query(resolution, start, end, by)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "series": series,
+        "resolution": resolution,
+        "by": by,
+        "buckets": [{"start": ts, "count": count} for ts, count in rows]
+    })
+
+def prune_processed():
+    """Clear processed alerts and per-alert state of settled votes (lock held)"""
+    processed_alerts.clear()
+    for flow in [f for f, key in flow_keys.items() if key not in votes]:
+        del flow_keys[flow]
+    for key in [k for k in alert_meta if k not in votes]:
+        del alert_meta[key]
+    for key in [k for k in incident_votes if k not in votes]:
+        del incident_votes[key]
 
 def cleanup_processed():
     """Background thread to clear processed alerts periodically"""
     while True:
         time.sleep(10)
-        processed_alerts.clear()
+        if replica is None:  # Replicas prune on batch time instead (see execute_batch)
+            with votes_lock:
+                prune_processed()
+                expire_votes(time.time())
+
+def execute_batch(batch):
+    """
+    Apply one agreed batch of votes. Every replica runs the same batches in
+    the same order with the batch timestamp as the clock, so all of them
+    reach the same decisions.
+    """
+    global pruned_at
+    now = batch['ts']
+    for vote in batch['votes']:
+        node = str(vote.get('node', 'unknown'))
+        message = vote.get('message', 'Unknown')
+        _, voters, decided = record_votes([node], message, valid_fingerprint(vote.get('fingerprint')),
+                                          vote.get('alert'), {node: vote.get('incident')}, now)
+        if decided:
+            print_consensus(message, voters)
+    with votes_lock:
+        if now - pruned_at >= 10:
+            prune_processed()
+            pruned_at = now
+
+# Replicated coordinator: with REPLICAS set, this is replica REPLICA_ID and
+# votes are only counted in the order agreed with the other replicas
+replica = Replica(REPLICA_ID, len(REPLICAS), execute_batch, HttpTransport(REPLICAS, REPLICA_ID)) if REPLICAS else None
+pruned_at = 0
+
+def flush_alert_store():
+    """Background thread writing buffered confirmed alerts to disk every second"""
+    while True:
+        time.sleep(1)
+        try:
+            alert_store.flush()
+        except (OSError, ValueError, OverflowError) as e:
+            console.print(f"[red]Alert store flush failed: {e}[/red]")
 
 if __name__ == '__main__':
+    config.load()
+    config.install_signal()
     console.print("\n[bold cyan]═" * 35)
     console.print("[bold magenta]   BYZANTINE FAULT-TOLERANT IDS   ")
     console.print("[bold cyan]═" * 35)
     console.print(f"[yellow]Threshold:[/yellow] {THRESHOLD}/3 nodes must agree")
+    if verifier is not None:
+        console.print(f"[yellow]Vote auth:[/yellow] {len(verifier.trusted)} trusted nodes ({AUTH_KEYS_DIR})")
     console.print(f"[yellow]Status:[/yellow] Waiting for alerts...\n")
     
     # Start cleanup thread
     threading.Thread(target=cleanup_processed, daemon=True).start()
+    if alert_store is not None:
+        console.print(f"[yellow]Alert store:[/yellow] {ALERT_STORE_DIR}")
+        threading.Thread(target=flush_alert_store, daemon=True).start()
+        atexit.register(alert_store.flush)
+    if sub_detectors:
+        console.print(f"[yellow]Sub-coordinators:[/yellow] {len(sub_detectors)} ({SUBCOORDINATORS_FILE})")
+    if upstream is not None:
+        console.print(f"[yellow]Upstream:[/yellow] {COORDINATOR_ID} → {UPSTREAM_URL}")
+        threading.Thread(target=upstream.run, daemon=True).start()
+    if admission is not None:
+        threading.Thread(target=admission.run, daemon=True).start()
+    if replica is not None:
+        console.print(f"[yellow]Replica:[/yellow] {REPLICA_ID} of {replica.n} (tolerates {replica.f} faulty)")
+        threading.Thread(target=replica.run, daemon=True).start()
     
     # Start Flask server
-    app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
+    app.run(host='0.0.0.0', port=PORT, debug=False, use_reloader=False)
@@ -5,73 +5,224 @@ Monitors Suricata alerts and casts honest votes to coordinator
 """
 
 import os
+import sys
 import time
 import re
+import threading
 import requests
 from rich.console import Console
 from rich.panel import Panel
 
+from suricata_detector import SuricataAlertParser
+from incidents import (IncidentCoalescer, COALESCE_WINDOW, incident_message,
+                       incident_summary)
+from fingerprint import fingerprint_line
+from vote_auth import VOTE_AUTH, vote_targets
+from admission import ShedBackoff, severity_of
+from send_queue import PrioritySendQueue
+from rules import RuleTable
+from hot_config import HotConfig, text, existing_file, positive_number
+from profiling import StatsServer
+from tail import ByteTailer
+
 console = Console()
 
 # Configuration
-FAST_LOG = "/usr/local/var/log/suricata/fast.log"
-COORD_URL = "http://192.168.1.236:5000/alert"
-NODE_ID = "rp6"  # Change to "rp8" for other honest nodes
+FAST_LOG = os.environ.get("FAST_LOG", "/usr/local/var/log/suricata/fast.log")
+COORD_URL = os.environ.get("COORDINATOR_URL", "http://192.168.1.236:5000")  # Comma-separated for replicas
+NODE_ID = os.environ.get("NODE_ID", "rp6")  # Change to "rp8" for other honest nodes
 LAST_ALERT = {}
 DEDUP_SECONDS = 3
+META_FIELDS = ('sid', 'src_ip', 'dst_ip', 'src_port', 'dst_port', 'protocol', 'priority')
+EXPIRE_INTERVAL = 0.2  # Seconds between checks for quiet incidents
+STATS_SOCKET = os.environ.get("STATS_SOCKET", "")  # Unix socket for stats/reload ("" = off)
+
+FAST_LOG_RE = re.compile(r'\[\*\*\]\s+\[[^\]]+\]\s+(.*?)\s+\[\*\*\]')
+FAST_LOG_RE_B = re.compile(FAST_LOG_RE.pattern.encode())
+
+# One target per coordinator replica; votes carry a session MAC when
+# the coordinator requires authentication
+TARGETS = vote_targets(NODE_ID, COORD_URL, VOTE_AUTH == "required")
+
+# An overloaded coordinator sheds votes with 429; hold back that severity until it asks
+backoff = ShedBackoff()
+
+# SIDs this detector votes on (RULES_FILES); empty falls back to the "CUSTOM ATTACK" check
+RULES = RuleTable()
+
+# Votes wait here by severity so a CRITICAL alert is not sent behind a scan storm
+outbox = PrioritySendQueue()
+
+def apply_config(changed):
+    """Rebuild the vote targets when the coordinator or node ID changes"""
+    global TARGETS
+    if 'COORDINATOR_URL' in changed or 'NODE_ID' in changed:
+        TARGETS = vote_targets(NODE_ID, COORD_URL, VOTE_AUTH == "required")
+
+# Reloadable from CONFIG_FILE on SIGHUP (or `reload` on the stats socket);
+# queued votes keep the node ID and targets they were built with
+config = HotConfig(sys.modules[__name__], {
+    'COORDINATOR_URL': ('COORD_URL', text),
+    'NODE_ID': ('NODE_ID', text),
+    'FAST_LOG': ('FAST_LOG', existing_file),
+    'DEDUP_SECONDS': ('DEDUP_SECONDS', positive_number),
+}, apply=apply_config)
 
-def send_vote(msg):
+def queue_vote(msg, meta=None, incident=None, fp=None):
+    """Build a vote and queue it for the sender thread"""
+    with config.lock:
+        node, targets = NODE_ID, TARGETS
+    vote = {"node": node, "message": msg}
+    if fp is not None:
+        vote["fingerprint"] = fp  # Canonical consensus key (SID, 5-tuple, time bucket)
+    if meta:
+        vote["alert"] = meta  # Stored with the alert if consensus is reached
+    if incident:
+        vote["incident"] = incident  # Count, first/last seen, sample alerts
+    if not outbox.put((vote, targets), severity_of(vote)):
+        console.print("[dim red]✗ Send queue full, vote dropped[/dim red]")
+
+def vote_sender():
+    """Send queued votes, highest severity first"""
+    while True:
+        for severity, (vote, targets) in outbox.get(limit=1):
+            send_vote(vote, targets, severity)
+
+def send_vote(vote, targets, severity):
     """Send vote to Byzantine coordinator"""
-    try:
-        response = requests.post(
-            COORD_URL,
-            json={"node": NODE_ID, "message": msg},
-            timeout=2
-        )
-        console.print("[dim green]✓ Vote sent to coordinator[/dim green]")
-    except Exception as e:
-        console.print(f"[dim red]✗ Failed to send vote: {e}[/dim red]")
+    if not backoff.allow(severity):
+        console.print(f"[dim yellow]⏸ {severity} vote held back (coordinator overloaded)[/dim yellow]")
+        return
+    for url, signer in targets:
+        try:
+            if signer:
+                response = signer.post(requests, url, vote, timeout=2)
+            else:
+                response = requests.post(
+                    url,
+                    json=vote,
+                    timeout=2
+                )
+            if backoff.record(response):
+                console.print(f"[dim yellow]⏸ {severity} vote shed by coordinator[/dim yellow]")
+                continue
+            console.print("[dim green]✓ Vote sent to coordinator[/dim green]")
+        except Exception as e:
+            console.print(f"[dim red]✗ Failed to send vote: {e}[/dim red]")
 
 def parse_line(line):
-    """Extract alert message from Suricata fast.log format"""
-    match = re.search(r'\[\*\*\]\s+\[[^\]]+\]\s+(.*?)\s+\[\*\*\]', line)
+    """Extract alert message from Suricata fast.log format (str or bytes; only the message is decoded)"""
+    if isinstance(line, bytes):
+        match = FAST_LOG_RE_B.search(line)
+        return match.group(1).strip().decode('utf-8', 'replace') if match else "Unknown"
+    match = FAST_LOG_RE.search(line)
     return match.group(1).strip() if match else "Unknown"
 
-# Startup
-console.print(f"[bold green]{NODE_ID} Detector Started[/bold green]")
-console.print(f"[dim]Sending votes to: {COORD_URL}[/dim]\n")
+def alert_metadata(line):
+    """SID, addresses, ports, protocol and priority from a fast.log line (None if unparsable)"""
+    alert = SuricataAlertParser.parse_fast_log(line)
+    if not alert:
+        return None
+    return {field: alert[field] for field in META_FIELDS}
+
+def vote_incidents(incidents):
+    """Cast one vote per closed incident"""
+    for incident in incidents:
+        msg = incident_message(incident)
+        console.print(Panel(
+            f"{msg}\n{incident['count']} alerts over "
+            f"{incident['last_seen'] - incident['first_seen']:.1f}s",
+            title=f"[bold cyan]{NODE_ID} INCIDENT[/bold cyan]",
+            border_style="cyan"
+        ))
+        meta = {field: incident['alert'][field] for field in META_FIELDS}
+        queue_vote(msg, meta, incident_summary(incident))
+        console.print()
+
+def stats_snapshot():
+    return {'node': NODE_ID, 'send_queue': outbox.status(), 'config': config.status()}
+
+def main():
+    """Tail fast.log and vote on every new custom attack alert"""
+    config.load()
+    config.install_signal()
+    if STATS_SOCKET:
+        server = StatsServer(STATS_SOCKET, stats_snapshot, {'reload': config.reload})
+        threading.Thread(target=server.serve_forever, daemon=True).start()
 
-if not os.path.exists(FAST_LOG):
-    console.print(f"[red]ERROR: {FAST_LOG} not found![/red]")
-    exit(1)
+    # Startup
+    console.print(f"[bold green]{NODE_ID} Detector Started[/bold green]")
+    console.print(f"[dim]Sending votes to: {COORD_URL}[/dim]")
+    console.print(f"[dim]Voting on {len(RULES)} rule SIDs from {', '.join(RULES.files) or 'no rule files'}[/dim]\n")
+
+    if not os.path.exists(FAST_LOG):
+        console.print(f"[red]ERROR: {FAST_LOG} not found![/red]")
+        exit(1)
+
+    # Alerts are coalesced into incident votes when COALESCE_WINDOW is set
+    coalescer = IncidentCoalescer() if COALESCE_WINDOW > 0 else None
+    last_expire = time.time()
+    threading.Thread(target=vote_sender, daemon=True).start()
+
+    # Main detection loop: whole lines as bytes, a chunk at a time
+    tailer = ByteTailer(FAST_LOG)  # Starts at end of file
 
-# Main detection loop
-with open(FAST_LOG, 'r') as f:
-    f.seek(0, os.SEEK_END)  # Start at end of file
-    
     while True:
-        line = f.readline()
-        
-        if not line:
+        lines = tailer.lines()
+
+        if coalescer and time.time() - last_expire >= EXPIRE_INTERVAL:
+            vote_incidents(coalescer.expire())
+            last_expire = time.time()
+
+        if not lines:
+            if FAST_LOG != tailer.path:
+                # Reloaded to another log: finish the old one, then tail the new one from its end
+                tailer.close()
+                tailer = ByteTailer(FAST_LOG)
+                console.print(f"[dim]Now tailing {FAST_LOG}[/dim]")
+                continue
             time.sleep(0.2)
             continue
-        
-        if "CUSTOM ATTACK" in line:
-            msg = parse_line(line)
-            
-            # Deduplication check
-            now = time.time()
-            if msg in LAST_ALERT and (now - LAST_ALERT[msg] < DEDUP_SECONDS):
-                continue
-            LAST_ALERT[msg] = now
-            
-            # Display locally
-            console.print(Panel(
-                msg,
-                title=f"[bold cyan]{NODE_ID} ALERT[/bold cyan]",
-                border_style="cyan"
-            ))
-            
-            # Send vote to coordinator
-            send_vote(msg)
-            console.print()
+
+        for line in lines:
+            handle_line(line, coalescer)
+
+def handle_line(line, coalescer):
+    """Vote on one fast.log line (bytes) if it is an alert we cover"""
+    # Cheap SID lookup before any regex; lines of other rules are skipped
+    rule = None
+    if RULES:
+        rule = RULES.match(line)
+        if not rule:
+            return
+    elif b"CUSTOM ATTACK" not in line:
+        return
+
+    if coalescer:
+        alert = SuricataAlertParser.parse_fast_log(line)
+        if alert:
+            vote_incidents(coalescer.add(alert))
+        return
+
+    msg = rule['msg'] if rule and rule['msg'] else parse_line(line)  # The regex only without a rule table
+
+    # Deduplication check
+    now = time.time()
+    if msg in LAST_ALERT and (now - LAST_ALERT[msg] < DEDUP_SECONDS):
+        return
+    LAST_ALERT[msg] = now
+
+    # Display locally
+    console.print(Panel(
+        msg,
+        title=f"[bold cyan]{NODE_ID} ALERT[/bold cyan]",
+        border_style="cyan"
+    ))
+
+    # Queue vote for the coordinator
+    meta = RULES.metadata(line, rule) if RULES else alert_metadata(line)
+    queue_vote(msg, meta, fp=fingerprint_line(line))
+    console.print()
+
+if __name__ == "__main__":
+    main()
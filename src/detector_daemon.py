@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Byzantine Fault-Tolerant IDS - Multi-Detector Daemon
+Tails fast.log once, parses and fingerprints each alert once, and fans it
+out to several logical detectors listed in DETECTORS_FILE. Each logical
+detector has its own node ID, voting behaviour (lie_probability, 0 =
+honest), dedup window, coordinator target(s) and send queue, so one
+process replaces a detector_bft.py / detector_virtual.py per identity (and
+optionally the log forwarder).
+"""
+
+import os
+import json
+import time
+import random
+import re
+import socket
+import threading
+from pathlib import Path
+
+import requests
+from rich.console import Console
+
+from suricata_detector import SuricataAlertParser, SEVERITY_MAP
+from incidents import (IncidentCoalescer, COALESCE_WINDOW, incident_message,
+                       incident_summary)
+from fingerprint import fingerprint_line, rekey
+from vote_auth import VOTE_AUTH, COORDINATOR_KEY, vote_targets
+from admission import ShedBackoff
+from send_queue import PrioritySendQueue
+from rules import RuleTable
+from tail import ByteTailer, datagrams
+
+console = Console()
+
+# Configuration
+FAST_LOG = os.environ.get("FAST_LOG", "/usr/local/var/log/suricata/fast.log")
+DETECTORS_FILE = os.environ.get(
+    "DETECTORS_FILE", str(Path(__file__).resolve().parent.parent / "config" / "detectors.json"))
+COORD_URL = os.environ.get("COORDINATOR_URL", "http://192.168.1.236:5000")  # Default for every detector
+FORWARD_HOST = os.environ.get("FORWARD_HOST", "192.168.1.239")
+FORWARD_PORTS = [int(p) for p in os.environ.get("FORWARD_PORTS", "").split(",") if p]  # Also forward lines (log_forwarder)
+DEDUP_SECONDS = 3
+META_FIELDS = ('sid', 'src_ip', 'dst_ip', 'src_port', 'dst_port', 'protocol', 'priority')
+EXPIRE_INTERVAL = 0.2  # Seconds between checks for quiet incidents
+STATS_INTERVAL = 30    # Seconds between statistics reports
+
+FAST_LOG_RE = re.compile(rb'\[\*\*\]\s+\[[^\]]+\]\s+(.*?)\s+\[\*\*\]')
+
+
+class LogicalDetector:
+    """One detector identity: dedup, vote decision, send queue and senders"""
+
+    def __init__(self, node, coordinator_url=COORD_URL, coordinator_key=COORDINATOR_KEY,
+                 lie_probability=0.0, dedup_seconds=DEDUP_SECONDS, senders=1):
+        self.node = node
+        self.lie_probability = lie_probability
+        self.dedup_seconds = dedup_seconds
+        self.senders = senders
+        self.targets = vote_targets(node, coordinator_url, VOTE_AUTH == "required", coordinator_key)
+        self.outbox = PrioritySendQueue()
+        self.backoff = ShedBackoff()
+        self.last_alert = {}
+        self.session = threading.local()
+        self.lock = threading.Lock()
+        self.stats = {'alerts': 0, 'deduplicated': 0, 'lies': 0, 'votes_queued': 0,
+                      'votes_sent': 0, 'send_failures': 0, 'votes_shed': 0}
+
+    def offer(self, msg, meta, fp, severity, now):
+        """A parsed alert from the shared pipeline: dedup by message, then vote"""
+        self.stats['alerts'] += 1
+        if msg in self.last_alert and now - self.last_alert[msg] < self.dedup_seconds:
+            self.stats['deduplicated'] += 1
+            return
+        self.last_alert[msg] = now
+        self.vote(msg, meta, fp, severity)
+
+    def vote(self, msg, meta=None, fp=None, severity="MEDIUM", incident=None):
+        """Build this identity's vote (lying with lie_probability) and queue it"""
+        vote = {"node": self.node, "message": msg}
+        if self.lie_probability and random.random() < self.lie_probability:
+            # A lie names a different alert, so it must not share the real key
+            vote["message"] = "FAKE_" + msg
+            fp = rekey(fp, vote["message"]) if fp is not None else None
+            self.stats['lies'] += 1
+        if fp is not None:
+            vote["fingerprint"] = fp
+        if meta:
+            vote["alert"] = meta
+        if incident:
+            vote["incident"] = incident
+        if self.outbox.put(vote, severity):
+            self.stats['votes_queued'] += 1
+
+    def send_loop(self):
+        """Send queued votes, highest severity first"""
+        self.session.http = requests.Session()  # Keep-alive per sender thread
+        while True:
+            for severity, vote in self.outbox.get(limit=1):
+                ok = self.send(vote, severity)
+                with self.lock:
+                    self.stats['votes_sent' if ok else 'send_failures'] += 1
+
+    def send(self, vote, severity):
+        if not self.backoff.allow(severity):
+            return False
+        sent = False
+        for url, signer in self.targets:
+            try:
+                if signer:
+                    response = signer.post(self.session.http, url, vote, timeout=2)
+                else:
+                    response = self.session.http.post(url, json=vote, timeout=2)
+                if self.backoff.record(response):
+                    with self.lock:
+                        self.stats['votes_shed'] += 1
+                    continue
+                sent = True
+            except Exception:
+                pass
+        return sent
+
+    def start(self):
+        for _ in range(self.senders):
+            threading.Thread(target=self.send_loop, daemon=True).start()
+
+    def get_stats(self):
+        with self.lock:
+            snapshot = dict(self.stats)
+        snapshot['queue_depth'] = self.outbox.qsize()
+        snapshot['votes_held_back'] = self.backoff.held
+        return snapshot
+
+
+def load_detectors(path=DETECTORS_FILE):
+    """LogicalDetector per entry of a JSON list of {node, coordinator_url, coordinator_key,
+    lie_probability, dedup_seconds, senders}"""
+    with open(path) as f:
+        return [LogicalDetector(**entry) for entry in json.load(f)]
+
+
+def alert_fields(line, rules, rule=None, coalesce=False):
+    """Vote message, alert metadata, fingerprint and severity of a fast.log line (bytes), parsed once"""
+    if rule and rule['msg']:
+        msg = rule['msg']  # The regex only runs without a rule table
+    else:
+        match = FAST_LOG_RE.search(line)
+        msg = match.group(1).strip().decode('utf-8', 'replace') if match else "Unknown"
+    alert = None
+    if rule and not coalesce:
+        meta = rules.metadata(line, rule)  # Rule fields from the table, only the 5-tuple from the line
+    else:
+        alert = SuricataAlertParser.parse_fast_log(line)
+        meta = {field: alert[field] for field in META_FIELDS} if alert else None
+    severity = SEVERITY_MAP.get(meta['priority'], "MEDIUM") if meta else "MEDIUM"
+    return msg, meta, fingerprint_line(line), severity, alert
+
+
+def fan_out_incidents(detectors, incidents):
+    """One vote per closed incident from every logical detector"""
+    for incident in incidents:
+        msg = incident_message(incident)
+        meta = {field: incident['alert'][field] for field in META_FIELDS}
+        severity = SEVERITY_MAP.get(incident['alert']['priority'], "MEDIUM")
+        summary = incident_summary(incident)
+        for detector in detectors:
+            detector.vote(msg, meta, None, severity, summary)
+
+
+def report_loop(detectors):
+    while True:
+        time.sleep(STATS_INTERVAL)
+        for detector in detectors:
+            s = detector.get_stats()
+            console.print(f"[dim]{detector.node}: alerts={s['alerts']:,} votes={s['votes_sent']:,} "
+                          f"lies={s['lies']:,} queue={s['queue_depth']} failures={s['send_failures']:,}[/dim]")
+
+
+def main():
+    """Tail fast.log once and vote as every configured logical detector"""
+    detectors = load_detectors()
+    rules = RuleTable()  # SIDs voted on (RULES_FILES); empty falls back to the "CUSTOM ATTACK" check
+    console.print(f"[bold green]Detector daemon started: {len(detectors)} logical detectors[/bold green]")
+    console.print(f"[dim]Voting on {len(rules)} rule SIDs from {', '.join(rules.files) or 'no rule files'}[/dim]")
+    for detector in detectors:
+        role = f"lies {detector.lie_probability:.0%}" if detector.lie_probability else "honest"
+        console.print(f"[dim]  {detector.node} ({role}, dedup {detector.dedup_seconds}s) -> "
+                      f"{', '.join(url for url, _ in detector.targets)}[/dim]")
+        detector.start()
+
+    if not os.path.exists(FAST_LOG):
+        console.print(f"[red]ERROR: {FAST_LOG} not found![/red]")
+        exit(1)
+
+    forward = socket.socket(socket.AF_INET, socket.SOCK_DGRAM) if FORWARD_PORTS else None
+    coalescer = IncidentCoalescer() if COALESCE_WINDOW > 0 else None
+    last_expire = time.time()
+    threading.Thread(target=report_loop, args=(detectors,), daemon=True).start()
+
+    tailer = ByteTailer(FAST_LOG)  # Whole lines as bytes, starting at end of file
+    while True:
+        chunk = tailer.chunk()
+
+        if coalescer and time.time() - last_expire >= EXPIRE_INTERVAL:
+            fan_out_incidents(detectors, coalescer.expire())
+            last_expire = time.time()
+
+        if not chunk:
+            time.sleep(0.2)
+            continue
+
+        if forward:
+            # Raw slices of the chunk, as log_forwarder.py sends them
+            for datagram in datagrams(chunk):
+                for port in FORWARD_PORTS:
+                    forward.sendto(datagram, (FORWARD_HOST, port))
+
+        lines = chunk.split(b'\n')
+        lines.pop()  # Empty: the chunk ends in a newline
+        for line in lines:
+            rule = None
+            if rules:
+                rule = rules.match(line)
+                if not rule:
+                    continue
+            elif b"CUSTOM ATTACK" not in line:
+                continue
+
+            msg, meta, fp, severity, alert = alert_fields(line, rules, rule, coalescer is not None)
+            if coalescer:
+                if alert:
+                    fan_out_incidents(detectors, coalescer.add(alert))
+                continue
+
+            now = time.time()
+            for detector in detectors:
+                detector.offer(msg, meta, fp, severity, now)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,7 +4,10 @@ Byzantine Fault-Tolerant IDS - Byzantine (Faulty) Detector Node
 Simulates compromised detector that lies 30% of the time
 """
 
+import os
+import sys
 import socket
+import threading
 import time
 import re
 import requests
@@ -12,74 +15,291 @@ import random
 from rich.console import Console
 from rich.panel import Panel
 
+from suricata_detector import SuricataAlertParser, SEVERITY_MAP
+from incidents import (IncidentCoalescer, COALESCE_WINDOW, incident_message,
+                       incident_summary)
+from fingerprint import fingerprint_line, rekey
+from vote_auth import VOTE_AUTH, vote_targets
+from admission import ShedBackoff
+from send_queue import PrioritySendQueue
+from rules import RuleTable
+from hot_config import HotConfig, text, probability, positive_number
+from profiling import StatsServer
+
 console = Console()
 
 # Configuration
-COORD_URL = "http://192.168.1.236:5000/alert"
-NODE_ID = "rp8-virtual"
+COORD_URL = os.environ.get("COORDINATOR_URL", "http://192.168.1.236:5000")  # Comma-separated for replicas
+NODE_ID = os.environ.get("NODE_ID", "rp8-virtual")
 LAST_ALERT = {}
 DEDUP_SECONDS = 3
-PORT = 9998  # Listen on different port than physical rp8
-LIE_PROBABILITY = 0.30  # 30% chance of lying
+PORT = int(os.environ.get("LISTEN_PORT", 9998))  # Listen on different port than physical rp8
+LIE_PROBABILITY = float(os.environ.get("LIE_PROBABILITY", 0.30))  # 30% chance of lying
 
-def send_vote(msg):
-    """Send vote to Byzantine coordinator"""
-    try:
-        requests.post(
-            COORD_URL,
-            json={"node": NODE_ID, "message": msg},
-            timeout=2
-        )
+# Receiver tuning
+RCVBUF_BYTES = 8 * 1024 * 1024  # Kernel receive buffer (default ~200KB overflows in bursts)
+VOTE_QUEUE_SIZE = 10000         # Votes waiting for HTTP before the lowest severity is dropped
+SENDER_THREADS = 4              # Parallel HTTP senders draining the vote queue
+STATS_INTERVAL = 30             # Seconds between receiver statistics reports
+EXPIRE_INTERVAL = 0.2           # Seconds between checks for quiet incidents
+STATS_SOCKET = os.environ.get("STATS_SOCKET", "")  # Unix socket for stats/reload ("" = off)
+
+FAST_LOG_RE = re.compile(r'\[\*\*\]\s+\[[^\]]+\]\s+(.*?)\s+\[\*\*\]')
+FAST_LOG_RE_B = re.compile(FAST_LOG_RE.pattern.encode())
+PRIORITY_RE = re.compile(rb'\[Priority: (\d+)\]')
+
+# Receiver/sender counters (kernel drops are read from /proc on demand)
+STATS = {
+    'datagrams': 0,
+    'lines': 0,
+    'alerts': 0,
+    'deduplicated': 0,
+    'incidents': 0,
+    'votes_queued': 0,
+    'votes_sent': 0,
+    'send_failures': 0,
+    'votes_shed': 0,
+}
+_stats_lock = threading.Lock()
+vote_queue = PrioritySendQueue(capacity=VOTE_QUEUE_SIZE)  # Highest severity is sent first
+_session = threading.local()
+coalescer = IncidentCoalescer() if COALESCE_WINDOW > 0 else None
+TARGETS = vote_targets(NODE_ID, COORD_URL, VOTE_AUTH == "required")  # (alert URL, signer) per replica
+backoff = ShedBackoff()  # Holds back votes the overloaded coordinator is shedding
+RULES = RuleTable()  # SIDs voted on (RULES_FILES); empty falls back to the "CUSTOM ATTACK" check
+
+
+def apply_config(changed):
+    """Rebuild the vote targets when the coordinator or node ID changes"""
+    global TARGETS
+    if 'COORDINATOR_URL' in changed or 'NODE_ID' in changed:
+        TARGETS = vote_targets(NODE_ID, COORD_URL, VOTE_AUTH == "required")
+
+# Reloadable from CONFIG_FILE on SIGHUP (or `reload` on the stats socket);
+# queued votes keep the node ID and targets they were built with
+config = HotConfig(sys.modules[__name__], {
+    'COORDINATOR_URL': ('COORD_URL', text),
+    'NODE_ID': ('NODE_ID', text),
+    'LIE_PROBABILITY': ('LIE_PROBABILITY', probability),
+    'DEDUP_SECONDS': ('DEDUP_SECONDS', positive_number),
+}, apply=apply_config)
+
+
+def send_vote(msg, extra=None, severity="MEDIUM", node=None, targets=None):
+    """Send vote to Byzantine coordinator (extra: optional incident fields)"""
+    if not hasattr(_session, 'http'):
+        _session.http = requests.Session()  # Keep-alive per sender thread
+    vote = dict(extra or {}, node=node or NODE_ID, message=msg)
+    if not backoff.allow(severity):
+        return False
+    sent = False
+    for url, signer in targets or TARGETS:
+        try:
+            if signer:
+                response = signer.post(_session.http, url, vote, timeout=2)
+            else:
+                response = _session.http.post(url, json=vote, timeout=2)
+            if backoff.record(response):
+                with _stats_lock:
+                    STATS['votes_shed'] += 1
+                continue
+            sent = True
+        except Exception:
+            pass
+    if sent:
         console.print("[green]✓ Vote sent to coordinator[/green]")
-    except:
+    else:
         console.print("[red]✗ FAILED to send vote[/red]")
+    return sent
 
 def parse_line(line):
-    """Extract alert message from Suricata fast.log format"""
-    match = re.search(r'\[\*\*\]\s+\[[^\]]+\]\s+(.*?)\s+\[\*\*\]', line)
+    """Extract alert message from Suricata fast.log format (str or bytes; only the message is decoded)"""
+    if isinstance(line, bytes):
+        match = FAST_LOG_RE_B.search(line)
+        return match.group(1).strip().decode('utf-8', 'replace') if match else "Unknown"
+    match = FAST_LOG_RE.search(line)
     return match.group(1).strip() if match else "Unknown"
 
-# Startup
-console.print(f"[bold red]{NODE_ID} Started (Byzantine Mode)[/bold red]")
-console.print(f"[bold red]This node will lie {int(LIE_PROBABILITY*100)}% of the time[/bold red]\n")
-
-# UDP socket for receiving forwarded logs
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-sock.bind(("0.0.0.0", PORT))
-
-# Main Byzantine loop
-while True:
-    data, addr = sock.recvfrom(4096)
-    line = data.decode("utf-8").strip()
-    
-    if "CUSTOM ATTACK" not in line:
-        continue
-    
-    msg = parse_line(line)
-    
+def kernel_drops(port=PORT):
+    """Datagrams the kernel dropped on our socket (receive buffer overflow)"""
+    try:
+        with open("/proc/net/udp") as f:
+            next(f)  # Header
+            for row in f:
+                fields = row.split()
+                if int(fields[1].split(':')[1], 16) == port:
+                    return int(fields[-1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None  # Not Linux, or socket not found
+
+def get_stats():
+    """Snapshot of receiver, sender and kernel drop counters"""
+    with _stats_lock:
+        snapshot = dict(STATS)
+    snapshot['queue_depth'] = vote_queue.qsize()
+    snapshot['app_drops'] = sum(vote_queue.stats['dropped'].values())
+    snapshot['votes_held_back'] = backoff.held
+    snapshot['kernel_drops'] = kernel_drops()
+    snapshot['config'] = config.status()
+    return snapshot
+
+
+def decide_vote(msg):
+    """Byzantine decision: returns (vote, lied) for a real alert message"""
+    if random.random() < LIE_PROBABILITY:
+        return "FAKE_" + msg, True
+    return msg, False
+
+def handle_line(raw):
+    """Filter, parse, dedup and enqueue a single forwarded log line (bytes, never decoded whole)"""
+    STATS['lines'] += 1
+
+    # Cheap SID lookup before decoding or running the regex
+    rule = None
+    if RULES:
+        rule = RULES.match(raw)
+        if not rule:
+            return
+    elif b"CUSTOM ATTACK" not in raw:
+        return
+
+    STATS['alerts'] += 1
+    if rule and rule['priority']:
+        severity = SEVERITY_MAP.get(rule['priority'], "MEDIUM")
+    else:
+        priority = PRIORITY_RE.search(raw)
+        severity = SEVERITY_MAP.get(int(priority.group(1)), "MEDIUM") if priority else "MEDIUM"
+    if coalescer:
+        alert = SuricataAlertParser.parse_fast_log(raw)
+        if alert:
+            queue_incidents(coalescer.add(alert))
+        return
+
+    msg = rule['msg'] if rule and rule['msg'] else parse_line(raw)  # Only the message is decoded
+
     # Deduplication check
     now = time.time()
     if msg in LAST_ALERT and now - LAST_ALERT[msg] < DEDUP_SECONDS:
-        continue
+        STATS['deduplicated'] += 1
+        return
     LAST_ALERT[msg] = now
-    
-    # Byzantine decision: Lie or be honest?
-    if random.random() < LIE_PROBABILITY:
-        # BYZANTINE BEHAVIOR: Lie about the alert
-        fake = "FAKE_" + msg
-        console.print(Panel(
-            f"[red]Lying![/red]\nReal={msg}\nFake={fake}",
-            title=f"{NODE_ID} (Byzantine)",
-            border_style="red",
-        ))
-        send_vote(fake)
-        console.print()
-    else:
-        # HONEST BEHAVIOR: Report accurate alert
-        console.print(Panel(
-            msg,
-            title=f"{NODE_ID} ALERT",
-            border_style="cyan",
-        ))
-        send_vote(msg)
+    fp = fingerprint_line(raw)
+    queue_vote(msg, {'fingerprint': fp} if fp is not None else None, severity)
+
+
+def queue_vote(msg, extra=None, severity="MEDIUM"):
+    """Make the Byzantine decision and hand the vote to the senders"""
+    vote, lied = decide_vote(msg)
+    if lied and extra and 'fingerprint' in extra:
+        # A lie names a different alert, so it must not share the real key
+        extra = dict(extra, fingerprint=rekey(extra['fingerprint'], vote))
+    with config.lock:
+        node, targets = NODE_ID, TARGETS
+    if vote_queue.put((msg, vote, lied, extra, node, targets), severity):
+        STATS['votes_queued'] += 1
+
+
+def queue_incidents(incidents):
+    """One vote per closed incident"""
+    for incident in incidents:
+        STATS['incidents'] += 1
+        queue_vote(incident_message(incident), {'incident': incident_summary(incident)},
+                   SEVERITY_MAP.get(incident['alert']['priority'], "MEDIUM"))
+
+
+def expire_loop():
+    """Close incidents that went quiet (the receive thread blocks in recv)"""
+    while True:
+        time.sleep(EXPIRE_INTERVAL)
+        queue_incidents(coalescer.expire())
+
+
+def receive_loop(sock):
+    """Receive forwarded fast.log datagrams (one or more lines each)"""
+    while True:
+        data = sock.recv(65535)
+        STATS['datagrams'] += 1
+        for raw in data.splitlines():
+            if raw:
+                handle_line(raw)
+
+
+def vote_sender():
+    """Drain the vote queue so HTTP latency never stalls the receiver"""
+    while True:
+        [(severity, (msg, vote, lied, extra, node, targets))] = vote_queue.get(limit=1)
+
+        if lied:
+            # BYZANTINE BEHAVIOR: Lie about the alert
+            console.print(Panel(
+                f"[red]Lying![/red]\nReal={msg}\nFake={vote}",
+                title=f"{node} (Byzantine)",
+                border_style="red",
+            ))
+        else:
+            # HONEST BEHAVIOR: Report accurate alert
+            console.print(Panel(
+                msg,
+                title=f"{node} ALERT",
+                border_style="cyan",
+            ))
+
+        ok = send_vote(vote, extra, severity, node, targets)
+        with _stats_lock:
+            STATS['votes_sent' if ok else 'send_failures'] += 1
         console.print()
+
+def open_socket(port=PORT):
+    """Bind the UDP socket with an enlarged receive buffer"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        # SO_RCVBUFFORCE ignores net.core.rmem_max but needs CAP_NET_ADMIN
+        sock.setsockopt(socket.SOL_SOCKET, getattr(socket, 'SO_RCVBUFFORCE', 33), RCVBUF_BYTES)
+    except OSError:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_BYTES)
+    sock.bind(("0.0.0.0", port))
+    return sock
+
+def main():
+    """Start the receive thread and vote senders, then report statistics"""
+    config.load()
+    config.install_signal()
+    if STATS_SOCKET:
+        server = StatsServer(STATS_SOCKET, get_stats, {'reload': config.reload})
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Startup
+    console.print(f"[bold red]{NODE_ID} Started (Byzantine Mode)[/bold red]")
+    console.print(f"[bold red]This node will lie {int(LIE_PROBABILITY*100)}% of the time[/bold red]\n")
+
+    # UDP socket for receiving forwarded logs
+    sock = open_socket()
+    rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+    console.print(f"[dim]Listening on UDP {PORT} (SO_RCVBUF={rcvbuf:,} bytes)[/dim]")
+    console.print(f"[dim]Voting on {len(RULES)} rule SIDs from {', '.join(RULES.files) or 'no rule files'}[/dim]\n")
+
+    # A dedicated blocking receive thread keeps up with bursts far better than
+    # an event loop that pays scheduling overhead per datagram
+    threading.Thread(target=receive_loop, args=(sock,), daemon=True).start()
+    if coalescer:
+        console.print(f"[dim]Coalescing alerts into incidents ({COALESCE_WINDOW}s window)[/dim]\n")
+        threading.Thread(target=expire_loop, daemon=True).start()
+    for _ in range(SENDER_THREADS):
+        threading.Thread(target=vote_sender, daemon=True).start()
+
+    try:
+        while True:
+            time.sleep(STATS_INTERVAL)
+            s = get_stats()
+            console.print(
+                f"[dim]lines={s['lines']:,} alerts={s['alerts']:,} votes={s['votes_sent']:,} "
+                f"queue={s['queue_depth']} app_drops={s['app_drops']:,} "
+                f"kernel_drops={s['kernel_drops']}[/dim]"
+            )
+    except KeyboardInterrupt:
+        console.print(f"\n[yellow]{NODE_ID} stopped: {get_stats()}[/yellow]")
+
+
+if __name__ == "__main__":
+    main()
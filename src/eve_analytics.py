@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Offline eve.json Analytics
+Streams large (optionally gzip-compressed) eve.json archives in fixed-size
+chunks, decodes only alert records and builds the dashboard breakdowns plus
+per-hour histograms with vectorized pandas group-bys. Memory stays bounded
+by the chunk size and the top-N summary capacity, not by the archive size.
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import argparse
+from pathlib import Path
+from collections import Counter
+
+import pandas as pd
+
+from suricata_detector import SuricataAlertParser, SEVERITY_MAP
+from heavy_hitters import make_top_counter
+
+CHUNK_BYTES = 32 * 1024 * 1024   # Bytes read per chunk
+TOP_N = 20                       # Rows in each top-N table of the report
+TOP_N_CAPACITY = 10000           # Space-Saving capacity for the top-N tables (0 = exact)
+
+# DataFrame column -> (eve.json top-level key | ('alert', key))
+FIELDS = {
+    'timestamp': 'timestamp',
+    'src_ip': 'src_ip',
+    'dst_ip': 'dest_ip',
+    'dst_port': 'dest_port',
+    'protocol': 'proto',
+    'sid': ('alert', 'signature_id'),
+    'signature': ('alert', 'signature'),
+    'classification': ('alert', 'category'),
+    'priority': ('alert', 'severity'),
+}
+
+
+def open_binary(path):
+    """Plain or gzip-compressed archive as a binary stream"""
+    if str(path).endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_chunks(stream, chunk_bytes=CHUNK_BYTES):
+    """Yield (lines, bytes_read) per chunk; a trailing partial line carries over"""
+    partial = b""
+    while True:
+        block = stream.read(chunk_bytes)
+        if not block:
+            break
+        lines = (partial + block).split(b"\n")
+        partial = lines.pop()
+        yield lines, len(block)
+    if partial:
+        yield [partial], 0
+
+
+def decode_alerts(lines):
+    """Column lists for the alert records in a chunk (other event types skipped)"""
+    # Flow/stats/dns records are skipped without paying for JSON decoding
+    candidates = [line for line in lines if b'"alert"' in line]
+    try:
+        # One C-level decode per chunk instead of one json.loads per line
+        records = json.loads(b"[" + b",".join(candidates) + b"]")
+    except ValueError:
+        records = []
+        for line in candidates:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue  # Truncated or corrupt line
+    
+    records = [r for r in records if r.get('event_type') == 'alert']
+    alerts = [r.get('alert') or {} for r in records]
+    return {
+        name: [a.get(key[1]) for a in alerts] if isinstance(key, tuple)
+        else [r.get(key) for r in records]
+        for name, key in FIELDS.items()
+    }
+
+
+class EveAnalytics:
+    """Running breakdowns over any number of chunks"""
+
+    def __init__(self, top_n=TOP_N, capacity=TOP_N_CAPACITY):
+        self.top_n = top_n
+        self.totals = Counter()
+        self.by_severity = Counter()
+        self.by_category = Counter()
+        self.by_protocol = Counter()
+        self.hourly = Counter()            # 'YYYY-MM-DDTHH' -> alerts
+        self.hourly_severity = Counter()   # ('YYYY-MM-DDTHH', severity) -> alerts
+        self.hourly_category = Counter()   # ('YYYY-MM-DDTHH', category) -> alerts
+        self.categories = {}               # (signature, classification) -> category
+        self.top = {
+            'signatures': make_top_counter(capacity),
+            'sources': make_top_counter(capacity),
+            'destinations': make_top_counter(capacity),
+            'sids': make_top_counter(capacity),
+        }
+
+    def add_chunk(self, lines, nbytes):
+        """Decode one chunk and fold its group-by counts into the totals"""
+        self.totals['bytes'] += nbytes
+        self.totals['lines'] += len(lines)
+        frame = pd.DataFrame(decode_alerts(lines))
+        if frame.empty:
+            return
+        self.totals['alerts'] += len(frame)
+
+        frame['priority'] = pd.to_numeric(frame['priority'], errors='coerce').fillna(5).astype(int)
+        frame['severity'] = frame['priority'].map(SEVERITY_MAP).fillna("INFO")
+        frame['signature'] = frame['signature'].fillna("Unknown")
+        frame['classification'] = frame['classification'].fillna("Unknown")
+        frame['protocol'] = frame['protocol'].fillna("N/A")
+        frame['sid'] = pd.to_numeric(frame['sid'], errors='coerce').astype('Int64')
+        # ISO-8601 timestamps: the first 13 characters are the hour bucket
+        frame['hour'] = frame['timestamp'].fillna("").str.slice(0, 13)
+
+        # Categorize each distinct (signature, classification) once, not per alert
+        pairs = frame[['signature', 'classification']].drop_duplicates()
+        categories = []
+        for sig, cls in zip(pairs['signature'].tolist(), pairs['classification'].tolist()):
+            if (sig, cls) not in self.categories:
+                self.categories[(sig, cls)] = SuricataAlertParser.categorize_attack(sig, cls)
+            categories.append(self.categories[(sig, cls)])
+        pairs['category'] = categories
+        frame = frame.merge(pairs, on=['signature', 'classification'], how='left')
+
+        self.by_severity.update(frame['severity'].value_counts().to_dict())
+        self.by_category.update(frame['category'].value_counts().to_dict())
+        self.by_protocol.update(frame['protocol'].value_counts().to_dict())
+        self.hourly.update(frame['hour'].value_counts().to_dict())
+        self.hourly_severity.update(frame.groupby(['hour', 'severity']).size().to_dict())
+        self.hourly_category.update(frame.groupby(['hour', 'category']).size().to_dict())
+
+        # Pre-counted per chunk, so each summary sees one add per distinct key
+        for table, column in (('signatures', 'signature'), ('sources', 'src_ip'),
+                              ('destinations', 'dst_ip'), ('sids', 'sid')):
+            for key, count in frame[column].dropna().value_counts().items():
+                self.top[table].add(key.item() if hasattr(key, 'item') else key, int(count))
+
+    def hourly_frame(self):
+        """One row per hour: total plus a column per severity and category"""
+        hours = sorted(self.hourly)
+        frame = pd.DataFrame({'hour': hours, 'alerts': [self.hourly[h] for h in hours]})
+        for counts in (self.hourly_severity, self.hourly_category):
+            for name in sorted({key for _, key in counts}):
+                frame[name] = [counts.get((h, name), 0) for h in hours]
+        return frame
+
+    def report(self, elapsed):
+        """Report dict (JSON-serializable)"""
+        mb = self.totals['bytes'] / 1048576
+        return {
+            'bytes': self.totals['bytes'],
+            'lines': self.totals['lines'],
+            'alerts': self.totals['alerts'],
+            'seconds': round(elapsed, 3),
+            'mb_per_sec': round(mb / elapsed, 1) if elapsed else None,
+            'by_severity': dict(self.by_severity.most_common()),
+            'by_category': dict(self.by_category.most_common()),
+            'by_protocol': dict(self.by_protocol.most_common()),
+            'top': {
+                table: [{'key': key, 'count': count, 'max_error': counter.error(key)}
+                        for key, count in counter.most_common(self.top_n)]
+                for table, counter in self.top.items()
+            },
+            'hourly': self.hourly_frame().to_dict(orient='records'),
+        }
+
+
+def analyze(paths, chunk_bytes=CHUNK_BYTES, top_n=TOP_N, capacity=TOP_N_CAPACITY, progress=False):
+    """Run every archive through one EveAnalytics and return (analytics, elapsed)"""
+    analytics = EveAnalytics(top_n, capacity)
+    started = time.perf_counter()
+    for path in paths:
+        with open_binary(path) as stream:
+            for lines, nbytes in read_chunks(stream, chunk_bytes):
+                analytics.add_chunk(lines, nbytes)
+                if progress:
+                    elapsed = time.perf_counter() - started
+                    mb = analytics.totals['bytes'] / 1048576
+                    print(f"\r{path}: {mb:,.0f} MB, {analytics.totals['alerts']:,} alerts, "
+                          f"{mb / elapsed if elapsed else 0:,.1f} MB/s", end='', file=sys.stderr)
+    if progress:
+        print(file=sys.stderr)
+    return analytics, time.perf_counter() - started
+
+
+def write_csv(analytics, directory, top_n):
+    """hourly.csv, breakdowns.csv and top_<table>.csv in directory"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    analytics.hourly_frame().to_csv(directory / "hourly.csv", index=False)
+    rows = [(dimension, key, count)
+            for dimension, counts in (('severity', analytics.by_severity),
+                                      ('category', analytics.by_category),
+                                      ('protocol', analytics.by_protocol))
+            for key, count in counts.most_common()]
+    pd.DataFrame(rows, columns=['dimension', 'value', 'alerts']).to_csv(
+        directory / "breakdowns.csv", index=False)
+    for table, counter in analytics.top.items():
+        pd.DataFrame(
+            [(key, count, counter.error(key)) for key, count in counter.most_common(top_n)],
+            columns=['key', 'alerts', 'max_error']
+        ).to_csv(directory / f"top_{table}.csv", index=False)
+
+
+def print_summary(report):
+    """Console summary of a report"""
+    print("\n" + "="*80)
+    print("📊 EVE.JSON ANALYTICS")
+    print("="*80)
+    print(f"Input            : {report['bytes'] / 1048576:,.1f} MB, {report['lines']:,} lines")
+    print(f"Alerts           : {report['alerts']:,}")
+    print(f"Throughput       : {report['mb_per_sec']} MB/s ({report['seconds']}s)")
+    print(f"By Severity      : {report['by_severity']}")
+    print(f"By Category      : {report['by_category']}")
+    print(f"By Protocol      : {report['by_protocol']}")
+    for table, rows in report['top'].items():
+        shown = ", ".join(f"{r['key']} ({r['count']:,})" for r in rows[:5])
+        print(f"Top {table:<13}: {shown}")
+    print(f"Hours Covered    : {len(report['hourly'])}")
+    print("="*80 + "\n")
+
+
+def main():
+    """Analyze eve.json archives from the command line"""
+    parser = argparse.ArgumentParser(description="Batch analytics for eve.json archives")
+    parser.add_argument("files", nargs="+", help="eve.json files (.gz supported)")
+    parser.add_argument("--json", help="Write the full report to this JSON file")
+    parser.add_argument("--csv", metavar="DIR", help="Write CSV tables to this directory")
+    parser.add_argument("--chunk-mb", type=int, default=CHUNK_BYTES // 1048576,
+                        help=f"Chunk size in MB (default: {CHUNK_BYTES // 1048576})")
+    parser.add_argument("--top", type=int, default=TOP_N, help=f"Top-N rows (default: {TOP_N})")
+    parser.add_argument("--capacity", type=int, default=TOP_N_CAPACITY,
+                        help=f"Top-N summary capacity, 0 for exact counts (default: {TOP_N_CAPACITY})")
+    parser.add_argument("--quiet", action="store_true", help="No progress line")
+    args = parser.parse_args()
+
+    missing = [f for f in args.files if not os.path.exists(f)]
+    if missing:
+        print(f"ERROR: not found: {', '.join(missing)}")
+        return 1
+
+    analytics, elapsed = analyze(args.files, args.chunk_mb * 1048576, args.top,
+                                 args.capacity, progress=not args.quiet)
+    report = analytics.report(elapsed)
+    print_summary(report)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json}")
+    if args.csv:
+        write_csv(analytics, args.csv, args.top)
+        print(f"CSV tables written to {args.csv}/")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
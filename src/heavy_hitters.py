@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Heavy-Hitter Counters
+Bounded-memory top-N tracking for dashboard tables (signatures, sources,
+destinations) that stay small during spoofed-source floods
+"""
+
+import math
+from heapq import heappush, heapreplace, nlargest
+from collections import Counter
+from operator import itemgetter
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy-hitter summary (Metwally, Agrawal, El Abbadi 2005).
+
+    Tracks at most `capacity` keys. A reported count overestimates the true
+    count by at most error(key), which never exceeds total / capacity, so any
+    key whose true share of the stream is above 1/capacity is guaranteed to
+    be tracked. Pass `epsilon` instead of `capacity` to size for an error
+    bound of epsilon * total.
+    """
+
+    def __init__(self, capacity=1000, epsilon=None):
+        if epsilon:
+            capacity = math.ceil(1.0 / epsilon)
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.total = 0
+        self.evictions = 0
+        self.counts = {}   # key -> estimated count
+        self.errors = {}   # key -> maximum overestimation of that count
+        self.heap = []     # (count, key); counts may be stale (lower than actual)
+
+    def add(self, key, count=1):
+        """Count one occurrence of key (amortized O(1), O(log capacity) on eviction)"""
+        self.total += count
+        counts = self.counts
+
+        if key in counts:
+            counts[key] += count
+            return
+
+        if len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = 0
+            heappush(self.heap, (count, key))
+            return
+
+        # Find the true minimum; stale heap entries are refreshed lazily
+        heap = self.heap
+        while True:
+            low, victim = heap[0]
+            actual = counts[victim]
+            if low == actual:
+                break
+            heapreplace(heap, (actual, victim))
+
+        # The newcomer inherits the evicted count as its error bound
+        del counts[victim]
+        del self.errors[victim]
+        self.evictions += 1
+        counts[key] = low + count
+        self.errors[key] = low
+        heapreplace(heap, (low + count, key))
+
+    def most_common(self, n=None):
+        """Top n (key, estimated count) pairs, largest first"""
+        if n is None:
+            return sorted(self.counts.items(), key=itemgetter(1), reverse=True)
+        return nlargest(n, self.counts.items(), key=itemgetter(1))
+
+    def error(self, key):
+        """Maximum overestimation of key's reported count"""
+        return self.errors.get(key, 0)
+
+    def error_bound(self):
+        """Maximum overestimation of any reported count (0 until a key has been evicted)"""
+        return self.total / self.capacity if self.evictions else 0
+
+    def __getitem__(self, key):
+        return self.counts.get(key, 0)
+
+    def __contains__(self, key):
+        return key in self.counts
+
+    def __len__(self):
+        return len(self.counts)
+
+
+class ExactCounter(Counter):
+    """Unbounded exact counts with the SpaceSaving interface (small deployments)"""
+
+    def add(self, key, count=1):
+        self[key] += count
+
+    def error(self, key):
+        return 0
+
+    def error_bound(self):
+        return 0
+
+
+def make_top_counter(capacity=1000, epsilon=None):
+    """SpaceSaving summary, or an ExactCounter when capacity is 0/None"""
+    if not capacity and not epsilon:
+        return ExactCounter()
+    return SpaceSaving(capacity, epsilon)
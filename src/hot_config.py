@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Hot Configuration Reload
+Settings that were fixed at start-up (coordinator address, node ID,
+thresholds, log paths, LIE_PROBABILITY) can be set in CONFIG_FILE, a JSON
+object of setting -> value, and reloaded with SIGHUP or an admin command.
+A reload validates every value before touching anything, then applies them
+all at once under the component's lock; if applying fails the old values
+are restored. Tail positions, dedup tables, statistics, pending votes and
+open connections are left alone.
+"""
+
+import os
+import json
+import math
+import time
+import signal
+import threading
+
+CONFIG_FILE = os.environ.get("CONFIG_FILE", "")
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def positive_int(value):
+    if isinstance(value, bool) or not math.isfinite(value) or int(value) != value or value < 1:
+        raise ValueError(f"expected a positive integer, got {value!r}")
+    return int(value)
+
+
+def positive_number(value):
+    if isinstance(value, bool) or not math.isfinite(float(value)) or float(value) <= 0:
+        raise ValueError(f"expected a positive number, got {value!r}")
+    return float(value)
+
+
+def probability(value):
+    if isinstance(value, bool) or not 0 <= float(value) <= 1:
+        raise ValueError(f"expected a probability between 0 and 1, got {value!r}")
+    return float(value)
+
+
+def port(value):
+    if positive_int(value) > 65535:
+        raise ValueError(f"expected a TCP port, got {value!r}")
+    return int(value)
+
+
+def text(value):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"expected a non-empty string, got {value!r}")
+    return value.strip()
+
+
+def existing_file(value):
+    if not os.path.isfile(text(value)):
+        raise ValueError(f"no such file: {value!r}")
+    return value.strip()
+
+
+class HotConfig:
+    """Reloadable module-level settings of one component"""
+
+    def __init__(self, module, settings, lock=None, apply=None, path=CONFIG_FILE):
+        self.module = module          # Module whose globals hold the settings
+        self.settings = settings      # Config key -> (module attribute, validator)
+        self.lock = lock or threading.RLock()  # Held while values change; readers of several settings take it too
+        self.apply = apply            # Called with {key: value} of changed settings to update derived state
+        self.path = path
+        self.stats = {'reloads': 0, 'applied': 0, 'rejected': 0, 'last': None}
+
+    def read(self):
+        """Validated {key: value} from the config file (raises ConfigError)"""
+        if not self.path:
+            raise ConfigError("CONFIG_FILE is not set")
+        with open(self.path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ConfigError("config must be a JSON object")
+        unknown = sorted(set(data) - set(self.settings))
+        if unknown:
+            raise ConfigError(f"unknown or not reloadable: {', '.join(unknown)}")
+        values = {}
+        for key, value in data.items():
+            try:
+                values[key] = self.settings[key][1](value)
+            except (TypeError, ValueError, ArithmeticError) as e:
+                raise ConfigError(f"{key}: {e}")
+        return values
+
+    def reload(self):
+        """Apply the config file; returns {'status': applied|rejected, 'changed', 'error', 'ms'}"""
+        started = time.perf_counter()
+        changed, error = {}, None
+        try:
+            values = self.read()
+            with self.lock:
+                old = {key: getattr(self.module, self.settings[key][0]) for key in values}
+                changed = {key: value for key, value in values.items() if old[key] != value}
+                self.set(changed)
+                try:
+                    if changed and self.apply:
+                        self.apply(changed)
+                except Exception as e:
+                    rollback = {key: old[key] for key in changed}
+                    self.set(rollback)
+                    try:
+                        self.apply(rollback)
+                    except Exception:
+                        pass  # Typically the same refusal; the old values worked before the reload
+                    raise ConfigError(f"rolled back: {e}")
+        except (OSError, ValueError) as e:
+            changed, error = {}, str(e)
+        result = {'status': "rejected" if error else "applied", 'changed': sorted(changed), 'error': error,
+                  'ms': round((time.perf_counter() - started) * 1000, 3)}
+        self.stats['reloads'] += 1
+        self.stats['rejected' if error else 'applied'] += 1
+        self.stats['last'] = result
+        if error:
+            print(f"[CONFIG] {self.path} rejected: {error}")
+        else:
+            print(f"[CONFIG] {self.path} applied {result['changed'] or 'no changes'} in {result['ms']} ms")
+        return result
+
+    def set(self, values):
+        for key, value in values.items():
+            setattr(self.module, self.settings[key][0], value)
+
+    def load(self):
+        """Apply CONFIG_FILE at start-up, if set; a bad file stops the component"""
+        if self.path and self.reload()['status'] != "applied":
+            raise SystemExit(f"Invalid CONFIG_FILE {self.path}: {self.stats['last']['error']}")
+
+    def install_signal(self):
+        """Reload on SIGHUP (from a thread, so the handler never waits on a lock the main thread holds)"""
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: threading.Thread(
+                target=self.reload, daemon=True).start())
+
+    def status(self):
+        return dict(self.stats, file=self.path or None,
+                    values={key: getattr(self.module, attr) for key, (attr, _) in self.settings.items()})
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Incident Coalescing
+Groups alerts by (sid, src_ip, destination subnet) so a port scan or flood
+becomes one incident vote carrying a count, first/last seen times and a few
+sample alerts, instead of thousands of near-identical votes.
+"""
+
+import os
+import time
+import ipaddress
+import threading
+from functools import lru_cache
+
+# An incident closes after WINDOW seconds without a matching alert, when it
+# reaches MAX_ALERTS alerts, or MAX_SECONDS after it opened (long floods
+# still report periodically). COALESCE_WINDOW=0 keeps one vote per alert.
+COALESCE_WINDOW = float(os.environ.get("COALESCE_WINDOW", 0))
+MAX_ALERTS = int(os.environ.get("INCIDENT_MAX_ALERTS", 1000))
+MAX_SECONDS = float(os.environ.get("INCIDENT_MAX_SECONDS", 10))
+SUBNET_PREFIX = int(os.environ.get("INCIDENT_SUBNET_PREFIX", 24))
+SAMPLES = 3  # Alerts kept as evidence per incident
+
+
+@lru_cache(maxsize=65536)
+def subnet_of(ip, prefix=SUBNET_PREFIX):
+    """'192.168.1.37' -> '192.168.1.0/24' (unparsable addresses are returned as-is)"""
+    try:
+        return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+    except ValueError:
+        return str(ip)
+
+
+def incident_message(incident):
+    """Vote message for an incident; identical on every node that saw it"""
+    return f"{incident['signature']} [{incident['src_ip']} -> {incident['dst_net']}]"
+
+
+class IncidentCoalescer:
+    """Open incidents keyed by (sid, src_ip, dst subnet), oldest first"""
+
+    def __init__(self, window=COALESCE_WINDOW, max_alerts=MAX_ALERTS,
+                 max_seconds=MAX_SECONDS, prefix=SUBNET_PREFIX):
+        self.window = window
+        self.max_alerts = max_alerts
+        self.max_seconds = max_seconds
+        self.prefix = prefix
+        self.lock = threading.Lock()   # add() and expire() may run on different threads
+        self.open = {}                 # key -> incident, in opening order
+        self.stats = {'alerts': 0, 'incidents': 0}
+
+    def add(self, alert, now=None):
+        """Fold a parsed alert into its incident; returns incidents closed by the size cap"""
+        now = time.time() if now is None else now
+        dst_net = subnet_of(alert['dst_ip'], self.prefix)
+        key = (alert['sid'], alert['src_ip'], dst_net)
+        with self.lock:
+            self.stats['alerts'] += 1
+            incident = self.open.get(key)
+            if incident is None:
+                incident = self.open[key] = {
+                    'sid': alert['sid'],
+                    'signature': alert['signature'],
+                    'src_ip': alert['src_ip'],
+                    'dst_net': dst_net,
+                    'count': 0,
+                    'first_seen': now,
+                    'last_seen': now,
+                    'samples': [],
+                    'alert': alert,   # First alert, sent as the vote's metadata
+                }
+            incident['count'] += 1
+            incident['last_seen'] = now
+            if len(incident['samples']) < SAMPLES:
+                incident['samples'].append({
+                    'timestamp': alert.get('timestamp'),
+                    'src_port': alert.get('src_port'),
+                    'dst_ip': alert['dst_ip'],
+                    'dst_port': alert.get('dst_port'),
+                })
+            if incident['count'] >= self.max_alerts:
+                return [self.close(key)]
+        return []
+
+    def expire(self, now=None):
+        """Close incidents that went quiet for `window` or stayed open too long"""
+        now = time.time() if now is None else now
+        with self.lock:
+            done = [key for key, inc in self.open.items()
+                    if now - inc['last_seen'] >= self.window
+                    or now - inc['first_seen'] >= self.max_seconds]
+            return [self.close(key) for key in done]
+
+    def flush(self):
+        """Close every open incident (shutdown or end of replay)"""
+        with self.lock:
+            return [self.close(key) for key in list(self.open)]
+
+    def close(self, key):
+        self.stats['incidents'] += 1
+        return self.open.pop(key)
+
+
+def incident_summary(incident):
+    """JSON-ready incident fields sent alongside the vote"""
+    return {
+        'count': incident['count'],
+        'first_seen': incident['first_seen'],
+        'last_seen': incident['last_seen'],
+        'samples': incident['samples'],
+    }
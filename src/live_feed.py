@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Byzantine Fault-Tolerant IDS - Live Feed Server
+Streams consensus events and aggregate deltas to browsers (dashboard.html)
+over Server-Sent Events
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from collections import Counter
+
+import requests
+from flask import Flask, Response, jsonify, send_from_directory
+
+from suricata_detector import SuricataAlertParser
+
+app = Flask(__name__)
+
+# Configuration
+COORD_URL = os.environ.get("COORDINATOR_URL", "http://192.168.1.236:5000")
+PORT = int(os.environ.get("LIVE_FEED_PORT", 8080))
+POLL_INTERVAL = 0.5     # Seconds between coordinator /consensus polls
+HEARTBEAT = 15          # Seconds of silence before an SSE keep-alive comment
+RECENT_EVENTS = 20      # Events kept per client delta; older ones are coalesced
+DASHBOARD_DIR = Path(__file__).resolve().parent.parent
+
+
+def new_delta():
+    """Empty aggregate delta"""
+    return {
+        'consensus': 0,
+        'by_category': Counter(),
+        'by_node': Counter(),
+        'latency_sum': 0.0,
+        'events': [],
+        'coalesced': 0,
+    }
+
+
+def merge_delta(into, delta):
+    """Fold one delta into another, keeping only the newest RECENT_EVENTS events"""
+    into['consensus'] += delta['consensus']
+    into['by_category'].update(delta['by_category'])
+    into['by_node'].update(delta['by_node'])
+    into['latency_sum'] += delta['latency_sum']
+    into['coalesced'] += delta['coalesced']
+    events = into['events']
+    events.extend(delta['events'])
+    if len(events) > RECENT_EVENTS:
+        into['coalesced'] += len(events) - RECENT_EVENTS
+        del events[:-RECENT_EVENTS]
+
+
+def delta_from_decisions(decisions):
+    """Aggregate a batch of coordinator decisions into one delta"""
+    delta = new_delta()
+    for d in decisions:
+        category = SuricataAlertParser.categorize_attack(d['message'], "")
+        delta['consensus'] += 1
+        delta['by_category'][category] += 1
+        delta['by_node'].update(d['nodes'])
+        delta['latency_sum'] += d['decided_at'] - d['first_vote']
+        delta['events'].append({
+            'message': d['message'],
+            'category': category,
+            'nodes': d['nodes'],
+            'decided_at': d['decided_at'],
+        })
+    if len(delta['events']) > RECENT_EVENTS:
+        delta['coalesced'] = len(delta['events']) - RECENT_EVENTS
+        del delta['events'][:-RECENT_EVENTS]
+    return delta
+
+
+class ClientFeed:
+    """Pending delta for one browser; a slow reader gets merged deltas"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.pending = None   # Delta not yet sent to the browser
+        self.encoded = None   # Hub's pre-encoded JSON while pending is the shared delta
+
+    def push(self, delta, encoded):
+        """Queue a delta; clients that keep up share the hub's encoding"""
+        with self.lock:
+            if self.pending is None:
+                self.pending, self.encoded = delta, encoded
+            else:
+                if self.encoded is not None:
+                    # Copy the shared delta before merging into it
+                    own = new_delta()
+                    merge_delta(own, self.pending)
+                    self.pending, self.encoded = own, None
+                merge_delta(self.pending, delta)
+        self.ready.set()
+
+    def take(self, timeout):
+        """Wait for the pending update and return it as JSON (None on timeout)"""
+        if not self.ready.wait(timeout):
+            return None
+        with self.lock:
+            delta, encoded = self.pending, self.encoded
+            self.pending = self.encoded = None
+            self.ready.clear()
+        if delta is None:
+            return None  # Woken by a push we already consumed
+        return encoded if encoded is not None else encode_delta(delta)
+
+
+class FeedHub:
+    """Server-side aggregate plus fan-out to connected clients"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clients = set()
+        self.totals = new_delta()
+        self.started = time.time()
+
+    def subscribe(self):
+        """Register a client and return it with a snapshot of the totals"""
+        client = ClientFeed()
+        with self.lock:
+            self.clients.add(client)
+            snapshot = self.snapshot()
+        return client, snapshot
+
+    def unsubscribe(self, client):
+        with self.lock:
+            self.clients.discard(client)
+
+    def publish(self, decisions):
+        """Aggregate new decisions once, then merge the delta into every client"""
+        if not decisions:
+            return
+        delta = delta_from_decisions(decisions)
+        encoded = encode_delta(delta)  # Once per batch, not once per client
+        with self.lock:
+            merge_delta(self.totals, delta)
+            clients = list(self.clients)
+        for client in clients:
+            client.push(delta, encoded)
+
+    def snapshot(self):
+        """Totals since the feed started"""
+        totals = self.totals
+        return {
+            'consensus': totals['consensus'],
+            'by_category': dict(totals['by_category']),
+            'by_node': dict(totals['by_node']),
+            'avg_latency_ms': round(totals['latency_sum'] / totals['consensus'] * 1000, 1)
+            if totals['consensus'] else None,
+            'events': list(totals['events']),
+            'clients': len(self.clients),
+            'uptime': time.time() - self.started,
+        }
+
+
+hub = FeedHub()
+
+
+def encode_delta(delta):
+    """JSON body for an SSE delta event"""
+    return json.dumps({
+        'consensus': delta['consensus'],
+        'by_category': dict(delta['by_category']),
+        'by_node': dict(delta['by_node']),
+        'latency_sum': delta['latency_sum'],
+        'events': delta['events'],
+        'coalesced': delta['coalesced'],
+    })
+
+
+def poll_coordinator():
+    """Single background poller feeding the hub, however many clients connect"""
+    since, started = 0, None  # Coordinator start time seen on the last poll
+    session = requests.Session()
+    while True:
+        try:
+            resp = session.get(f"{COORD_URL}/consensus", params={'since': since}, timeout=2)
+            body = resp.json()
+            decisions = body['decisions']
+            restarted = started is not None and body.get('started') != started
+            started = body.get('started')
+            if restarted or body.get('latest', since) < since:
+                # The coordinator restarted and numbers decisions from 1 again: re-read from the start
+                print("[LIVE FEED] Coordinator restarted, polling its decisions from seq 0")
+                since, decisions = 0, []
+            if decisions:
+                since = decisions[-1]['seq']
+                hub.publish(decisions)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"[LIVE FEED] Coordinator poll failed: {e}")
+            time.sleep(2)
+        time.sleep(POLL_INTERVAL)
+
+
+@app.route('/events')
+def events():
+    """SSE stream: one snapshot, then coalesced deltas"""
+    client, snapshot = hub.subscribe()
+
+    def stream():
+        try:
+            yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+            while True:
+                payload = client.take(HEARTBEAT)
+                if payload is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: delta\ndata: {payload}\n\n"
+        finally:
+            hub.unsubscribe(client)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/snapshot')
+def snapshot():
+    """Current totals as JSON"""
+    with hub.lock:
+        return jsonify(hub.snapshot())
+
+
+@app.route('/')
+@app.route('/dashboard.html')
+def dashboard():
+    """Serve the browser dashboard"""
+    return send_from_directory(DASHBOARD_DIR, 'dashboard.html')
+
+
+def main():
+    """Start the coordinator poller and the HTTP server"""
+    print(f"[LIVE FEED] Polling {COORD_URL} every {POLL_INTERVAL}s")
+    print(f"[LIVE FEED] Dashboard at http://0.0.0.0:{PORT}/dashboard.html")
+    threading.Thread(target=poll_coordinator, daemon=True).start()
+    app.run(host='0.0.0.0', port=PORT, debug=False, use_reloader=False, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
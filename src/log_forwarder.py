@@ -2,34 +2,45 @@
 """
 Byzantine Fault-Tolerant IDS - Log Forwarder
 Forwards Suricata logs from rp6 to rp8 detector nodes via UDP
+Lines are forwarded as the raw bytes read from the log, several whole lines
+per datagram (up to FORWARD_DATAGRAM bytes), without decoding them
 """
 
 import socket
 import time
 import os
 
-LOG_FILE = "/usr/local/var/log/suricata/fast.log"
-RP8_IP = "192.168.1.239"
-PORTS = [9999, 9998]  # Physical and virtual rp8 detectors
+from tail import ByteTailer, datagrams
 
-sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+LOG_FILE = os.environ.get("FAST_LOG", "/usr/local/var/log/suricata/fast.log")
+RP8_IP = os.environ.get("FORWARD_HOST", "192.168.1.239")
+# Physical and virtual rp8 detectors
+PORTS = [int(p) for p in os.environ.get("FORWARD_PORTS", "9999,9998").split(",")]
 
-print(f"[LOG FORWARDER] Forwarding {LOG_FILE} to {RP8_IP} ports {PORTS}")
 
-if not os.path.exists(LOG_FILE):
-    print(f"[ERROR] {LOG_FILE} not found!")
-    exit(1)
+def main():
+    """Tail fast.log and forward every new line to the rp8 detectors"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
-# Tail-following behavior
-with open(LOG_FILE, 'r') as f:
-    f.seek(0, os.SEEK_END)  # Start at end of file
-    
+    print(f"[LOG FORWARDER] Forwarding {LOG_FILE} to {RP8_IP} ports {PORTS}")
+
+    if not os.path.exists(LOG_FILE):
+        print(f"[ERROR] {LOG_FILE} not found!")
+        exit(1)
+
+    # Tail-following behavior (starts at end of file)
+    tailer = ByteTailer(LOG_FILE)
     while True:
-        line = f.readline()
-        
-        if line:
+        chunk = tailer.chunk()
+
+        if chunk:
             # Forward to both rp8 ports
-            for port in PORTS:
-                sock.sendto(line.encode('utf-8'), (RP8_IP, port))
+            for datagram in datagrams(chunk):
+                for port in PORTS:
+                    sock.sendto(datagram, (RP8_IP, port))
         else:
             time.sleep(0.1)  # Brief pause if no new data
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Detector Stats Socket and Sampling Profiler
+A running detector answers two commands on a local Unix socket:
+`stats` returns its per-stage timings and send queue state as JSON, and
+`profile SECONDS` samples every thread's stack for that long and returns
+the hottest lines and functions, without restarting the detector.
+Components may add their own commands (e.g. `reload`).
+    python3 profiling.py --socket /tmp/bft-ids.sock stats
+    python3 profiling.py --socket /tmp/bft-ids.sock profile 10
+    python3 profiling.py --socket /tmp/bft-ids.sock reload
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import threading
+import socketserver
+from collections import Counter
+
+PROFILE_INTERVAL = 0.005  # Seconds between stack samples
+PROFILE_MAX = 300         # Longest profile a client may ask for (seconds)
+PROFILE_TOP = 25          # Entries returned per table
+
+
+def frame_name(code, line=None):
+    where = f"{os.path.basename(code.co_filename)}:{code.co_firstlineno if line is None else line}"
+    return f"{where} {code.co_name}"
+
+
+def sample_profile(seconds, interval=PROFILE_INTERVAL, top=PROFILE_TOP):
+    """
+    Sample the stacks of all other threads every `interval` for `seconds`.
+    `own` counts the line each thread was executing, `total` every function
+    on its stack; both are percentages of thread samples. Threads blocked in
+    a sleep, read or queue wait are counted at the line that waits.
+    """
+    me = threading.get_ident()
+    own, total = Counter(), Counter()
+    samples = thread_samples = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            thread_samples += 1
+            own[frame_name(frame.f_code, frame.f_lineno)] += 1
+            seen = set()
+            while frame is not None:
+                name = frame_name(frame.f_code)
+                if name not in seen:
+                    seen.add(name)
+                    total[name] += 1
+                frame = frame.f_back
+        samples += 1
+        time.sleep(interval)
+
+    def table(counter):
+        return [[name, round(100.0 * n / thread_samples, 1)] for name, n in counter.most_common(top)]
+
+    return {'seconds': seconds, 'samples': samples, 'thread_samples': thread_samples,
+            'own_pct': table(own) if thread_samples else [], 'total_pct': table(total) if thread_samples else []}
+
+
+class StatsServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket answering `stats` (snapshot() as JSON), `profile SECONDS` and extra `commands`"""
+
+    daemon_threads = True
+
+    def __init__(self, path, snapshot, commands=None):
+        self.snapshot = snapshot
+        self.commands = commands or {}  # Name -> callable returning a JSON-able reply
+        if os.path.exists(path):
+            os.unlink(path)  # Left over from a previous run
+        socketserver.UnixStreamServer.__init__(self, path, StatsHandler)
+
+
+class StatsHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        command = self.rfile.readline().decode("utf-8", "replace").split()
+        try:
+            if command[:1] == ["stats"]:
+                reply = self.server.snapshot()
+            elif command[:1] == ["profile"]:
+                seconds = min(PROFILE_MAX, float(command[1]) if len(command) > 1 else 10.0)
+                reply = sample_profile(seconds)
+            elif command[:1] and command[0] in self.server.commands:
+                reply = self.server.commands[command[0]]()
+            else:
+                names = " | ".join(["stats", "profile [SECONDS]"] + sorted(self.server.commands))
+                reply = {'error': f"commands: {names}"}
+        except (ValueError, IndexError) as e:
+            reply = {'error': str(e)}
+        self.wfile.write(json.dumps(reply, indent=2).encode() + b"\n")
+
+
+def query(path, command, timeout=None):
+    """Send one command to a detector's stats socket and return the decoded reply"""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+        sock.sendall(command.encode() + b"\n")
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        sock.close()
+    return json.loads(b"".join(chunks))
+
+
+def main():
+    """Query a running detector's stats socket"""
+    parser = argparse.ArgumentParser(description="Detector pipeline stats and on-demand profiling")
+    parser.add_argument("command", nargs="+", help="stats | profile [SECONDS] | reload")
+    parser.add_argument("--socket", default=os.environ.get("STATS_SOCKET", "/tmp/bft-ids.sock"),
+                        help="Detector STATS_SOCKET path")
+    args = parser.parse_args()
+    print(json.dumps(query(args.socket, " ".join(args.command)), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Recent Alert Index
+Bounded in-memory store of recently decided alerts with secondary indexes
+by source/destination IP, SID, category and voting node, for live incident
+queries. Alerts are evicted oldest-first by count and age.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+# Record field -> index name (nodes is multi-valued: one entry per voting node)
+INDEXED = {'src_ip': 'src_ip', 'dst_ip': 'dst_ip', 'sid': 'sid', 'category': 'category', 'nodes': 'node'}
+
+
+class Posting:
+    """Ascending seq numbers for one index value; oldest entries leave from the front"""
+
+    __slots__ = ('seqs', 'head')
+
+    def __init__(self):
+        self.seqs = []
+        self.head = 0   # seqs[:head] are evicted but not yet compacted
+
+    def __len__(self):
+        return len(self.seqs) - self.head
+
+    def evict(self):
+        self.head += 1
+        if self.head >= 1024 and self.head * 2 >= len(self.seqs):
+            del self.seqs[:self.head]
+            self.head = 0
+
+
+class RecentAlertIndex:
+    """Recent decisions keyed by seq, with posting lists per indexed value"""
+
+    def __init__(self, capacity=100000, max_age=3600):
+        self.capacity = capacity
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.records = {}       # seq -> record
+        self.order = Posting()  # Every live seq, oldest first
+        self.indexes = {name: {} for name in INDEXED.values()}
+
+    def add(self, record):
+        """Index a decided alert; seq and decided_at must not go backwards"""
+        seq = record['seq']
+        keys = [(self.indexes[name], value) for field, name in INDEXED.items()
+                for value in self.values(record, field)]
+        for _, value in keys:
+            hash(value)  # An unhashable value fails here, before anything is indexed
+        with self.lock:
+            self.records[seq] = record
+            self.order.seqs.append(seq)
+            for index, value in keys:
+                posting = index.get(value)
+                if posting is None:
+                    posting = index[value] = Posting()
+                posting.seqs.append(seq)
+            self.evict(record['decided_at'])
+
+    @staticmethod
+    def values(record, field):
+        value = record.get(field)
+        if field == 'nodes':
+            return value or ()
+        return (value,) if value not in (None, "", 0) else ()
+
+    def evict(self, now):
+        """Drop the oldest alerts beyond capacity or older than max_age (lock held)"""
+        order = self.order
+        cutoff = now - self.max_age
+        while len(order):
+            oldest = self.records[order.seqs[order.head]]
+            if len(order) <= self.capacity and oldest['decided_at'] >= cutoff:
+                break
+            order.evict()
+            del self.records[oldest['seq']]
+            # The evicted seq is the oldest entry in each of its postings
+            for field, name in INDEXED.items():
+                index = self.indexes[name]
+                for value in self.values(oldest, field):
+                    posting = index[value]
+                    posting.evict()
+                    if not len(posting):
+                        del index[value]
+
+    def query(self, start=None, end=None, limit=100, cursor=None, **filters):
+        """
+        Newest-first matches for equality filters (src_ip, dst_ip, sid,
+        category, node) within [start, end]. Returns (alerts, next_cursor);
+        pass next_cursor back to get the following page.
+        """
+        with self.lock:
+            self.evict(time.time())
+            postings = []
+            for name, value in filters.items():
+                if value is None:
+                    continue
+                posting = self.indexes[name].get(value)
+                if posting is None:
+                    return [], None
+                postings.append(posting)
+            if not postings:
+                postings.append(self.order)
+
+            # Walk the shortest posting list newest-first; membership in the
+            # others is a bisect over a shrinking window (all lists ascend by seq)
+            postings.sort(key=len)
+            posting, others = postings[0], postings[1:]
+            bounds = [len(other.seqs) for other in others]
+
+            seqs, records = posting.seqs, self.records
+            lo, hi = posting.head, len(seqs)
+            if cursor is not None:
+                hi = bisect_left(seqs, cursor, lo, hi)
+            if end is not None:
+                hi = self.bisect_time(seqs, lambda ts: ts <= end, lo, hi)
+            if start is not None:
+                lo = self.bisect_time(seqs, lambda ts: ts < start, lo, hi)
+
+            results = []
+            for i in range(hi - 1, lo - 1, -1):
+                seq = seqs[i]
+                for k, other in enumerate(others):
+                    # Later candidates are smaller, so everything from j up is done with
+                    j = bisect_left(other.seqs, seq, other.head, bounds[k])
+                    bounds[k] = j
+                    if j == len(other.seqs) or other.seqs[j] != seq:
+                        break
+                else:
+                    results.append(records[seq])
+                    if len(results) >= limit:
+                        return results, seq
+            return results, None
+
+    def bisect_time(self, seqs, before, lo, hi):
+        """First index in seqs[lo:hi] whose decision time fails `before` (times ascend)"""
+        records = self.records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if before(records[seqs[mid]]['decided_at']):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __len__(self):
+        return len(self.records)
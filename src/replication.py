@@ -0,0 +1,508 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Replicated Coordinator
+3f+1 coordinator replicas agree on the order of vote batches with PBFT
+(pre-prepare / prepare / commit, view change on a faulty primary), so one
+crashed or compromised coordinator can no longer decide alone. Detectors send
+every vote to all replicas; the primary orders them in batches, several
+batches are in flight at once, and every replica executes committed batches
+in sequence order through the normal consensus code.
+
+Protocol messages are Ed25519-signed with replica-<id> keys from
+AUTH_KEYS_DIR and travel bundled over HTTP (POST /replica). A backup only
+prepares a batch whose votes it has received itself, so a primary cannot
+inject votes. Not covered: checkpoints and state transfer, so a replica that
+falls more than LOG_KEEP batches behind has to be restarted with the others.
+"""
+
+import os
+import json
+import time
+import queue
+import random
+import threading
+from hashlib import sha256
+from collections import OrderedDict
+
+import requests
+from cryptography.exceptions import InvalidSignature
+
+from vote_auth import AUTH_KEYS_DIR, load_private, load_public
+
+REPLICAS = [url.strip().rstrip("/") for url in os.environ.get("REPLICAS", "").split(",") if url.strip()]
+REPLICA_ID = int(os.environ.get("REPLICA_ID", 0))
+BATCH_SIZE = int(os.environ.get("REPLICA_BATCH", 200))                  # Votes per batch
+BATCH_INTERVAL = float(os.environ.get("REPLICA_BATCH_INTERVAL", 0.05))  # Seconds between proposals
+PIPELINE = int(os.environ.get("REPLICA_PIPELINE", 8))                   # Batches in flight
+VIEW_TIMEOUT = float(os.environ.get("VIEW_TIMEOUT", 2.0))               # Seconds without progress
+REPLICA_FAULT = os.environ.get("REPLICA_FAULT", "")  # Testing: "equivocate", "inject" or "inflate"
+HIGH_WATER = 4 * PIPELINE     # Highest seq a backup accepts beyond the last executed one
+VIEW_AHEAD = 2                # Views a prepare or commit may be ahead of ours (peers done changing first)
+LOG_KEEP = 4 * PIPELINE       # Executed batches whose certificates are kept for view changes
+VOTE_TTL = 60                 # Seconds an unordered or executed vote id is remembered
+MAX_BATCH_SKEW = 30           # Seconds a batch timestamp may differ from our clock
+VOTE_FIELDS = ('node', 'message', 'fingerprint', 'alert', 'incident')
+
+
+ENCODER = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+
+
+def canonical(obj):
+    return ENCODER.encode(obj).encode()
+
+
+def digest(obj):
+    return sha256(canonical(obj)).hexdigest()
+
+
+def vote_id(vote):
+    return digest(vote)[:32]
+
+
+def signed_part(msg):
+    """Signature covers everything but the signature and a pre-prepare's batch (its digest is signed)"""
+    return canonical({k: v for k, v in msg.items() if k not in ('sig', 'batch')})
+
+
+NULL_BATCH = {'ts': 0, 'votes': []}   # Fills sequence gaps after a view change
+
+
+def valid_batch(batch):
+    return (isinstance(batch, dict) and isinstance(batch.get('ts'), (int, float))
+            and isinstance(batch.get('votes'), list) and all(isinstance(v, dict) for v in batch['votes']))
+
+
+class Slot:
+    """Agreement state for one (view, seq)"""
+
+    __slots__ = ('preprepare', 'ids', 'prepares', 'commits', 'sent_commit', 'waiting')
+
+    def __init__(self):
+        self.preprepare = None   # Signed pre-prepare from the view's primary (with batch)
+        self.ids = None          # Vote ids of the batch, computed once
+        self.prepares = {}       # replica -> signed prepare
+        self.commits = {}        # replica -> signed commit
+        self.sent_commit = False
+        self.waiting = False     # Holding our prepare until we have received every vote
+
+    @property
+    def digest(self):
+        return self.preprepare['digest'] if self.preprepare else None
+
+    def matching(self, messages):
+        return [m for m in messages.values() if m['digest'] == self.digest]
+
+
+class HttpTransport:
+    """One sender thread per peer; queued messages are posted together"""
+
+    def __init__(self, urls, replica_id, bundle=256):
+        self.urls = urls
+        self.bundle = bundle
+        self.queues = {peer: queue.Queue(maxsize=10000) for peer in range(len(urls)) if peer != replica_id}
+        for peer in self.queues:
+            threading.Thread(target=self.sender, args=(peer,), daemon=True).start()
+
+    def send(self, peer, msg):
+        try:
+            self.queues[peer].put_nowait(msg)
+        except queue.Full:
+            pass  # Peer is down or far behind; the protocol tolerates lost messages
+
+    def sender(self, peer):
+        http = requests.Session()
+        q = self.queues[peer]
+        while True:
+            messages = [q.get()]
+            while len(messages) < self.bundle:
+                try:
+                    messages.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                http.post(f"{self.urls[peer]}/replica", json={'messages': messages}, timeout=2)
+            except requests.RequestException:
+                pass
+
+
+class Replica:
+    """One PBFT replica; `execute(batch)` is called for each committed batch in order"""
+
+    def __init__(self, replica_id, count, execute, transport=None, keys_dir=AUTH_KEYS_DIR,
+                 batch_size=BATCH_SIZE, pipeline=PIPELINE, view_timeout=VIEW_TIMEOUT, fault=REPLICA_FAULT):
+        self.id = replica_id
+        self.n = count
+        self.f = (count - 1) // 3
+        self.execute = execute
+        self.transport = transport
+        self.key = load_private(keys_dir, f"replica-{replica_id}")
+        self.publics = {i: load_public(f"{keys_dir}/replica-{i}.pub") for i in range(count)}
+        self.batch_size = batch_size
+        self.pipeline = pipeline
+        self.view_timeout = view_timeout
+        self.fault = fault
+        self.lock = threading.RLock()
+
+        self.view = 0
+        self.failed_views = 0       # View changes since the last executed batch
+        self.changing = False       # Between sending VIEW-CHANGE and installing the new view
+        self.change_started = 0.0
+        self.view_changes = {}      # view -> {replica: signed view-change}
+        self.new_view_sent = set()
+        self.seq = 0                # Last sequence number assigned (primary)
+        self.last_executed = 0
+        self.last_progress = time.time()
+        self.slots = {}             # (view, seq) -> Slot
+        self.committed = {}         # seq -> batch, committed but not yet executed
+        self.pool = OrderedDict()   # vote id -> (vote, received), not yet executed
+        self.unproposed = OrderedDict()  # vote ids the primary has not batched yet
+        self.done = OrderedDict()   # vote id -> executed time
+        self.stats = {'batches': 0, 'votes': 0, 'view_changes': 0, 'rejected': 0}
+
+    # -- helpers ---------------------------------------------------------
+
+    def primary(self, view=None):
+        return (self.view if view is None else view) % self.n
+
+    def sign(self, msg):
+        msg['replica'] = self.id
+        msg['sig'] = self.key.sign(signed_part(msg)).hex()
+        return msg
+
+    def valid(self, msg):
+        """Signature check against the claimed sender's key"""
+        try:
+            self.publics[msg['replica']].verify(bytes.fromhex(msg['sig']), signed_part(msg))
+            return True
+        except (KeyError, TypeError, ValueError, InvalidSignature):
+            return False
+
+    def broadcast(self, msg):
+        for peer in range(self.n):
+            if peer != self.id:
+                self.transport.send(peer, msg)
+
+    def slot(self, view, seq):
+        key = (view, seq)
+        if key not in self.slots:
+            self.slots[key] = Slot()
+        return self.slots[key]
+
+    def timeout(self):
+        # Doubles with each view change that did not restore progress
+        return self.view_timeout * 2 ** min(self.failed_views, 5)
+
+    def in_window(self, seq):
+        # Int only: float seqs inside the window would still open slots without bound
+        return type(seq) is int and self.last_executed - LOG_KEEP < seq <= self.last_executed + HIGH_WATER
+
+    def in_views(self, view):
+        return type(view) is int and self.view <= view <= self.view + VIEW_AHEAD
+
+    # -- client votes ----------------------------------------------------
+
+    def submit(self, vote):
+        """A vote received directly from a detector"""
+        vote = {k: vote[k] for k in VOTE_FIELDS if vote.get(k) is not None}
+        vid = vote_id(vote)
+        with self.lock:
+            if vid in self.pool or vid in self.done:
+                return
+            self.pool[vid] = (vote, time.time())
+            self.unproposed[vid] = None
+            # A pre-prepare may have arrived before this vote did
+            for (view, seq), slot in list(self.slots.items()):
+                if slot.waiting:
+                    self.try_prepare(view, seq, slot)
+
+    def propose(self):
+        """Primary: order waiting votes in batches while the pipeline has room"""
+        with self.lock:
+            if self.primary() != self.id or self.changing:
+                return
+            if self.fault == "inflate":
+                return  # Byzantine primary: stall, then lie about its progress in the view change
+            while self.unproposed and self.seq - self.last_executed < self.pipeline:
+                vids = []
+                while self.unproposed and len(vids) < self.batch_size:
+                    vids.append(self.unproposed.popitem(last=False)[0])
+                vids = [vid for vid in vids if vid in self.pool]
+                votes = [self.pool[vid][0] for vid in vids]
+                if self.fault == "inject":
+                    votes.append({'node': "honest-1", 'message': f"FORGED by replica-{self.id} #{self.seq}"})
+                    vids.append(vote_id(votes[-1]))
+                if not votes:
+                    continue
+                self.seq += 1
+                batch = {'ts': time.time(), 'votes': votes}
+                msg = self.sign({'type': 'preprepare', 'view': self.view, 'seq': self.seq,
+                                 'digest': digest(batch)})
+                msg['batch'] = batch
+                slot = self.slot(self.view, self.seq)
+                slot.preprepare, slot.ids = msg, vids
+                self.broadcast(msg)
+
+    # -- normal case -----------------------------------------------------
+
+    def receive(self, messages):
+        """Messages from a peer (signatures are checked before taking the lock)"""
+        valid = [m for m in messages if isinstance(m, dict) and self.valid(m)]
+        with self.lock:
+            self.stats['rejected'] += len(messages) - len(valid)
+        handlers = {'preprepare': self.on_preprepare, 'prepare': self.on_prepare, 'commit': self.on_commit,
+                    'viewchange': self.on_viewchange, 'newview': self.on_newview}
+        with self.lock:
+            for msg in valid:
+                handler = handlers.get(msg.get('type'))
+                try:
+                    handler(msg)
+                except (TypeError, KeyError, ValueError, AttributeError):
+                    self.stats['rejected'] += 1
+
+    def on_preprepare(self, msg, installing=False):
+        view, seq = msg['view'], msg['seq']
+        if msg['replica'] != self.primary(view) or view != self.view or (self.changing and not installing):
+            return
+        if not self.in_window(seq):
+            return
+        batch = msg.get('batch')
+        if not valid_batch(batch) or digest(batch) != msg['digest']:
+            return
+        if batch['votes'] and abs(batch['ts'] - time.time()) > MAX_BATCH_SKEW:
+            return
+        slot = self.slot(view, seq)
+        if slot.preprepare is not None:
+            return  # Already have one for this (view, seq); a second would be equivocation
+        slot.preprepare = msg
+        slot.ids = [vote_id(v) for v in batch['votes']]
+        if self.primary(view) != self.id:
+            self.try_prepare(view, seq, slot)
+        self.check_prepared(view, seq, slot)
+
+    def try_prepare(self, view, seq, slot):
+        """Send our prepare once every vote in the batch is one we received ourselves"""
+        if any(vid not in self.pool and vid not in self.done for vid in slot.ids):
+            slot.waiting = True
+            return
+        slot.waiting = False
+        if self.id not in slot.prepares:
+            prepare = self.sign({'type': 'prepare', 'view': view, 'seq': seq, 'digest': self.vote_digest(slot)})
+            slot.prepares[self.id] = prepare
+            self.broadcast(prepare)
+        self.check_prepared(view, seq, slot)
+
+    def vote_digest(self, slot):
+        if self.fault == "equivocate":
+            return digest(random.random())  # Byzantine backup: agree with nobody
+        return slot.digest
+
+    def on_prepare(self, msg):
+        view, seq = msg['view'], msg['seq']
+        if not self.in_views(view) or msg['replica'] == self.primary(view) or not self.in_window(seq):
+            return
+        # Kept even before our pre-prepare (or new view) arrives; counted once it does
+        slot = self.slot(view, seq)
+        slot.prepares.setdefault(msg['replica'], msg)
+        self.check_prepared(view, seq, slot)
+
+    def prepared(self, view, slot):
+        return (slot.preprepare is not None and not slot.waiting
+                and len([m for m in slot.matching(slot.prepares)
+                         if m['replica'] != self.primary(view)]) >= 2 * self.f)
+
+    def check_prepared(self, view, seq, slot):
+        if slot.sent_commit or view != self.view or not self.prepared(view, slot):
+            return
+        slot.sent_commit = True
+        commit = self.sign({'type': 'commit', 'view': view, 'seq': seq, 'digest': self.vote_digest(slot)})
+        slot.commits[self.id] = commit
+        self.broadcast(commit)
+        self.check_committed(seq, slot)
+
+    def on_commit(self, msg):
+        view, seq = msg['view'], msg['seq']
+        if not self.in_views(view) or not self.in_window(seq):
+            return
+        slot = self.slot(view, seq)
+        slot.commits.setdefault(msg['replica'], msg)
+        self.check_committed(seq, slot)
+
+    def check_committed(self, seq, slot):
+        if not slot.sent_commit or len(slot.matching(slot.commits)) < 2 * self.f + 1:
+            return
+        if seq > self.last_executed and seq not in self.committed:
+            self.committed[seq] = (slot.preprepare['batch'], slot.ids)
+            self.execute_ready()
+
+    def execute_ready(self):
+        """Execute committed batches in sequence order"""
+        while self.last_executed + 1 in self.committed:
+            batch, ids = self.committed.pop(self.last_executed + 1)
+            self.last_executed += 1
+            self.last_progress = time.time()
+            self.failed_views = 0
+            for vid in ids:
+                self.pool.pop(vid, None)
+                self.unproposed.pop(vid, None)
+                self.done[vid] = self.last_progress
+            if batch['votes']:
+                self.execute(batch)
+                self.stats['batches'] += 1
+                self.stats['votes'] += len(batch['votes'])
+        for key in [k for k in self.slots if k[1] <= self.last_executed - LOG_KEEP]:
+            del self.slots[key]
+
+    # -- view change -----------------------------------------------------
+
+    def certificates(self):
+        """Prepared pre-prepares (highest view per seq) with their 2f prepares"""
+        best = {}
+        for (view, seq), slot in self.slots.items():
+            if seq > self.last_executed - LOG_KEEP and self.prepared(view, slot):
+                if seq not in best or best[seq]['preprepare']['view'] < view:
+                    prepares = [m for m in slot.matching(slot.prepares) if m['replica'] != self.primary(view)]
+                    best[seq] = {'preprepare': slot.preprepare, 'prepares': prepares[:2 * self.f]}
+        return [best[seq] for seq in sorted(best)]
+
+    def start_view_change(self, view):
+        self.view = view
+        self.changing = True
+        self.change_started = time.time()
+        self.failed_views += 1
+        self.stats['view_changes'] += 1
+        executed = self.last_executed + (10 ** 6 if self.fault == "inflate" else 0)
+        msg = self.sign({'type': 'viewchange', 'view': view, 'executed': executed,
+                         'prepared': self.certificates()})
+        self.view_changes.setdefault(view, {})[self.id] = msg
+        self.broadcast(msg)
+        self.maybe_new_view(view)
+
+    def valid_certificate(self, cert):
+        pp = cert.get('preprepare') or {}
+        prepares = cert.get('prepares') or []
+        if not self.valid(pp) or pp.get('type') != 'preprepare' or pp['replica'] != self.primary(pp['view']):
+            return False
+        if not valid_batch(pp.get('batch')) or digest(pp['batch']) != pp['digest']:
+            return False
+        senders = {m['replica'] for m in prepares
+                   if self.valid(m) and m.get('type') == 'prepare' and m['replica'] != pp['replica']
+                   and (m['view'], m['seq'], m['digest']) == (pp['view'], pp['seq'], pp['digest'])}
+        return len(senders) >= 2 * self.f
+
+    def valid_view_change(self, msg, view):
+        # No honest replica can have executed past our window: its commits would have reached us
+        executed = msg.get('executed')
+        if type(executed) is not int or not 0 <= executed <= self.last_executed + HIGH_WATER:
+            return False
+        return (msg.get('type') == 'viewchange' and msg.get('view') == view and self.valid(msg)
+                and all(self.valid_certificate(c) for c in msg.get('prepared', [])))
+
+    def on_viewchange(self, msg):
+        view = msg['view']
+        if view < self.view or (view == self.view and not self.changing):
+            return
+        if not self.valid_view_change(msg, view):
+            return
+        self.view_changes.setdefault(view, {})[msg['replica']] = msg
+        # f+1 replicas want a later view: at least one is honest, so join them
+        later = sorted(v for v, msgs in self.view_changes.items() if v > self.view and len(msgs) > self.f)
+        if later and (not self.changing or later[0] > self.view):
+            self.start_view_change(later[0])
+        self.maybe_new_view(view)
+
+    def new_view_batches(self, view_changes):
+        """Deterministic (seq -> batch) to re-propose in the new view"""
+        # Only trust progress that f+1 replicas (so at least one honest one) vouch for; batches
+        # committed beyond it are still covered by the prepared certificates below
+        executed = sorted((m['executed'] for m in view_changes), reverse=True)[self.f]
+        low = max(min(m['executed'] for m in view_changes), executed - LOG_KEEP)
+        chosen = {}
+        for m in view_changes:
+            for cert in m['prepared']:
+                pp = cert['preprepare']
+                if pp['seq'] > low and (pp['seq'] not in chosen or chosen[pp['seq']]['view'] < pp['view']):
+                    chosen[pp['seq']] = pp
+        high = max([executed] + list(chosen))
+        return {seq: chosen[seq]['batch'] if seq in chosen else NULL_BATCH for seq in range(low + 1, high + 1)}
+
+    def maybe_new_view(self, view):
+        """New primary: once 2f+1 replicas have asked for `view`, announce it"""
+        msgs = self.view_changes.get(view, {})
+        if self.primary(view) != self.id or view != self.view or view in self.new_view_sent:
+            return
+        if len(msgs) < 2 * self.f + 1:
+            return
+        self.new_view_sent.add(view)
+        view_changes = [msgs[r] for r in sorted(msgs)][:2 * self.f + 1]
+        preprepares = []
+        for seq, batch in sorted(self.new_view_batches(view_changes).items()):
+            pp = self.sign({'type': 'preprepare', 'view': view, 'seq': seq, 'digest': digest(batch)})
+            pp['batch'] = batch
+            preprepares.append(pp)
+        msg = self.sign({'type': 'newview', 'view': view, 'viewchanges': view_changes, 'preprepares': preprepares})
+        self.broadcast(msg)
+        self.install_view(view, preprepares)
+
+    def on_newview(self, msg):
+        view = msg['view']
+        if view < self.view or (view == self.view and not self.changing) or msg['replica'] != self.primary(view):
+            return
+        view_changes = msg.get('viewchanges') or []
+        if len({m.get('replica') for m in view_changes if self.valid_view_change(m, view)}) < 2 * self.f + 1 \
+                or len(view_changes) != 2 * self.f + 1:
+            return
+        expected = self.new_view_batches(view_changes)
+        preprepares = msg.get('preprepares') or []
+        if sorted((pp['seq'], pp['digest']) for pp in preprepares) != \
+                sorted((seq, digest(batch)) for seq, batch in expected.items()):
+            return
+        if not all(self.valid(pp) and pp['replica'] == self.primary(view) and pp['view'] == view
+                   for pp in preprepares):
+            return
+        self.install_view(view, preprepares)
+
+    def install_view(self, view, preprepares):
+        self.view = view
+        self.changing = False
+        self.last_progress = time.time()
+        for old in [v for v in self.view_changes if v <= view]:
+            del self.view_changes[old]
+        for pp in preprepares:
+            self.on_preprepare(pp, installing=True)
+        if self.primary(view) == self.id:
+            self.seq = max([self.last_executed] + [pp['seq'] for pp in preprepares])
+            ordered = {vote_id(v) for pp in preprepares for v in pp['batch']['votes']}
+            self.unproposed = OrderedDict((vid, None) for vid in self.pool if vid not in ordered)
+
+    # -- timers ----------------------------------------------------------
+
+    def watchdog(self, interval=0.1):
+        """Trigger view changes when the primary stops making progress; expire old vote ids"""
+        while True:
+            time.sleep(interval)
+            with self.lock:
+                now = time.time()
+                while self.done and now - next(iter(self.done.values())) > VOTE_TTL:
+                    self.done.popitem(last=False)
+                while self.pool and now - next(iter(self.pool.values()))[1] > VOTE_TTL:
+                    vid, _ = self.pool.popitem(last=False)
+                    self.unproposed.pop(vid, None)
+                if self.changing:
+                    if now - self.change_started > self.timeout():
+                        self.start_view_change(self.view + 1)  # The new primary is faulty too
+                elif self.primary() != self.id and self.pool:
+                    oldest = next(iter(self.pool.values()))[1]
+                    if now - oldest > self.timeout() and now - self.last_progress > self.timeout():
+                        self.start_view_change(self.view + 1)
+
+    def run(self):
+        """Background threads: batch proposer and watchdog"""
+        threading.Thread(target=self.watchdog, daemon=True).start()
+        while True:
+            time.sleep(BATCH_INTERVAL)
+            self.propose()
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, replica=self.id, replicas=self.n, view=self.view, primary=self.primary(),
+                        changing=self.changing, last_executed=self.last_executed, pending_votes=len(self.pool))
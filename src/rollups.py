@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Time-Series Rollups
+Alert counts by category, severity, protocol and node in per-second,
+per-minute and per-hour ring buffers. An alert is only counted in the
+per-second ring; seconds are folded into the minute and hour rings once,
+by the next query at those resolutions or when their slot is reused.
+Updates are O(1) per alert and range queries are O(buckets), so timelines
+never rescan raw alerts.
+"""
+
+import threading
+from collections import defaultdict
+
+# resolution name -> (bucket width in seconds, buckets retained); the first is the finest
+RESOLUTIONS = {
+    'second': (1, 3600),    # Last hour
+    'minute': (60, 1440),   # Last day
+    'hour': (3600, 720),    # Last 30 days
+}
+DIMENSIONS = ('category', 'severity', 'protocol', 'node')
+MULTI = (list, tuple, set)  # Dimension values counted once per element, e.g. every node in a decision
+
+
+class RingRollup:
+    """Fixed number of time buckets at one resolution, reused round-robin"""
+
+    def __init__(self, width, slots):
+        self.width = width
+        self.slots = slots
+        self.epochs = [-1] * slots   # Absolute bucket number held by each slot
+        self.totals = [0] * slots
+        self.counts = [None] * slots  # Per slot: {dimension: {value: count}}
+        self.latest = -1
+
+    def claim(self, bucket):
+        """
+        Slot index for `bucket`, cleared if it held an older one, or None when
+        the bucket is older than the retained window. Returns (index, evicted)
+        where evicted is the (bucket, total, counts) the slot held before.
+        """
+        if bucket <= self.latest - self.slots:
+            return None, None  # Never compare with the slot alone: it may not have been written yet
+        i = bucket % self.slots
+        evicted = None
+        if self.epochs[i] != bucket:
+            if self.epochs[i] >= 0:
+                evicted = (self.epochs[i], self.totals[i], self.counts[i])
+            self.epochs[i] = bucket
+            self.totals[i] = 0
+            self.counts[i] = {}
+        if bucket > self.latest:
+            self.latest = bucket
+        return i, evicted
+
+    def merge(self, bucket, total, counts):
+        """Add a bucket of counts from a finer ring; False if too old to keep"""
+        i, _ = self.claim(bucket)
+        if i is None:
+            return False
+        self.merge_slot(i, total, counts)
+        return True
+
+    def merge_slot(self, i, total, counts):
+        """Add a total and {dimension: {value: count}} to the bucket held in slot i"""
+        self.totals[i] += total
+        slot = self.counts[i]
+        for dim, values in counts.items():
+            merged = slot.get(dim)
+            if merged is None:
+                slot[dim] = dict(values)
+            else:
+                for value, count in values.items():
+                    merged[value] = merged.get(value, 0) + count
+
+    def held(self, first, last):
+        """(bucket, total, counts) for held buckets numbered first..last"""
+        if last - first >= self.slots:
+            buckets = sorted(e for e in self.epochs if first <= e <= last)
+        else:
+            buckets = [b for b in range(first, last + 1) if self.epochs[b % self.slots] == b]
+        return [(b, self.totals[b % self.slots], self.counts[b % self.slots]) for b in buckets]
+
+    def query(self, start, end, by=None):
+        """Buckets overlapping [start, end] as (bucket_start, total or {value: count})"""
+        first = int(start // self.width)
+        last = int(end // self.width)
+        # Never walk more than one ring's worth of buckets
+        first = max(first, last - self.slots + 1, self.latest - self.slots + 1)
+        rows = []
+        for bucket in range(first, last + 1):
+            i = bucket % self.slots
+            held = self.epochs[i] == bucket
+            if by is None:
+                rows.append((bucket * self.width, self.totals[i] if held else 0))
+            else:
+                rows.append((bucket * self.width, dict(self.counts[i].get(by, ())) if held else {}))
+        return rows
+
+
+class RollupStore:
+    """
+    Rollups at every resolution. Pass threadsafe=False when a single thread
+    (or a caller's own lock) does every add and query.
+    """
+
+    def __init__(self, resolutions=None, threadsafe=True):
+        self.lock = threading.Lock() if threadsafe else None
+        self.rings = {
+            name: RingRollup(width, slots)
+            for name, (width, slots) in (resolutions or RESOLUTIONS).items()
+        }
+        self.base = next(iter(self.rings.values()))
+        self.coarse = [ring for ring in self.rings.values() if ring is not self.base]
+        self.current = None  # (bucket, slot) of the base ring added to last, if not folded yet
+        self.folded = -1     # Base buckets up to this one are already in the coarser rings
+
+    def add(self, ts, count=1, **dims):
+        """Record an alert, e.g. add(ts, category='SCAN', severity='HIGH', node='rp6')"""
+        if self.lock is None:
+            self._add(ts, count, dims)
+        else:
+            with self.lock:
+                self._add(ts, count, dims)
+
+    def _add(self, ts, count, dims):
+        base = self.base
+        bucket = int(ts // base.width)
+        current = self.current
+        if current is not None and current[0] == bucket:
+            i = current[1]  # Same second as the last alert: the slot is still ours
+        else:
+            i, evicted = base.claim(bucket)
+            if evicted is not None and evicted[0] > self.folded:
+                self.fold(*evicted)
+            if i is None or bucket <= self.folded:
+                # Too old for seconds, or a second already rolled up: count it in the coarser rings too
+                self.fold(bucket, count, count_dims(dims, count))
+                if i is None:
+                    return
+            else:
+                self.current = (bucket, i)
+        base.totals[i] += count
+        slot = base.counts[i]
+        for dim, value in dims.items():
+            if value is None:
+                continue
+            counts = slot.get(dim)
+            if counts is None:
+                counts = slot[dim] = {}
+            if value.__class__ in MULTI:
+                for v in value:
+                    counts[v] = counts.get(v, 0) + count
+            else:
+                counts[value] = counts.get(value, 0) + count
+
+    def add_counts(self, ts, total, counts):
+        """Record `total` alerts at `ts` at once, with their {dimension: {value: count}}"""
+        if self.lock is None:
+            self._add_counts(ts, total, counts)
+        else:
+            with self.lock:
+                self._add_counts(ts, total, counts)
+
+    def _add_counts(self, ts, total, counts):
+        base = self.base
+        bucket = int(ts // base.width)
+        i, evicted = base.claim(bucket)
+        if evicted is not None and evicted[0] > self.folded:
+            self.fold(*evicted)
+        if i is None or bucket <= self.folded:
+            self.fold(bucket, total, counts)
+            if i is None:
+                return
+        else:
+            self.current = (bucket, i)
+        base.merge_slot(i, total, counts)
+
+    def fold(self, bucket, total, counts):
+        """Roll base bucket counts up into the coarser rings"""
+        start = bucket * self.base.width
+        for ring in self.coarse:
+            ring.merge(int(start // ring.width), total, counts)
+
+    def query(self, resolution, start, end, by=None):
+        """
+        Counts per bucket between start and end (epoch seconds). With `by`
+        set to a dimension, each bucket maps dimension values to counts.
+        """
+        if resolution not in self.rings:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        if by is not None and by not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension: {by}")
+        if self.lock is None:
+            return self._query(self.rings[resolution], start, end, by)
+        with self.lock:
+            return self._query(self.rings[resolution], start, end, by)
+
+    def _query(self, ring, start, end, by):
+        base = self.base
+        if ring is base:
+            return base.query(start, end, by)
+        if base.latest > self.folded:
+            # Roll up the seconds added since the last such query, rather than on every alert
+            for held in base.held(self.folded + 1, base.latest):
+                self.fold(*held)
+            self.folded = base.latest
+            self.current = None  # Later adds to a folded second take the slow path
+        return ring.query(start, end, by)
+
+    def latest(self, resolution='second'):
+        """Start time of the newest bucket written, or None if empty"""
+        base, ring = self.base, self.rings[resolution]
+        if base.latest < 0:
+            return None
+        return base.latest * base.width // ring.width * ring.width
+
+    def total(self, resolution, start, end, by=None):
+        """Sum over a range: an int, or {value: count} when `by` is given"""
+        rows = self.query(resolution, start, end, by)
+        if by is None:
+            return sum(count for _, count in rows)
+        summed = defaultdict(int)
+        for _, counts in rows:
+            for value, count in counts.items():
+                summed[value] += count
+        return dict(summed)
+
+
+def count_dims(dims, count):
+    """{dimension: {value: count}} for one add() call"""
+    counts = {}
+    for dim, value in dims.items():
+        if value is not None:
+            values = counts[dim] = {}
+            for v in (value if value.__class__ in MULTI else (value,)):
+                values[v] = values.get(v, 0) + count
+    return counts
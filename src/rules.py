@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Rule-Aware SID Prefilter
+Loads Suricata rule files (config/custom.rules by default) into a table of
+SID -> msg/gid/rev/classtype/priority. Detectors look up the SID of each
+log line with a few string operations and skip lines whose SID is not in
+the table before running any regex, and take the rule metadata from the
+table instead of re-parsing it from every line.
+"""
+
+import os
+import re
+from pathlib import Path
+
+RULES_FILES = [p for p in os.environ.get(
+    "RULES_FILES", str(Path(__file__).resolve().parent.parent / "config" / "custom.rules")).split(",") if p]
+
+RULE_RE = re.compile(r'^(?:alert|drop|reject|pass)\s[^(]*\((.*)\)\s*$')
+OPTION_RE = re.compile(r'\s*([a-z_.]+)\s*(?::\s*((?:"(?:[^"\\]|\\.)*"|[^;])*))?;')
+EVE_SID_RE = re.compile(r'"signature_id":\s*(\d+)')
+EVE_SID_RE_B = re.compile(rb'"signature_id":\s*(\d+)')
+# Same 5-tuple pattern as SuricataAlertParser.parse_fast_log
+NET_RE = re.compile(r'{(.*?)} ([\d\.]+):(\d+) -> ([\d\.]+):(\d+)')
+NET_RE_B = re.compile(NET_RE.pattern.encode())
+
+
+def sid_of(line):
+    """SID of a fast.log or eve.json line (str or bytes) without parsing it; None if it has none"""
+    raw = isinstance(line, bytes)
+    start = line.find(b'[**] [' if raw else '[**] [')
+    if start >= 0:
+        # "[**] [gid:sid:rev]"
+        head = line[start + 6:line.find(b']' if raw else ']', start + 6)].split(b':' if raw else ':')
+        try:
+            return int(head[1])
+        except (IndexError, ValueError):
+            return None
+    match = (EVE_SID_RE_B if raw else EVE_SID_RE).search(line)
+    return int(match.group(1)) if match else None
+
+
+def line_priority(line, default=5):
+    """Priority printed in a fast.log line, str or bytes (Suricata's default when the rule sets none)"""
+    raw = isinstance(line, bytes)
+    start = line.find(b'[Priority: ' if raw else '[Priority: ')
+    if start < 0:
+        return default
+    try:
+        return int(line[start + 11:line.find(b']' if raw else ']', start)])
+    except ValueError:
+        return default
+
+
+def parse_rule(text):
+    """Metadata dict of one rule (continuation lines joined), or None if it is not a rule"""
+    match = RULE_RE.match(text)
+    if not match:
+        return None
+    options = {key: value for key, value in OPTION_RE.findall(match.group(1))}
+    if 'sid' not in options:
+        return None
+    msg = options.get('msg', "").strip()
+    if msg.startswith('"') and msg.endswith('"'):
+        msg = msg[1:-1].replace('\\"', '"').replace('\\;', ';').replace('\\\\', '\\')
+    return {
+        'sid': int(options['sid']),
+        'gid': int(options.get('gid') or 1),
+        'rev': int(options.get('rev') or 1),
+        'msg': msg,
+        'classtype': options.get('classtype', "").strip() or None,
+        'priority': int(options['priority']) if options.get('priority') else None,
+    }
+
+
+class RuleTable:
+    """SID -> rule metadata for the rules a detector votes on"""
+
+    def __init__(self, paths=RULES_FILES):
+        self.rules = {}
+        self.files = []
+        for path in paths:
+            self.load(path)
+
+    def load(self, path):
+        """Add the enabled rules of a rule file; returns how many were loaded (0 if it is missing)"""
+        try:
+            with open(path, errors='replace') as f:
+                text = f.read()
+        except OSError:
+            return 0
+        loaded = 0
+        for rule_text in text.replace('\\\n', ' ').splitlines():
+            rule = parse_rule(rule_text.strip())  # Commented-out rules do not start with an action
+            if rule:
+                self.rules[rule['sid']] = rule
+                loaded += 1
+        self.files.append(str(path))
+        return loaded
+
+    def __len__(self):
+        return len(self.rules)
+
+    def match(self, line):
+        """Rule of the line's SID, or None if this table does not cover it"""
+        return self.rules.get(sid_of(line))
+
+    def metadata(self, line, rule):
+        """Vote metadata for a fast.log line: SID and priority from the table, the 5-tuple from the line"""
+        if isinstance(line, bytes):
+            net = NET_RE_B.search(line)
+            proto, src_ip, src_port, dst_ip, dst_port = [f.decode('ascii', 'replace') for f in net.groups()] \
+                if net else ("N/A",) * 5
+        else:
+            net = NET_RE.search(line)
+            proto, src_ip, src_port, dst_ip, dst_port = net.groups() if net else ("N/A",) * 5
+        return {
+            'sid': str(rule['sid']),
+            'src_ip': src_ip,
+            'dst_ip': dst_ip,
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'protocol': proto,
+            'priority': rule['priority'] or line_priority(line),
+        }
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Severity-Ordered Send Queue
+A detector's outbound alerts wait in one queue per severity level and the
+sender always takes the highest non-empty level, so a CRITICAL alert goes
+out next even behind thousands of queued INFO scan alerts. A level whose
+oldest alert has waited SEND_MAX_WAIT seconds is served every AGED_EVERY-th
+batch (starvation protection). When the queue is full the oldest alert of
+the lowest level is dropped to make room. SEND_QUEUE=fifo keeps arrival
+order for comparison.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+
+SEND_QUEUE = os.environ.get("SEND_QUEUE", "priority")          # "fifo" sends in arrival order
+SEND_QUEUE_SIZE = int(os.environ.get("SEND_QUEUE_SIZE", 10000))  # Alerts waiting across all levels
+SEND_MAX_WAIT = float(os.environ.get("SEND_MAX_WAIT", 2.0))      # Seconds before a level counts as starved
+SEND_BATCH = int(os.environ.get("SEND_BATCH", 32))               # Largest batch taken from one level
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW", "INFO")
+BATCH = {"CRITICAL": 1, "HIGH": 4, "MEDIUM": 8, "LOW": SEND_BATCH, "INFO": SEND_BATCH}  # Per-level batch size
+AGED_EVERY = 4  # At most one batch in this many goes to a starved level
+
+
+class PrioritySendQueue:
+    """Multi-level outbound queue with starvation protection and per-level batching"""
+
+    def __init__(self, mode=SEND_QUEUE, capacity=SEND_QUEUE_SIZE, max_wait=SEND_MAX_WAIT, batch=BATCH):
+        self.fifo = mode == "fifo"
+        self.capacity = capacity
+        self.max_wait = max_wait
+        self.batch = batch
+        self.queues = {s: deque() for s in SEVERITIES}  # FIFO mode uses the first one only
+        self.depth = 0
+        self.since_aged = 0           # Batches taken since a starved level was last served
+        self.unfinished = 0           # Queued, or taken and not yet marked done (join)
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+        self.all_done = threading.Condition(self.lock)
+        self.stats = {'queued': {s: 0 for s in SEVERITIES},
+                      'dropped': {s: 0 for s in SEVERITIES},
+                      'batches': 0, 'aged_batches': 0,
+                      'wait_ms': {s: 0.0 for s in SEVERITIES}}  # Smoothed time in the queue per level
+
+    def put(self, item, severity, now=None):
+        """Queue an item; returns False if it was dropped because lower levels were empty and the queue full"""
+        if severity not in self.queues:
+            severity = "MEDIUM"
+        now = time.time() if now is None else now
+        with self.lock:
+            if self.depth >= self.capacity:
+                victim = self.lowest(severity)
+                if victim is None:
+                    self.stats['dropped'][severity] += 1
+                    return False
+                self.stats['dropped'][victim.popleft()[1]] += 1
+                self.depth -= 1
+                self.unfinished -= 1
+            self.queues[SEVERITIES[0] if self.fifo else severity].append((now, severity, item))
+            self.depth += 1
+            self.unfinished += 1
+            self.stats['queued'][severity] += 1
+            self.ready.notify()
+        return True
+
+    def lowest(self, severity):
+        """Queue to drop from: the lowest non-empty level at or below `severity` (lock held)"""
+        if self.fifo:
+            return self.queues[SEVERITIES[0]]
+        for level in reversed(SEVERITIES[SEVERITIES.index(severity):]):
+            if self.queues[level]:
+                return self.queues[level]
+        return None
+
+    def pick(self, now):
+        """Level to serve next: the highest non-empty one, or a starved one every AGED_EVERY-th batch (lock held)"""
+        levels = [s for s in SEVERITIES if self.queues[s]]
+        self.since_aged += 1
+        if self.since_aged >= AGED_EVERY:
+            starved = [(self.queues[s][0][0], s) for s in levels[1:] if now - self.queues[s][0][0] >= self.max_wait]
+            if starved:
+                self.since_aged = 0
+                self.stats['aged_batches'] += 1
+                return min(starved)[1]
+        return levels[0]
+
+    def get(self, limit=None):
+        """Block until something is queued; returns [(severity, item)] taken from one level"""
+        with self.lock:
+            while not self.depth:
+                self.ready.wait()
+            now = time.time()
+            level = self.pick(now)
+            queue = self.queues[level]
+            size = max(self.batch.values()) if self.fifo else self.batch[level]
+            taken = [queue.popleft() for _ in range(min(len(queue), limit or size))]
+            self.depth -= len(taken)
+            self.stats['batches'] += 1
+            wait = self.stats['wait_ms']
+            for queued, severity, _ in taken:
+                wait[severity] += ((now - queued) * 1000 - wait[severity]) * 0.05
+        return [(severity, item) for _, severity, item in taken]
+
+    def task_done(self, count=1):
+        """Mark `count` items taken with get() as handled"""
+        with self.lock:
+            self.unfinished -= count
+            if self.unfinished <= 0:
+                self.all_done.notify_all()
+
+    def join(self, timeout=None):
+        """Block until every queued item was taken and marked done; False on timeout"""
+        with self.lock:
+            return self.all_done.wait_for(lambda: self.unfinished <= 0, timeout)
+
+    def qsize(self):
+        return self.depth
+
+    def status(self):
+        with self.lock:
+            return dict(self.stats, mode="fifo" if self.fifo else "priority", depth=self.depth,
+                        queued=dict(self.stats['queued']), dropped=dict(self.stats['dropped']),
+                        wait_ms={s: round(w, 1) for s, w in self.stats['wait_ms'].items()})
@@ -5,16 +5,27 @@ Enhanced version with dual log monitoring (fast.log + eve.json)
 Author: Research Project - MSU
 """
 
+import os
+import sys
 import json
+import gzip
 import time
 import socket
+import argparse
 import threading
 import hashlib
 from datetime import datetime
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
 import re
 
+from rollups import RollupStore, RESOLUTIONS
+from send_queue import PrioritySendQueue
+from profiling import StatsServer
+from rules import RuleTable, RULES_FILES
+from hot_config import HotConfig, text, port, existing_file
+from tail import ByteTailer, chunk_lines
+
 # Configuration
 COORDINATOR_HOST = "192.168.1.100"  # Update with your coordinator IP
 COORDINATOR_PORT = 5000
@@ -24,6 +35,10 @@ DETECTOR_ID = "rp6"  # Change per node: rp6, rp7, rp8
 SURICATA_FAST_LOG = "/usr/local/var/log/suricata/fast.log"
 SURICATA_EVE_JSON = "/usr/local/var/log/suricata/eve.json"
 
+# Pipeline profiling
+PIPELINE_STATS = os.environ.get("PIPELINE_STATS", "off")  # "on" times every stage while monitoring
+STATS_SOCKET = os.environ.get("STATS_SOCKET", "")         # Unix socket for stats/profile queries ("" = off)
+
 # Alert severity mapping
 SEVERITY_MAP = {
     1: "CRITICAL",
@@ -45,13 +60,76 @@ ATTACK_CATEGORIES = {
 }
 
 
+class EventTally:
+    """
+    Rollup counts for a stream of parsed alerts. Each alert costs one counter
+    increment for its (category, severity, protocol); the counts of each bucket of the store's finest
+    resolution are added to the RollupStore in one go, oldest first, when
+    MAX_PENDING buckets are open or before a query, so timestamps are parsed
+    once per bucket, not per alert, even when late alerts interleave. Pass
+    threadsafe=False when a single thread (or the caller's lock) does every
+    add and flush.
+    """
+    
+    # Finest rollup width -> length of the fast.log / eve.json timestamp prefix naming its bucket
+    STAMP_PREFIX = {1: 19, 60: 16, 3600: 13}
+    MAX_PENDING = 64
+    
+    def __init__(self, rollups, threadsafe=True):
+        self.rollups = rollups
+        self.prefix = self.STAMP_PREFIX[rollups.base.width]
+        self.lock = threading.Lock() if threadsafe else None
+        self.pending = {}  # Timestamp prefix -> {(category, severity, protocol): alerts}
+        self.times = {}    # Timestamp prefix -> event time in that bucket
+    
+    def add(self, alert):
+        if self.lock is None:
+            self._add(alert)
+        else:
+            with self.lock:
+                self._add(alert)
+    
+    def _add(self, alert):
+        bucket = alert['timestamp'][:self.prefix]
+        counts = self.pending.get(bucket)
+        if counts is None:
+            if len(self.pending) >= self.MAX_PENDING:
+                self._flush()
+            counts = self.pending[bucket] = {}
+            self.times[bucket] = SuricataAlertParser.event_time(alert) or time.time()
+        key = (alert['category'], alert['severity'], alert['protocol'])
+        counts[key] = counts.get(key, 0) + 1
+    
+    def flush(self):
+        """Add the pending counts to the rollups (call before querying them)"""
+        if self.lock is None:
+            self._flush()
+        else:
+            with self.lock:
+                self._flush()
+    
+    def _flush(self):
+        # Oldest first, so a late bucket isn't evicted by a newer one added before it
+        for bucket in sorted(self.pending, key=self.times.get):
+            by = {'category': {}, 'severity': {}, 'protocol': {}}
+            counts = self.pending[bucket]
+            for key, count in counts.items():
+                for dim, value in zip(('category', 'severity', 'protocol'), key):
+                    by[dim][value] = by[dim].get(value, 0) + count
+            self.rollups.add_counts(self.times[bucket], sum(counts.values()), by)
+        self.pending, self.times = {}, {}
+
+
 class AlertAggregator:
     """Aggregates and formats alerts for presentation"""
     
     def __init__(self):
         self.alerts = []
         self.stats = defaultdict(int)
-        self.attack_timeline = []
+        self.attack_timeline = deque(maxlen=100)  # Recent entries only; history lives in rollups
+        # Per minute only, for the statistics. No node: in a detector's own rollups it equals the total
+        self.rollups = RollupStore({'minute': RESOLUTIONS['minute']})
+        self.tally = EventTally(self.rollups)
         
     def add_alert(self, alert_data):
         """Add alert and update statistics"""
@@ -68,6 +146,15 @@ class AlertAggregator:
             'category': alert_data['category'],
             'signature': alert_data['signature'][:50]
         })
+        self.tally.add(alert_data)
+        
+    def last_minute(self, by='category'):
+        """Counts in the minute (of event time) of the newest alert, from the rollups"""
+        self.tally.flush()
+        end = self.rollups.latest('minute')
+        if end is None:
+            return {}
+        return self.rollups.total('minute', end, end, by=by)
         
     def get_summary(self):
         """Get formatted summary for presentation"""
@@ -75,19 +162,81 @@ class AlertAggregator:
             'total_alerts': self.stats['total'],
             'by_severity': {k: self.stats[k] for k in ['CRITICAL', 'HIGH', 'MEDIUM', 'LOW', 'INFO'] if self.stats[k] > 0},
             'by_category': {k: self.stats[k] for k in ATTACK_CATEGORIES.keys() if self.stats[k] > 0},
-            'recent_timeline': self.attack_timeline[-10:]
+            'last_minute': self.last_minute(),
+            'recent_timeline': list(self.attack_timeline)[-10:]
+        }
+
+
+class StageStats:
+    """Per-stage call counts, cumulative time and latency histograms for the alert pipeline"""
+    
+    STAGES = ['read', 'filter', 'parse', 'dedup', 'categorize', 'display', 'send', 'socket']
+    
+    def __init__(self):
+        self.count = defaultdict(int)
+        self.seconds = defaultdict(float)
+        # Four buckets per power of two nanoseconds (~20% wide) keep a lap to a few adds
+        self.hist = defaultdict(lambda: [0] * 256)
+        self.started = time.time()
+        
+    def lap(self, stage, started, items=1):
+        """Charge time since `started` to a stage and return the current time"""
+        now = time.perf_counter()
+        ns = int((now - started) * 1e9)
+        bits = ns.bit_length()
+        self.hist[stage][bits * 4 + ((ns >> (bits - 3)) & 3 if bits > 3 else 0)] += 1
+        self.count[stage] += items
+        self.seconds[stage] += now - started
+        return now
+    
+    def quantile(self, stage, q):
+        """Upper edge, in microseconds, of the histogram bucket holding quantile q of a stage's laps"""
+        hist = self.hist[stage]
+        rank = q * sum(hist)
+        seen = 0
+        for i, n in enumerate(hist):
+            seen += n
+            if n and seen >= rank:
+                bits, sub = divmod(i, 4)
+                return ((5 + sub) << (bits - 3) if bits > 3 else 1 << bits) / 1000.0
+        return None
+    
+    def summary(self):
+        """Per-stage totals, throughput (items/sec spent in that stage) and lap p50/p99"""
+        return {
+            stage: {
+                'count': self.count[stage],
+                'seconds': round(self.seconds[stage], 6),
+                'per_second': round(self.count[stage] / self.seconds[stage], 1) if self.seconds[stage] else None,
+                'p50_us': self.quantile(stage, 0.50),
+                'p99_us': self.quantile(stage, 0.99),
+            }
+            for stage in self.STAGES if self.count[stage]
         }
 
 
 class SuricataAlertParser:
     """Parse both fast.log and eve.json formats"""
     
+    # parse_fast_log patterns for lines read as bytes (ByteTailer). The whole
+    # line in Suricata's usual field order is one match; anything else is
+    # parsed field by field as in the str version
+    FAST_LINE_RE_B = re.compile(rb'(\d{2}/\d{2}/\d{4}-\d{2}:\d{2}:\d{2}\.\d+)\s+\[\*\*\] \[(\d+):(\d+):(\d+)\] (.*?) \[\*\*\] '
+                                rb'\[Classification: (.*?)\] \[Priority: (\d+)\] {(.*?)} ([\d\.]+):(\d+) -> ([\d\.]+):(\d+)')
+    FAST_TS_RE_B = re.compile(rb'(\d{2}/\d{2}/\d{4}-\d{2}:\d{2}:\d{2}\.\d+)')
+    FAST_SIG_RE_B = re.compile(rb'\[\*\*\] \[(\d+):(\d+):(\d+)\] (.*?) \[\*\*\]')
+    FAST_CLASS_RE_B = re.compile(rb'\[Classification: (.*?)\]')
+    FAST_PRIO_RE_B = re.compile(rb'\[Priority: (\d+)\]')
+    FAST_NET_RE_B = re.compile(rb'{(.*?)} ([\d\.]+):(\d+) -> ([\d\.]+):(\d+)')
+    
     @staticmethod
     def parse_fast_log(line):
         """
         Parse fast.log format:
         MM/DD/YYYY-HH:MM:SS.mmmmmm  [**] [gid:sid:rev] signature [**] [Classification: type] [Priority: N] {proto} src:port -> dst:port
         """
+        if isinstance(line, bytes):
+            return SuricataAlertParser.parse_fast_log_bytes(line)
         try:
             # Extract timestamp
             ts_match = re.match(r'(\d{2}/\d{2}/\d{4}-\d{2}:\d{2}:\d{2}\.\d+)', line)
@@ -136,6 +285,52 @@ class SuricataAlertParser:
             print(f"[ERROR] Failed to parse fast.log line: {e}")
             return None
     
+    @staticmethod
+    def parse_fast_log_bytes(line):
+        """parse_fast_log for a bytes line: the same dict, decoding only the captured fields"""
+        P = SuricataAlertParser
+        try:
+            match = P.FAST_LINE_RE_B.match(line)
+            if match:
+                (timestamp, gid, sid, rev, signature, classification, priority,
+                 proto, src_ip, src_port, dst_ip, dst_port) = match.groups()
+                priority = int(priority)
+            else:
+                ts_match = P.FAST_TS_RE_B.match(line)
+                if not ts_match:
+                    return None
+                timestamp = ts_match.group(1)
+                sig_match = P.FAST_SIG_RE_B.search(line)
+                if not sig_match:
+                    return None
+                gid, sid, rev, signature = sig_match.groups()
+                class_match = P.FAST_CLASS_RE_B.search(line)
+                classification = class_match.group(1) if class_match else b"Unknown"
+                prio_match = P.FAST_PRIO_RE_B.search(line)
+                priority = int(prio_match.group(1)) if prio_match else 5
+                net_match = P.FAST_NET_RE_B.search(line)
+                proto, src_ip, src_port, dst_ip, dst_port = net_match.groups() if net_match else (b"N/A",) * 5
+            
+            return {
+                'timestamp': timestamp.decode('ascii'),
+                'signature': signature.decode('utf-8', 'replace'),
+                'gid': gid.decode('ascii'),
+                'sid': sid.decode('ascii'),
+                'rev': rev.decode('ascii'),
+                'classification': classification.decode('utf-8', 'replace'),
+                'priority': priority,
+                'severity': SEVERITY_MAP.get(priority, "INFO"),
+                'protocol': proto.decode('utf-8', 'replace'),
+                'src_ip': src_ip.decode('ascii'),
+                'src_port': src_port.decode('ascii'),
+                'dst_ip': dst_ip.decode('ascii'),
+                'dst_port': dst_port.decode('ascii'),
+                'source': 'fast.log'
+            }
+        except Exception as e:
+            print(f"[ERROR] Failed to parse fast.log line: {e}")
+            return None
+    
     @staticmethod
     def parse_eve_json(line):
         """
@@ -178,6 +373,33 @@ class SuricataAlertParser:
             print(f"[ERROR] Failed to parse eve.json line: {e}")
             return None
     
+    # Whole-second timestamp -> epoch; alerts arrive in time order, so
+    # strptime runs about once per second of traffic instead of per alert
+    _epoch_cache = {}
+    
+    @staticmethod
+    def event_time(alert):
+        """Original event time (epoch seconds) from a parsed alert, or None"""
+        try:
+            whole, _, frac = alert['timestamp'].partition('.')
+            if alert['source'] == 'fast.log':
+                key, fmt = whole, '%m/%d/%Y-%H:%M:%S'
+            else:
+                # eve.json: 2024-01-15T10:30:45.123456+0000
+                frac, zone = frac[:-5], frac[-5:]
+                key, fmt = whole + zone, '%Y-%m-%dT%H:%M:%S%z'
+            
+            cache = SuricataAlertParser._epoch_cache
+            base = cache.get(key)
+            if base is None:
+                base = datetime.strptime(key, fmt).timestamp()
+                if len(cache) >= 4096:
+                    cache.clear()
+                cache[key] = base
+            return base + float('0.' + frac) if frac.isdigit() else base
+        except (KeyError, ValueError):
+            return None
+    
     @staticmethod
     def categorize_attack(signature, classification):
         """Determine attack category from signature and classification"""
@@ -199,20 +421,49 @@ class SuricataMonitor:
         self.aggregator = AlertAggregator()
         self.running = False
         self.processed_alerts = set()  # Avoid duplicates
+        self.display = True            # Print each alert (disabled for quiet replay)
+        self.dry_run = False           # Skip the network send (replay benchmarking)
+        self.stage_stats = StageStats() if PIPELINE_STATS == "on" else None  # Per-stage timing
+        self.outbox = PrioritySendQueue()  # Alerts waiting to be sent, highest severity first
+        self.sender = None
+        self.send_stats = {'sent': 0, 'failed': 0}  # Alerts the sender thread has handled
+        self.rules = None              # RuleTable: lines whose SID it does not cover are skipped unparsed
+        # Reloadable from CONFIG_FILE on SIGHUP or `reload` on the stats socket;
+        # tail positions, dedup state, statistics and queued alerts are kept
+        self.config = HotConfig(sys.modules[__name__], {
+            'COORDINATOR_HOST': ('COORDINATOR_HOST', text),
+            'COORDINATOR_PORT': ('COORDINATOR_PORT', port),
+            'DETECTOR_ID': ('DETECTOR_ID', text),
+            'SURICATA_FAST_LOG': ('SURICATA_FAST_LOG', existing_file),
+            'SURICATA_EVE_JSON': ('SURICATA_EVE_JSON', existing_file),
+        }, apply=self.apply_config)
+        
+    def apply_config(self, changed):
+        if 'DETECTOR_ID' in changed:
+            self.detector_id = DETECTOR_ID
         
-    def tail_file(self, filepath):
-        """Tail a file and yield new lines (like tail -f)"""
+    def tail_file(self, filepath, current=None):
+        """Tail a file and yield new lines as bytes (like tail -f); moves to current() once a reload changes it"""
         try:
-            with open(filepath, 'r') as f:
-                # Start from end of file
-                f.seek(0, 2)
-                
+            # Start from end of file
+            tailer = ByteTailer(filepath)
+            try:
                 while self.running:
-                    line = f.readline()
-                    if line:
-                        yield line.strip()
+                    t = time.perf_counter()
+                    lines = tailer.lines()
+                    if lines:
+                        if self.stage_stats:
+                            self.stage_stats.lap('read', t, len(lines))
+                        yield from lines
+                    elif current and current() != filepath:
+                        # Old file read to the end; tail the new one from its end
+                        print(f"[{self.detector_id}] Now monitoring: {current()}")
+                        yield from self.tail_file(current(), current)
+                        return
                     else:
                         time.sleep(0.1)
+            finally:
+                tailer.close()
         except FileNotFoundError:
             print(f"[WARNING] Log file not found: {filepath}")
             time.sleep(5)
@@ -224,11 +475,14 @@ class SuricataMonitor:
         """Monitor fast.log for alerts"""
         print(f"[{self.detector_id}] Starting fast.log monitor...")
         
-        for line in self.tail_file(SURICATA_FAST_LOG):
-            if not line or line.startswith('#'):
+        for line in self.tail_file(SURICATA_FAST_LOG, lambda: SURICATA_FAST_LOG):
+            if not line or line.startswith(b'#') or not self.relevant(line):
                 continue
             
+            t = time.perf_counter()
             alert = self.parser.parse_fast_log(line)
+            if self.stage_stats:
+                self.stage_stats.lap('parse', t)
             if alert:
                 self.process_alert(alert)
     
@@ -236,28 +490,52 @@ class SuricataMonitor:
         """Monitor eve.json for alerts"""
         print(f"[{self.detector_id}] Starting eve.json monitor...")
         
-        for line in self.tail_file(SURICATA_EVE_JSON):
-            if not line:
+        for line in self.tail_file(SURICATA_EVE_JSON, lambda: SURICATA_EVE_JSON):
+            if not line or not self.relevant(line):
                 continue
             
+            t = time.perf_counter()
             alert = self.parser.parse_eve_json(line)
+            if self.stage_stats:
+                self.stage_stats.lap('parse', t)
             if alert:
                 self.process_alert(alert)
     
+    def relevant(self, line):
+        """False if a rule table is loaded and the line's SID is not in it (checked before parsing)"""
+        if self.rules is None:
+            return True
+        stats = self.stage_stats
+        t = time.perf_counter() if stats else 0
+        rule = self.rules.match(line)
+        if stats:
+            stats.lap('filter', t)
+            if rule is None:
+                stats.count['filtered'] += 1
+        return rule is not None
+    
     def process_alert(self, alert):
         """Process and forward alert to coordinator"""
         if not alert:
             return
         
+        stats = self.stage_stats
+        t = time.perf_counter() if stats else 0
+        
         # Create unique alert ID to avoid duplicates
         alert_id = hashlib.md5(
             f"{alert['timestamp']}{alert['sid']}{alert['src_ip']}{alert['dst_ip']}".encode()
         ).hexdigest()
         
         if alert_id in self.processed_alerts:
+            if stats:
+                stats.lap('dedup', t)
+                stats.count['duplicates'] += 1
             return
         
         self.processed_alerts.add(alert_id)
+        if stats:
+            t = stats.lap('dedup', t)
         
         # Add category
         alert['category'] = self.parser.categorize_attack(
@@ -267,12 +545,21 @@ class SuricataMonitor:
         
         # Add to aggregator for statistics
         self.aggregator.add_alert(alert)
+        if stats:
+            t = stats.lap('categorize', t)
         
         # Format for presentation
-        self.display_alert(alert)
+        if self.display:
+            self.display_alert(alert)
+            if stats:
+                t = stats.lap('display', t)
         
-        # Send to Byzantine coordinator
-        self.send_to_coordinator(alert)
+        # Queue for the Byzantine coordinator; CRITICAL alerts overtake queued scans
+        queued = True if self.dry_run else self.outbox.put(alert, alert['severity'])
+        if stats:
+            stats.lap('send', t)
+            if not queued:
+                stats.count['send_failures'] += 1
     
     def display_alert(self, alert):
         """Display alert in organized, presentation-ready format"""
@@ -302,34 +589,166 @@ class SuricataMonitor:
         
         print("="*80 + "\n")
     
-    def send_to_coordinator(self, alert):
-        """Send alert to Byzantine coordinator for consensus voting"""
+    def start_sender(self):
+        """Start the thread that drains the outbox (once)"""
+        if self.sender is None:
+            self.sender = threading.Thread(target=self.send_loop, daemon=True)
+            self.sender.start()
+    
+    def send_loop(self):
+        """Send queued alerts one batch (one severity level) per connection"""
+        while True:
+            alerts = [alert for _, alert in self.outbox.get()]
+            t = time.perf_counter()
+            try:
+                sent = self.send_to_coordinator(alerts)
+                self.send_stats['sent' if sent else 'failed'] += len(alerts)
+                stats = self.stage_stats
+                if stats:
+                    stats.lap('socket', t, len(alerts))
+                    if not sent:
+                        stats.count['send_failures'] += len(alerts)
+            finally:
+                self.outbox.task_done(len(alerts))
+    
+    def send_to_coordinator(self, alerts):
+        """Send a batch of alerts to Byzantine coordinator for consensus voting"""
+        with self.config.lock:
+            host, port, detector_id = COORDINATOR_HOST, COORDINATOR_PORT, self.detector_id
         try:
-            # Prepare Byzantine alert message
-            message = {
+            # Prepare Byzantine alert messages, one JSON line each
+            now = time.time()
+            payload = b''.join(json.dumps({
                 'type': 'SECURITY_ALERT',
-                'detector_id': self.detector_id,
+                'detector_id': detector_id,
                 'alert': alert,
-                'timestamp': time.time()
-            }
+                'timestamp': now
+            }).encode() + b'\n' for alert in alerts)
             
             # Send to coordinator
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             sock.settimeout(5)
-            sock.connect((COORDINATOR_HOST, COORDINATOR_PORT))
-            sock.sendall(json.dumps(message).encode() + b'\n')
+            sock.connect((host, port))
+            sock.sendall(payload)
             
             # Receive response
             response = sock.recv(4096).decode()
-            print(f"[{self.detector_id}] Coordinator response: {response}")
+            if self.display:
+                print(f"[{self.detector_id}] Coordinator response: {response}")
             
             sock.close()
+            return True
             
         except Exception as e:
             print(f"[{self.detector_id}] Failed to send to coordinator: {e}")
+            return False
+    
+    @staticmethod
+    def open_log(filepath):
+        """Open a plain or gzip-compressed log file for binary reading"""
+        if str(filepath).endswith('.gz'):
+            return gzip.open(filepath, 'rb')
+        return open(filepath, 'rb')
+    
+    def replay(self, filepaths, speed=0.0):
+        """
+        Run archived fast.log/eve.json files through the full pipeline.
+        speed=0 replays as fast as possible; otherwise event timestamps are
+        honoured, scaled by `speed` (1.0 = real time, 10 = ten times faster).
+        """
+        self.stage_stats = stats = StageStats()
+        if not self.dry_run:
+            self.start_sender()
+        first_event = wall_start = None
+        started = time.perf_counter()
+        
+        for filepath in filepaths:
+            name = Path(filepath).name
+            is_eve = 'eve' in name or '.json' in name
+            parse = self.parser.parse_eve_json if is_eve else self.parser.parse_fast_log
+            print(f"[{self.detector_id}] Replaying {filepath} ({'eve.json' if is_eve else 'fast.log'})")
+            
+            with self.open_log(filepath) as f:
+                t = time.perf_counter()
+                for lines in chunk_lines(f):
+                    stats.lap('read', t, len(lines))
+                    
+                    for line in lines:
+                        if not line or line.startswith(b'#') or not self.relevant(line):
+                            continue
+                        t = time.perf_counter()
+                        alert = parse(line)
+                        stats.lap('parse', t)
+                        if not alert:
+                            continue
+                        
+                        if speed > 0:
+                            event = self.parser.event_time(alert)
+                            if event is not None:
+                                if first_event is None:
+                                    first_event, wall_start = event, time.time()
+                                delay = wall_start + (event - first_event) / speed - time.time()
+                                if delay > 0:
+                                    time.sleep(delay)
+                        
+                        self.process_alert(alert)
+                    t = time.perf_counter()
+        
+        if not self.dry_run:
+            self.outbox.join()  # Until the sender has handled the last batch, not just taken it
+        self.print_replay_summary(time.perf_counter() - started)
+        return stats.summary()
+    
+    def print_replay_summary(self, elapsed):
+        """Print per-stage throughput and totals after a replay"""
+        stats = self.stage_stats
+        lines = stats.count['read']
+        alerts = stats.count['dedup']  # Every parsed alert passes through dedup
+        
+        print("\n" + "="*80)
+        print(f"📼 REPLAY SUMMARY - Detector {self.detector_id}")
+        print("="*80)
+        self.print_stage_table(stats.summary())
+        print("-"*80)
+        print(f"Lines Read       : {lines:,}")
+        print(f"Alerts Parsed    : {alerts:,}")
+        print(f"Duplicates       : {stats.count['duplicates']:,}")
+        if self.rules is not None:
+            print(f"Filtered by SID  : {stats.count['filtered']:,} ({len(self.rules)} rules loaded)")
+        if self.dry_run:
+            print(f"Sent             : {stats.count['send']:,} (dry run)")
+        else:
+            print(f"Sent             : {self.send_stats['sent']:,}")
+            print(f"Send Failures    : {self.send_stats['failed']:,}")
+            print(f"Queue Drops      : {sum(self.outbox.status()['dropped'].values()):,}")
+        print(f"Wall Time        : {elapsed:.2f}s ({lines / elapsed if elapsed else 0:,.0f} lines/sec)")
+        print(f"By Category      : {self.aggregator.get_summary()['by_category']}")
+        print("="*80 + "\n")
+    
+    @staticmethod
+    def print_stage_table(summary):
+        """Per-stage count, time, throughput and lap latency quantiles"""
+        print(f"{'STAGE':<14}{'COUNT':>12}{'SECONDS':>12}{'ITEMS/SEC':>14}{'P50 US':>14}{'P99 US':>14}")
+        print("-"*80)
+        for stage, row in summary.items():
+            rate = f"{row['per_second']:,.0f}" if row['per_second'] else "-"
+            print(f"{stage:<14}{row['count']:>12,}{row['seconds']:>12.3f}{rate:>14}"
+                  f"{row['p50_us']:>14,.1f}{row['p99_us']:>14,.1f}")
+    
+    def pipeline_status(self):
+        """Stage timings, alert rate and send queue state (stats socket and print_statistics)"""
+        status = {'detector_id': self.detector_id, 'pipeline_stats': "on" if self.stage_stats else "off",
+                  'send_queue': self.outbox.status(), 'config': self.config.status()}
+        stats = self.stage_stats
+        if stats:
+            elapsed = time.time() - stats.started
+            status['alerts_per_second'] = round(stats.count['dedup'] / elapsed, 1) if elapsed else None
+            status['stages'] = stats.summary()
+        return status
     
     def print_statistics(self):
         """Print statistics periodically"""
+        last_alerts = 0
         while self.running:
             time.sleep(60)  # Print every 60 seconds
             
@@ -341,6 +760,17 @@ class SuricataMonitor:
             print(f"Total Alerts     : {summary['total_alerts']}")
             print(f"By Severity      : {summary['by_severity']}")
             print(f"By Category      : {summary['by_category']}")
+            print(f"Last Minute      : {summary['last_minute']}")
+            outbox = self.outbox.status()
+            print(f"Send Queue       : {outbox['depth']} waiting, dropped {outbox['dropped']}, "
+                  f"wait ms {outbox['wait_ms']}")
+            stats = self.stage_stats
+            if stats:
+                alerts = stats.count['dedup']  # Every parsed alert passes through dedup
+                print(f"Alerts/sec       : {(alerts - last_alerts) / 60:,.1f} (last minute)")
+                last_alerts = alerts
+                print("-"*80)
+                self.print_stage_table(stats.summary())
             print("="*80 + "\n")
     
     def start(self):
@@ -355,6 +785,15 @@ class SuricataMonitor:
         eve_thread = threading.Thread(target=self.monitor_eve_json, daemon=True)
         eve_thread.start()
         
+        # Start the sender (alerts go out highest severity first)
+        self.start_sender()
+        
+        # Answer stats/profile/reload queries without a restart
+        self.config.install_signal()
+        if STATS_SOCKET:
+            server = StatsServer(STATS_SOCKET, self.pipeline_status, {'reload': self.config.reload})
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        
         # Start statistics thread
         stats_thread = threading.Thread(target=self.print_statistics, daemon=True)
         stats_thread.start()
@@ -363,6 +802,8 @@ class SuricataMonitor:
         print(f"[{self.detector_id}] Monitoring: {SURICATA_FAST_LOG}")
         print(f"[{self.detector_id}] Monitoring: {SURICATA_EVE_JSON}")
         print(f"[{self.detector_id}] Coordinator: {COORDINATOR_HOST}:{COORDINATOR_PORT}")
+        if STATS_SOCKET:
+            print(f"[{self.detector_id}] Stats socket: {STATS_SOCKET} (python3 profiling.py --socket {STATS_SOCKET} stats)")
         
         # Keep running
         try:
@@ -375,6 +816,17 @@ class SuricataMonitor:
 
 def main():
     """Main entry point"""
+    parser = argparse.ArgumentParser(description="Suricata Byzantine detector")
+    parser.add_argument("--replay", nargs="+", metavar="FILE",
+                        help="Replay archived fast.log/eve.json files (.gz supported) instead of tailing")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Replay time scale (0 = as fast as possible, 1 = real time)")
+    parser.add_argument("--quiet", action="store_true", help="Don't print each alert")
+    parser.add_argument("--dry-run", action="store_true", help="Don't send to the coordinator")
+    parser.add_argument("--rules", nargs="*", metavar="FILE",
+                        help="Only handle alerts of SIDs in these rule files (no FILE: RULES_FILES)")
+    args = parser.parse_args()
+    
     print("="*80)
     print("Byzantine Fault-Tolerant IDS with Suricata Integration")
     print("Dual Log Monitoring: fast.log + eve.json")
@@ -382,6 +834,15 @@ def main():
     
     # Create and start monitor
     monitor = SuricataMonitor(DETECTOR_ID)
+    monitor.config.load()
+    if args.rules is not None:
+        monitor.rules = RuleTable(args.rules or RULES_FILES)
+        print(f"[{DETECTOR_ID}] SID prefilter: {len(monitor.rules)} rules from {', '.join(monitor.rules.files)}")
+    if args.replay:
+        monitor.display = not args.quiet
+        monitor.dry_run = args.dry_run
+        monitor.replay(args.replay, speed=args.speed)
+        return
     monitor.start()
 
 
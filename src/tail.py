@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Byte-Level Log Tailing
+Reads fast.log/eve.json in binary chunks instead of one decoded str per
+readline(). A chunk is cut after its last newline and split into bytes
+lines in one call; the regexes, SID lookup and fingerprint then run on the
+bytes and decode only the fields they capture. The log forwarder passes
+memoryview slices of a chunk straight to sendto() without decoding or
+copying a line.
+"""
+
+import os
+
+CHUNK_SIZE = int(os.environ.get("TAIL_CHUNK", 65536))  # Bytes read per call
+# Largest datagram of whole lines; 1472 fills a 1500-byte Ethernet frame without IP fragmentation
+MAX_DATAGRAM = int(os.environ.get("FORWARD_DATAGRAM", 1472))
+
+
+class ByteTailer:
+    """Follow a growing log as bytes, returning only complete lines"""
+
+    def __init__(self, path, from_end=True, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.file = open(path, 'rb', buffering=0)  # Unbuffered: one read() per chunk
+        if from_end:
+            self.file.seek(0, os.SEEK_END)
+        self.partial = b''  # Start of a line the writer has not finished yet
+
+    def chunk(self):
+        """Whole lines appended since the last call, as one buffer ending in a newline (b'' if none)"""
+        data = self.file.read(self.chunk_size)
+        if not data:
+            return b''
+        if self.partial:
+            data = self.partial + data
+        end = data.rfind(b'\n') + 1
+        self.partial = data[end:]
+        return data if end == len(data) else data[:end]
+
+    def lines(self):
+        """Complete lines appended since the last call, without their newlines"""
+        lines = self.chunk().split(b'\n')
+        lines.pop()  # Empty: the chunk ends in a newline
+        return lines
+
+    def close(self):
+        self.file.close()
+
+
+def chunk_lines(f, chunk_size=CHUNK_SIZE):
+    """Lists of lines (without newlines) read from a binary file to its end"""
+    partial = b''
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            break
+        lines = (partial + data if partial else data).split(b'\n')
+        partial = lines.pop()
+        yield lines
+    if partial:
+        yield [partial]
+
+
+def datagrams(chunk, limit=MAX_DATAGRAM):
+    """memoryview slices of a chunk of whole lines, each as many lines as fit in `limit` bytes"""
+    view = memoryview(chunk)
+    start, size = 0, len(chunk)
+    while start < size:
+        stop = size
+        if size - start > limit:
+            stop = chunk.rfind(b'\n', start, start + limit) + 1
+            if stop <= start:
+                stop = chunk.find(b'\n', start + limit) + 1 or size  # One line longer than `limit` goes alone
+        yield view[start:stop]
+        start = stop
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Upstream Vote Forwarding
+A coordinator started with UPSTREAM_URL acts as a sub-coordinator: it runs
+consensus for its own group of detectors and also forwards every accepted
+vote to the parent coordinator. Votes are grouped per alert into summaries
+(message, fingerprint, metadata and the voting nodes), and each flush sends
+all of them in one request to the parent's /votes endpoint.
+"""
+
+import os
+import time
+import threading
+
+import requests
+
+from vote_auth import VoteSigner, AuthError
+
+UPSTREAM_INTERVAL = float(os.environ.get("UPSTREAM_INTERVAL", 0.05))  # Seconds between batches
+UPSTREAM_KEY = os.environ.get("UPSTREAM_KEY", "coordinator")          # Parent's key name (vote auth)
+
+
+class UpstreamForwarder:
+    """Accumulates per-alert vote summaries and posts them to the parent in batches"""
+
+    def __init__(self, url, node_id, interval=UPSTREAM_INTERVAL, authenticate=False):
+        self.url = url.rstrip("/") + "/votes"
+        self.node_id = node_id
+        self.interval = interval
+        self.signer = VoteSigner(node_id, self.url, coordinator=UPSTREAM_KEY) if authenticate else None
+        self.http = requests.Session()
+        self.lock = threading.Lock()
+        self.pending = {}   # alert key -> summary, since the last flush
+        self.stats = {'batches': 0, 'summaries': 0, 'votes': 0, 'failures': 0}
+
+    def add(self, key, message, node, fingerprint=None, meta=None, incident=None):
+        """Queue one accepted vote under its local consensus key"""
+        with self.lock:
+            summary = self.pending.get(key)
+            if summary is None:
+                summary = self.pending[key] = {'message': message, 'fingerprint': fingerprint, 'nodes': []}
+            if node not in summary['nodes']:
+                summary['nodes'].append(node)
+            if isinstance(meta, dict) and 'alert' not in summary:
+                summary['alert'] = meta
+            if isinstance(incident, dict):
+                summary.setdefault('incidents', {})[node] = incident
+
+    def flush(self):
+        """Send everything queued since the last flush as one request"""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+        batch = {'node': self.node_id, 'summaries': list(pending.values())}
+        try:
+            if self.signer:
+                response = self.signer.post(self.http, self.url, batch, timeout=5)
+            else:
+                response = self.http.post(self.url, json=batch, timeout=5)
+            response.raise_for_status()
+        except (requests.RequestException, AuthError, ValueError, KeyError, TypeError):
+            # Network errors, a rejected or malformed handshake, or a bad reply.
+            # Votes are only valid for VOTE_WINDOW anyway, so a failed batch is dropped
+            self.stats['failures'] += 1
+            return
+        self.stats['batches'] += 1
+        self.stats['summaries'] += len(pending)
+        self.stats['votes'] += sum(len(s['nodes']) for s in pending.values())
+
+    def run(self):
+        """Background thread: flush every interval"""
+        while True:
+            time.sleep(self.interval)
+            self.flush()
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Authenticated Votes
+Detectors prove their identity once per session with a long-term Ed25519 key
+and an ephemeral X25519 exchange. Every vote after that carries an HMAC-SHA256
+of its body under the derived session key, plus a sequence number checked
+against a sliding replay window. Verification costs one HMAC per vote.
+
+Key files live in AUTH_KEYS_DIR: <name>.key (private, hex) and <name>.pub
+(public, hex). The coordinator trusts every <node>.pub in the directory;
+a detector needs its own <node>.key and the public key of the coordinator
+it votes to (COORDINATOR_KEY, default coordinator.pub).
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import secrets
+import argparse
+import threading
+from pathlib import Path
+from hashlib import sha256
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey, X25519PublicKey
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat, PrivateFormat, NoEncryption
+
+VOTE_AUTH = os.environ.get("VOTE_AUTH", "off")            # "required" rejects unauthenticated votes
+AUTH_KEYS_DIR = os.environ.get("AUTH_KEYS_DIR", "keys")
+COORDINATOR_KEY = os.environ.get("COORDINATOR_KEY", "coordinator")  # Key name of the coordinator voted to
+SESSION_SECONDS = int(os.environ.get("SESSION_SECONDS", 3600))
+HANDSHAKE_SKEW = 300    # Seconds a handshake timestamp may be off
+REPLAY_WINDOW = 1024    # Out-of-order sequence numbers accepted behind the newest
+SESSION_HEADER = "X-Vote-Session"
+MAC_HEADER = "X-Vote-MAC"
+
+
+class AuthError(ValueError):
+    """A handshake or vote failed authentication"""
+
+
+def generate_keys(directory, names):
+    """Write <name>.key / <name>.pub pairs (existing keys are left alone)"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        private_path = directory / f"{name}.key"
+        if private_path.exists():
+            continue
+        key = Ed25519PrivateKey.generate()
+        private_path.write_text(key.private_bytes(Encoding.Raw, PrivateFormat.Raw, NoEncryption()).hex() + "\n")
+        private_path.chmod(0o600)
+        (directory / f"{name}.pub").write_text(raw_public(key.public_key()).hex() + "\n")
+
+
+def load_private(directory, name):
+    return Ed25519PrivateKey.from_private_bytes(bytes.fromhex((Path(directory) / f"{name}.key").read_text().strip()))
+
+
+def load_public(path):
+    return Ed25519PublicKey.from_public_bytes(bytes.fromhex(Path(path).read_text().strip()))
+
+
+def raw_public(key):
+    return key.public_bytes(Encoding.Raw, PublicFormat.Raw)
+
+
+def handshake_transcript(node, detector_eph, ts, session=b"", coordinator_eph=b""):
+    """Bytes signed by each side; binds the node name and both ephemeral keys"""
+    return b"|".join([b"bft-ids-session-v1", node.encode(), detector_eph,
+                      str(int(ts)).encode(), session, coordinator_eph])
+
+
+def session_key(shared, session, transcript):
+    """32-byte HMAC key for one session"""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=session, info=transcript).derive(shared)
+
+
+def vote_mac(key, body):
+    return hmac.digest(key, body, sha256)
+
+
+class Session:
+    """Per-session key and replay window (highest seq seen + bitmap behind it)"""
+
+    __slots__ = ('node', 'key', 'expires', 'highest', 'window')
+
+    def __init__(self, node, key, expires):
+        self.node = node
+        self.key = key
+        self.expires = expires
+        self.highest = 0
+        self.window = 0  # Bit i set: seq (highest - i) already accepted
+
+    def accept(self, seq):
+        """Record seq; False if it was seen before or is too old"""
+        if seq > self.highest:
+            shift = seq - self.highest
+            self.window = ((self.window << shift) | 1) & ((1 << REPLAY_WINDOW) - 1) if shift < REPLAY_WINDOW else 1
+            self.highest = seq
+            return True
+        offset = self.highest - seq
+        if offset >= REPLAY_WINDOW or self.window >> offset & 1:
+            return False
+        self.window |= 1 << offset
+        return True
+
+
+class VoteVerifier:
+    """Coordinator side: answers handshakes and verifies vote MACs"""
+
+    def __init__(self, directory=AUTH_KEYS_DIR, session_seconds=SESSION_SECONDS, name=COORDINATOR_KEY):
+        directory = Path(directory)
+        self.key = load_private(directory, name)
+        self.trusted = {path.stem: load_public(path) for path in sorted(directory.glob("*.pub"))
+                        if path.stem != name}
+        self.session_seconds = session_seconds
+        self.sessions = {}      # session id (bytes) -> Session
+        self.handshakes = {}    # detector ephemeral key -> time, to refuse replayed handshakes
+        self.lock = threading.Lock()
+
+    def handshake(self, data):
+        """Verify a detector's signed hello and answer with our signed half"""
+        try:
+            node = str(data['node'])
+            detector_eph = bytes.fromhex(data['eph'])
+            ts = float(data['ts'])
+            signature = bytes.fromhex(data['sig'])
+        except (KeyError, TypeError, ValueError):
+            raise AuthError("malformed handshake")
+        public = self.trusted.get(node)
+        if public is None:
+            raise AuthError(f"unknown node {node}")
+        now = time.time()
+        if abs(now - ts) > HANDSHAKE_SKEW:
+            raise AuthError("handshake timestamp out of range")
+        try:
+            public.verify(signature, handshake_transcript(node, detector_eph, ts))
+            peer = X25519PublicKey.from_public_bytes(detector_eph)
+        except (InvalidSignature, ValueError):
+            raise AuthError("bad handshake signature")
+
+        ephemeral = X25519PrivateKey.generate()
+        coordinator_eph = raw_public(ephemeral.public_key())
+        session = secrets.token_bytes(8)
+        transcript = handshake_transcript(node, detector_eph, ts, session, coordinator_eph)
+        key = session_key(ephemeral.exchange(peer), session, transcript)
+        with self.lock:
+            if detector_eph in self.handshakes:
+                raise AuthError("replayed handshake")
+            self.prune(now)
+            self.handshakes[detector_eph] = now
+            self.sessions[session] = Session(node, key, now + self.session_seconds)
+        return {'session': session.hex(), 'eph': coordinator_eph.hex(),
+                'sig': self.key.sign(transcript).hex(), 'expires': now + self.session_seconds}
+
+    def prune(self, now):
+        """Forget expired sessions and handshakes too old to be accepted again (lock held)"""
+        for sid in [sid for sid, s in self.sessions.items() if s.expires <= now]:
+            del self.sessions[sid]
+        for eph in [eph for eph, ts in self.handshakes.items() if now - ts > 2 * HANDSHAKE_SKEW]:
+            del self.handshakes[eph]
+
+    def verify(self, session_hex, mac_hex, body, node, seq):
+        """Check one vote: live session owned by `node`, valid MAC, fresh seq"""
+        try:
+            session = self.sessions.get(bytes.fromhex(session_hex))
+            mac = bytes.fromhex(mac_hex)
+        except (TypeError, ValueError):
+            raise AuthError("missing session or MAC")
+        if session is None or session.expires <= time.time():
+            raise AuthError("unknown session")
+        if session.node != node:
+            raise AuthError("session belongs to another node")
+        if not hmac.compare_digest(vote_mac(session.key, body), mac):
+            raise AuthError("bad MAC")
+        if not isinstance(seq, int) or seq <= 0:
+            raise AuthError("missing sequence number")
+        with self.lock:
+            if not session.accept(seq):
+                raise AuthError("replayed vote")
+
+
+class VoteSigner:
+    """Detector side: one session at a time, renewed before expiry or on rejection"""
+
+    def __init__(self, node, coord_url, directory=AUTH_KEYS_DIR, coordinator=COORDINATOR_KEY):
+        directory = Path(directory)
+        self.node = node
+        self.session_url = coord_url.rsplit("/", 1)[0] + "/session"
+        self.key = load_private(directory, node)
+        self.coordinator = load_public(directory / f"{coordinator}.pub")
+        self.session = None   # (session id hex, key, expires)
+        self.seq = 0
+        self.lock = threading.Lock()
+
+    def handshake(self, http):
+        """Authenticate to the coordinator and derive a fresh session key"""
+        ephemeral = X25519PrivateKey.generate()
+        detector_eph = raw_public(ephemeral.public_key())
+        ts = int(time.time())
+        hello = {'node': self.node, 'eph': detector_eph.hex(), 'ts': ts,
+                 'sig': self.key.sign(handshake_transcript(self.node, detector_eph, ts)).hex()}
+        response = http.post(self.session_url, json=hello, timeout=5)
+        if response.status_code != 200:
+            raise AuthError(f"handshake rejected: {response.text.strip()}")
+        reply = response.json()
+        session = bytes.fromhex(reply['session'])
+        coordinator_eph = bytes.fromhex(reply['eph'])
+        transcript = handshake_transcript(self.node, detector_eph, ts, session, coordinator_eph)
+        try:
+            self.coordinator.verify(bytes.fromhex(reply['sig']), transcript)
+        except InvalidSignature:
+            raise AuthError("coordinator signature invalid")
+        key = session_key(ephemeral.exchange(X25519PublicKey.from_public_bytes(coordinator_eph)),
+                          session, transcript)
+        # Renew a minute early so in-flight votes never hit an expired session
+        return reply['session'], key, reply['expires'] - 60
+
+    def sign(self, http, vote):
+        """Body bytes and headers for an authenticated vote"""
+        with self.lock:
+            if self.session is None or self.session[2] <= time.time():
+                self.session = self.handshake(http)
+                self.seq = 0
+            session, key, _ = self.session
+            self.seq += 1
+            body = json.dumps(dict(vote, seq=self.seq)).encode()
+        return body, {'Content-Type': 'application/json', SESSION_HEADER: session,
+                      MAC_HEADER: vote_mac(key, body).hex()}
+
+    def post(self, http, url, vote, timeout=2):
+        """POST a signed vote; one retry with a new session if the coordinator forgot ours"""
+        body, headers = self.sign(http, vote)
+        response = http.post(url, data=body, headers=headers, timeout=timeout)
+        if response.status_code == 401:
+            with self.lock:
+                # Another sender thread may already have renewed it
+                if self.session and self.session[0] == headers[SESSION_HEADER]:
+                    self.session = None
+            body, headers = self.sign(http, vote)
+            response = http.post(url, data=body, headers=headers, timeout=timeout)
+        return response
+
+
+def vote_targets(node, coordinator_url, authenticate=False, keys=COORDINATOR_KEY):
+    """
+    (alert URL, signer or None) for each coordinator. A comma-separated
+    COORDINATOR_URL lists the replicas of a replicated coordinator; their
+    key names are then listed in the same order in COORDINATOR_KEY.
+    """
+    urls = [url.strip().rstrip("/") + "/alert" for url in coordinator_url.split(",") if url.strip()]
+    if not authenticate:
+        return [(url, None) for url in urls]
+    names = [name.strip() for name in keys.split(",")]
+    if len(names) != len(urls):
+        raise AuthError(f"{len(urls)} coordinator URLs but {len(names)} coordinator key names")
+    return [(url, VoteSigner(node, url, coordinator=name)) for url, name in zip(urls, names)]
+
+
+def main():
+    """Generate key pairs for the coordinator and detector nodes"""
+    parser = argparse.ArgumentParser(description="Vote authentication key management")
+    parser.add_argument("names", nargs="+", help=f"Key names (node IDs, plus '{COORDINATOR_KEY}')")
+    parser.add_argument("--dir", default=AUTH_KEYS_DIR, help=f"Key directory (default: {AUTH_KEYS_DIR})")
+    args = parser.parse_args()
+    generate_keys(args.dir, args.names)
+    for name in args.names:
+        print(f"{args.dir}/{name}.key  {args.dir}/{name}.pub")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
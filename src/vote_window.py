@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Adaptive Vote Window
+Learns how long after an alert's first vote each node's vote arrives (a
+streaming P² quantile per node, fed from alerts that reached consensus) and
+sizes each alert's window to the lag by which enough of the nodes still
+missing will have voted, plus a margin. Alerts that cannot reach quorum are
+dropped as soon as that window has passed instead of after a fixed
+VOTE_WINDOW, and slow nodes get a longer window than VOTE_WINDOW allows.
+"""
+
+import os
+
+VOTE_WINDOW_MODE = os.environ.get("VOTE_WINDOW_MODE", "fixed")   # "adaptive" sizes windows per alert
+WINDOW_QUANTILE = float(os.environ.get("WINDOW_QUANTILE", 0.99))  # Per-node lag quantile tracked
+WINDOW_MARGIN = float(os.environ.get("WINDOW_MARGIN", 0.5))       # Seconds added to the quorum lag
+WINDOW_MIN = float(os.environ.get("WINDOW_MIN", 1.0))             # Seconds
+WINDOW_MAX = float(os.environ.get("WINDOW_MAX", 120.0))           # Seconds
+MIN_SAMPLES = 20  # Lags a node needs before its quantile is trusted
+
+
+class P2Quantile:
+    """Streaming quantile estimate in constant memory (Jain & Chlamtac's P² algorithm)"""
+
+    __slots__ = ('p', 'count', 'heights', 'positions', 'desired', 'increments')
+
+    def __init__(self, p):
+        self.p = p
+        self.count = 0
+        self.heights = []   # Marker heights; the first five observations until initialised
+        self.positions = [0, 1, 2, 3, 4]
+        self.desired = [0, 2 * p, 4 * p, 2 + 2 * p, 4]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def add(self, x):
+        self.count += 1
+        q = self.heights
+        if self.count <= 5:
+            q.append(x)
+            q.sort()
+            return
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+        n = self.positions
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Piecewise-parabolic prediction, linear if it would leave the neighbours' range
+                h = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if not q[i - 1] < h < q[i + 1]:
+                    h = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = h
+                n[i] += d
+
+    def value(self):
+        if self.count > 5:
+            return self.heights[2]
+        if not self.heights:
+            return None
+        return self.heights[min(len(self.heights) - 1, int(self.p * len(self.heights)))]
+
+
+class AdaptiveWindow:
+    """Per-node vote lag quantiles and the per-alert windows derived from them"""
+
+    def __init__(self, threshold, quantile=WINDOW_QUANTILE, margin=WINDOW_MARGIN,
+                 minimum=WINDOW_MIN, maximum=WINDOW_MAX):
+        self.threshold = threshold
+        self.quantile = quantile
+        self.margin = margin
+        self.minimum = minimum
+        self.maximum = maximum
+        self.lags = {}                # node -> P2Quantile of seconds after the first vote
+        self.ranked = None            # Cached [(lag quantile, node)], ascending
+
+    def observe(self, node, lag):
+        """A vote from `node` arrived `lag` seconds after its alert's first vote"""
+        estimate = self.lags.get(node)
+        if estimate is None:
+            estimate = self.lags[node] = P2Quantile(self.quantile)
+        estimate.add(max(0.0, lag))
+        if estimate.count >= MIN_SAMPLES:
+            self.ranked = None
+
+    def ranking(self):
+        if self.ranked is None:
+            self.ranked = sorted((e.value(), node) for node, e in self.lags.items() if e.count >= MIN_SAMPLES)
+        return self.ranked
+
+    def window(self, voters=()):
+        """Seconds after the first vote that an alert with these voters should be kept"""
+        needed = self.threshold - len(voters)
+        if needed <= 0:
+            return self.minimum
+        waiting = [lag for lag, node in self.ranking() if node not in voters]
+        if len(waiting) < needed:
+            return self.maximum  # Not enough lag estimates yet: keep it as long as allowed
+        return min(self.maximum, max(self.minimum, waiting[needed - 1] + self.margin))
+
+    def status(self):
+        return {
+            'mode': "adaptive",
+            'quantile': self.quantile,
+            'quorum_window': round(self.window(), 3),
+            'node_lag_ms': {node: round(e.value() * 1000, 1) for node, e in sorted(self.lags.items())
+                            if e.count >= MIN_SAMPLES},
+        }
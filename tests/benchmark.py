@@ -0,0 +1,949 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Performance Benchmarks
+Microbenchmarks for the parser, detector pipeline, dashboard and coordinator
+hot paths, run on fixed (seeded) corpora with regression thresholds
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+from datetime import datetime
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT / "src"))
+
+BASELINE_FILE = Path(__file__).resolve().parent / "benchmark_baseline.json"
+DEFAULT_TOLERANCE = 0.30  # Fail when throughput drops more than 30% below baseline
+
+BENCHMARKS = {}
+
+
+def benchmark(name, size):
+    """
+    Register a benchmark case. The function returns (operations, seconds) or
+    (operations, seconds, extra) where extra is a dict of additional metrics.
+    """
+    def register(func):
+        BENCHMARKS[name] = (func, size)
+        return func
+    return register
+
+
+# ---------------------------------------------------------------------------
+# Fixed corpora
+# ---------------------------------------------------------------------------
+
+SIGNATURES = [
+    ("ET SCAN Nmap Scripting Engine User-Agent Detected", "Web Application Attack", 1),
+    ("ET SCAN Possible Nmap User-Agent Observed", "Attempted Information Leak", 2),
+    ("CUSTOM ATTACK: Port Scan Detected", "Attempted Information Leak", 2),
+    ("CUSTOM ATTACK: Possible SYN Flood", "Attempted Denial of Service", 2),
+    ("ET EXPLOIT Possible Buffer Overflow Attempt", "Attempted Administrator Privilege Gain", 1),
+    ("ET MALWARE Win32/Trojan Backdoor Checkin", "A Network Trojan was detected", 1),
+    ("ET WEB_SERVER Possible SQL Injection Attempt", "Web Application Attack", 1),
+    ("ET POLICY Suspicious inbound to mySQL port 3306", "Potentially Bad Traffic", 2),
+    ("GPL ICMP_INFO PING *NIX", "Misc activity", 3),
+    ("SURICATA STREAM ESTABLISHED packet out of window", "Generic Protocol Command Decode", 3),
+]
+PROTOCOLS = ["TCP", "UDP", "ICMP"]
+
+
+def corpus_alerts(n, seed=42, distinct_sources=200):
+    """Deterministic list of alert field tuples shared by every corpus"""
+    rng = random.Random(seed)
+    alerts = []
+    for i in range(n):
+        sig_index = rng.randrange(len(SIGNATURES))
+        signature, classification, priority = SIGNATURES[sig_index]
+        alerts.append({
+            'timestamp': f"10/19/2026-12:{(i // 60) % 60:02d}:{i % 60:02d}.{i % 1000000:06d}",
+            'sid': 2000000 + sig_index,
+            'signature': signature,
+            'classification': classification,
+            'priority': priority,
+            'protocol': PROTOCOLS[rng.randrange(3)],
+            'src_ip': f"10.0.{rng.randrange(distinct_sources) // 250}.{rng.randrange(250)}",
+            'src_port': rng.randrange(1024, 65535),
+            'dst_ip': f"192.168.1.{rng.randrange(2, 20)}",
+            'dst_port': rng.choice([22, 80, 443, 3306, 8080]),
+        })
+    return alerts
+
+
+def corpus_fast_log(n):
+    """fast.log lines in Suricata's format"""
+    return [
+        f"{a['timestamp']}  [**] [1:{a['sid']}:1] {a['signature']} [**] "
+        f"[Classification: {a['classification']}] [Priority: {a['priority']}] "
+        f"{{{a['protocol']}}} {a['src_ip']}:{a['src_port']} -> {a['dst_ip']}:{a['dst_port']}"
+        for a in corpus_alerts(n)
+    ]
+
+
+def corpus_eve_json(n, alert_ratio=0.5):
+    """eve.json lines; roughly alert_ratio of them are alert events"""
+    rng = random.Random(7)
+    lines = []
+    for i, a in enumerate(corpus_alerts(n)):
+        record = {
+            "timestamp": f"2026-10-19T12:{(i // 60) % 60:02d}:{i % 60:02d}.000000+0000",
+            "flow_id": 1000000 + i,
+            "src_ip": a['src_ip'], "src_port": a['src_port'],
+            "dest_ip": a['dst_ip'], "dest_port": a['dst_port'],
+            "proto": a['protocol'],
+        }
+        if rng.random() < alert_ratio:
+            record["event_type"] = "alert"
+            record["alert"] = {"action": "allowed", "gid": 1, "signature_id": a['sid'], "rev": 1,
+                               "signature": a['signature'], "category": a['classification'],
+                               "severity": a['priority']}
+        else:
+            record["event_type"] = "flow"
+            record["flow"] = {"pkts_toserver": 3, "pkts_toclient": 2, "bytes_toserver": 180,
+                              "bytes_toclient": 120, "state": "closed"}
+        lines.append(json.dumps(record))
+    return lines
+
+
+def parsed_alerts(n, duplicate_ratio=0.0):
+    """Alerts as produced by SuricataAlertParser, optionally with repeats"""
+    from suricata_detector import SuricataAlertParser
+    alerts = [SuricataAlertParser.parse_fast_log(line) for line in corpus_fast_log(n)]
+    if duplicate_ratio:
+        rng = random.Random(3)
+        for i in range(int(n * duplicate_ratio)):
+            alerts[rng.randrange(n)] = dict(alerts[rng.randrange(n)])
+    return alerts
+
+
+def quiet_coordinator():
+    """Import the coordinator with console output suppressed and state reset"""
+    os.environ.setdefault("ALERT_STORE_DIR", "")  # Don't persist benchmark decisions
+    import coordinator
+    coordinator.console.quiet = True
+    coordinator.votes.clear()
+    coordinator.processed_alerts.clear()
+    coordinator.flow_keys.clear()
+    return coordinator
+
+
+def flood_sources(start, count, heavy_share=0.05):
+    """Spoofed-source flood: mostly distinct IPs plus five real attackers"""
+    rng = random.Random(start)
+    heavy = [f"203.0.113.{i}" for i in range(1, 6)]
+    return [
+        heavy[rng.randrange(5)] if rng.random() < heavy_share
+        else f"{10 + (i >> 24)}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+        for i in range(start, start + count)
+    ]
+
+
+def structure_bytes(counter):
+    """Approximate memory held by a top-N counter (containers plus keys)"""
+    keys = counter.counts if hasattr(counter, 'counts') else counter
+    size = sys.getsizeof(counter) + sum(sys.getsizeof(k) for k in keys)
+    if hasattr(counter, 'heap'):
+        size += sys.getsizeof(counter.counts) + sys.getsizeof(counter.errors) + sys.getsizeof(counter.heap)
+        size += len(counter.heap) * sys.getsizeof((0, ""))
+    return size
+
+
+def timed(func, items):
+    """Run func over items and return (operations, seconds)"""
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return len(items), time.perf_counter() - start
+
+
+# ---------------------------------------------------------------------------
+# Benchmark cases
+# ---------------------------------------------------------------------------
+
+@benchmark("parse_fast_log", size=50000)
+def bench_parse_fast_log(n):
+    from suricata_detector import SuricataAlertParser
+    return timed(SuricataAlertParser.parse_fast_log, corpus_fast_log(n))
+
+
+@benchmark("parse_eve_json", size=50000)
+def bench_parse_eve_json(n):
+    from suricata_detector import SuricataAlertParser
+    return timed(SuricataAlertParser.parse_eve_json, corpus_eve_json(n))
+
+
+@benchmark("categorize_attack", size=200000)
+def bench_categorize_attack(n):
+    from suricata_detector import SuricataAlertParser
+    pairs = [(a['signature'], a['classification']) for a in corpus_alerts(n)]
+    categorize = SuricataAlertParser.categorize_attack
+    start = time.perf_counter()
+    for signature, classification in pairs:
+        categorize(signature, classification)
+    return n, time.perf_counter() - start
+
+
+@benchmark("process_alert_dedup", size=50000)
+def bench_process_alert_dedup(n):
+    from suricata_detector import SuricataMonitor
+
+    class QuietMonitor(SuricataMonitor):
+        """Pipeline without terminal output"""
+        def display_alert(self, alert):
+            pass
+
+    monitor = QuietMonitor("bench")
+    monitor.dry_run = True  # No send queue or network sends
+    return timed(monitor.process_alert, parsed_alerts(n, duplicate_ratio=0.5))
+
+
+@benchmark("process_alert_stage_stats", size=50000)
+def bench_process_alert_stage_stats(n):
+    """process_alert_dedup with PIPELINE_STATS timing every stage"""
+    from suricata_detector import SuricataMonitor, StageStats
+    monitor = SuricataMonitor("bench")
+    monitor.display = False
+    monitor.dry_run = True
+    monitor.stage_stats = StageStats()
+    return timed(monitor.process_alert, parsed_alerts(n, duplicate_ratio=0.5))
+
+
+def irrelevant_sid_log(n, every=20):
+    """corpus_fast_log with one line in `every` moved to a config/custom.rules SID"""
+    lines = corpus_fast_log(n)
+    for i in range(0, n, every):
+        start = lines[i].index("[**] [") + 6
+        lines[i] = lines[i][:start] + "1:9000001:1" + lines[i][lines[i].index("]", start):]
+    return lines
+
+
+@benchmark("sid_prefilter", size=200000)
+def bench_sid_prefilter(n):
+    """SID lookup then parse only covered lines, on a log where 19 in 20 SIDs are not ours"""
+    from rules import RuleTable
+    from suricata_detector import SuricataAlertParser
+    rules = RuleTable()
+    parse = SuricataAlertParser.parse_fast_log
+    lines = irrelevant_sid_log(n)
+    _, parse_all = timed(parse, lines)  # SuricataMonitor without a rule table
+    start = time.perf_counter()
+    for line in lines:
+        if rules.match(line):
+            parse(line)
+    seconds = time.perf_counter() - start
+    return n, seconds, {'speedup_vs_parse_all': round(parse_all / seconds, 1)}
+
+
+@benchmark("rule_metadata", size=50000)
+def bench_rule_metadata(n):
+    """Vote metadata of relevant lines from the rule table vs. a full parse (detector_bft)"""
+    from rules import RuleTable
+    from detector_bft import alert_metadata
+    rules = RuleTable()
+    lines = irrelevant_sid_log(n, every=1)
+    _, full = timed(alert_metadata, lines)
+    start = time.perf_counter()
+    for line in lines:
+        rules.metadata(line, rules.match(line))
+    seconds = time.perf_counter() - start
+    return n, seconds, {'speedup_vs_full_parse': round(full / seconds, 1)}
+
+
+def fast_log_file(directory, n):
+    """corpus_fast_log(n) written to directory/fast.log"""
+    path = Path(directory) / "fast.log"
+    path.write_text("".join(line + "\n" for line in corpus_fast_log(n)))
+    return path
+
+
+@benchmark("parse_fast_log_bytes", size=50000)
+def bench_parse_fast_log_bytes(n):
+    """parse_fast_log on lines read as bytes vs. decoded str lines"""
+    from suricata_detector import SuricataAlertParser
+    lines = corpus_fast_log(n)
+    _, text = timed(SuricataAlertParser.parse_fast_log, lines)
+    ops, seconds = timed(SuricataAlertParser.parse_fast_log, [line.encode() for line in lines])
+    return ops, seconds, {'speedup_vs_str': round(text / seconds, 2)}
+
+
+@benchmark("tail_read_lines", size=500000)
+def bench_tail_read_lines(n):
+    """
+    Lines read by ByteTailer (64 KB chunks split into bytes) vs. readline()
+    and strip() as the tailers did, plus the line objects each allocates:
+    two str per line vs. one bytes slice per line and a chunk and list per read.
+    """
+    import tempfile
+    from tail import ByteTailer
+    with tempfile.TemporaryDirectory() as tmp:
+        path = fast_log_file(tmp, n)
+        start = time.perf_counter()
+        with open(path) as f:
+            for line in iter(f.readline, ''):
+                line.strip()
+        text = time.perf_counter() - start
+
+        start = time.perf_counter()
+        tailer = ByteTailer(path, from_end=False)
+        lines = tailer.lines()
+        while lines:
+            for line in lines:
+                pass
+            lines = tailer.lines()
+        seconds = time.perf_counter() - start
+        tailer.close()
+
+        text_objects = text_bytes = 0
+        with open(path) as f:
+            for raw in iter(f.readline, ''):
+                line = raw.strip()
+                text_objects += 2
+                text_bytes += sys.getsizeof(raw) + sys.getsizeof(line)
+        byte_objects = byte_bytes = 0
+        tailer = ByteTailer(path, from_end=False)
+        chunk = tailer.chunk()
+        while chunk:
+            lines = chunk.split(b'\n')
+            lines.pop()
+            byte_objects += len(lines) + 2
+            byte_bytes += sys.getsizeof(chunk) + sys.getsizeof(lines) + sum(sys.getsizeof(line) for line in lines)
+            chunk = tailer.chunk()
+        tailer.close()
+    return n, seconds, {'speedup_vs_readline': round(text / seconds, 2),
+                        'objects_per_line_readline': round(text_objects / n, 3),
+                        'objects_per_line_bytes': round(byte_objects / n, 3),
+                        'bytes_per_line_readline': round(text_bytes / n, 1),
+                        'bytes_per_line_bytes': round(byte_bytes / n, 1)}
+
+
+@benchmark("forward_lines", size=200000)
+def bench_forward_lines(n):
+    """log_forwarder: raw chunk slices, several lines per datagram, vs. readline() + encode() per line"""
+    import socket
+    import tempfile
+    from tail import ByteTailer, datagrams
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(("127.0.0.1", 0))  # Never read; the kernel drops what overflows its buffer
+    target = receiver.getsockname()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = fast_log_file(tmp, n)
+        start = time.perf_counter()
+        with open(path) as f:
+            for line in iter(f.readline, ''):
+                sock.sendto(line.encode('utf-8'), target)
+        text = time.perf_counter() - start
+
+        sent = 0
+        start = time.perf_counter()
+        tailer = ByteTailer(path, from_end=False)
+        chunk = tailer.chunk()
+        while chunk:
+            for datagram in datagrams(chunk):
+                sock.sendto(datagram, target)
+                sent += 1
+            chunk = tailer.chunk()
+        seconds = time.perf_counter() - start
+        tailer.close()
+    sock.close()
+    receiver.close()
+    return n, seconds, {'speedup_vs_readline': round(text / seconds, 2), 'datagrams_per_line': round(sent / n, 3)}
+
+
+@benchmark("dashboard_update_stats", size=100000)
+def bench_dashboard_update_stats(n):
+    from alert_dashboard import AlertDashboard
+    from suricata_detector import SuricataAlertParser
+    alerts = parsed_alerts(n)
+    for alert in alerts:
+        alert['category'] = SuricataAlertParser.categorize_attack(alert['signature'], alert['classification'])
+    return timed(AlertDashboard().update_stats, alerts)
+
+
+@benchmark("coordinator_check_consensus", size=200000)
+def bench_check_consensus(n):
+    coordinator = quiet_coordinator()
+    now = time.time()
+    keys = [f"CUSTOM ATTACK: Event {i}" for i in range(1000)]
+    for i, key in enumerate(keys):
+        for node in ("rp6", "rp8", "rp8-virtual")[:1 + i % 3]:
+            coordinator.votes[key][node] = now
+    ops, seconds = timed(coordinator.check_consensus, [keys[i % 1000] for i in range(n)])
+    coordinator.votes.clear()
+    return ops, seconds
+
+
+def bench_vote_path(coordinator, keys, key_of):
+    """Key lookup, vote insert and consensus check for freshly decoded vote keys"""
+    nodes = ("rp6", "rp8", "rp8-virtual")
+    now = time.time()
+    started = time.perf_counter()
+    for i, raw in enumerate(keys):
+        key = key_of(raw)
+        coordinator.votes[key][nodes[i % 3]] = now
+        coordinator.check_consensus(key)
+    seconds = time.perf_counter() - started
+    coordinator.votes.clear()
+    coordinator.flow_keys.clear()
+    return len(keys), seconds
+
+
+@benchmark("coordinator_vote_message", size=200000)
+def bench_vote_message(n):
+    """Votes keyed by message text (JSON decoding yields a new, unhashed str per vote)"""
+    coordinator = quiet_coordinator()
+    messages = [f"CUSTOM ATTACK: Possible SYN Flood {{TCP}} 10.0.{i // 256 % 256}.{i % 256}:4444 "
+                f"-> 192.168.1.237:22 [Classification: Attempted Denial of Service]" for i in range((n + 2) // 3)]
+    keys = json.loads(json.dumps([messages[i // 3] for i in range(n)]))
+    return bench_vote_path(coordinator, keys, lambda key: key)
+
+
+@benchmark("coordinator_vote_fingerprint", size=200000)
+def bench_vote_fingerprint(n):
+    """Votes keyed by 64-bit fingerprints, including the adjacent-bucket lookup"""
+    from fingerprint import fingerprint
+    coordinator = quiet_coordinator()
+    base = time.time()
+    fps = [fingerprint(9000004, "TCP", f"10.0.{i // 256 % 256}.{i % 256}", 4444,
+                       "192.168.1.237", 22, base + i * 0.01) for i in range((n + 2) // 3)]
+    keys = json.loads(json.dumps([fps[i // 3] for i in range(n)]))
+    return bench_vote_path(coordinator, keys, coordinator.vote_key)
+
+
+@benchmark("adaptive_window", size=200000)
+def bench_adaptive_window(n):
+    """Per-vote lag quantile update plus the per-alert window lookup"""
+    from vote_window import AdaptiveWindow
+    window = AdaptiveWindow(threshold=3)
+    rng = random.Random(7)
+    nodes = [f"rp{i}" for i in range(5)]
+    samples = [(nodes[i % 5], rng.expovariate(20 - 3 * (i % 5)), set(nodes[:i % 3])) for i in range(n)]
+    started = time.perf_counter()
+    for node, lag, voters in samples:
+        window.observe(node, lag)
+        window.window(voters)
+    return n, time.perf_counter() - started, {'quorum_window': round(window.window(), 3)}
+
+
+@benchmark("vote_auth_verify", size=200000)
+def bench_vote_auth_verify(n):
+    """Coordinator-side JSON decode + session MAC and replay check per signed vote"""
+    import tempfile
+    from vote_auth import generate_keys, VoteVerifier, VoteSigner, SESSION_HEADER, MAC_HEADER
+
+    class Loopback:
+        """Hands the signer's handshake straight to the verifier"""
+        def __init__(self, verifier):
+            self.verifier = verifier
+
+        def post(self, url, json=None, timeout=None):
+            reply = self.verifier.handshake(json)
+            return type("Response", (), {'status_code': 200, 'json': lambda self: reply})()
+
+    with tempfile.TemporaryDirectory() as keys:
+        generate_keys(keys, ["coordinator", "rp6"])
+        verifier = VoteVerifier(keys)
+        signer = VoteSigner("rp6", "http://127.0.0.1:5000/alert", keys)
+        http = Loopback(verifier)
+        started = time.perf_counter()
+        for _ in range(20):
+            signer.session = None
+            signer.sign(http, {})
+        handshake_ms = (time.perf_counter() - started) / 20 * 1000
+        votes = [signer.sign(http, {"node": "rp6", "message": f"CUSTOM ATTACK: Port Scan Detected #{i}",
+                                    "fingerprint": 0x1234567890abcdef + i}) for i in range(n)]
+
+    started = time.perf_counter()
+    for body, headers in votes:
+        vote = json.loads(body)
+        verifier.verify(headers[SESSION_HEADER], headers[MAC_HEADER], body, vote['node'], vote['seq'])
+    return n, time.perf_counter() - started, {'handshake_ms': round(handshake_ms, 2)}
+
+
+@benchmark("pbft_ordering", size=20000)
+def bench_pbft_ordering(n, replicas=4, batch=200):
+    """Votes ordered per second by 3f+1 in-process replicas (signatures included, no HTTP)"""
+    import tempfile
+    from collections import deque
+    from vote_auth import generate_keys
+    from replication import Replica
+
+    class Network:
+        """In-memory transport: messages wait in one queue until delivered"""
+        def __init__(self):
+            self.queue = deque()
+
+        def send(self, peer, msg):
+            self.queue.append((peer, msg))
+
+    network = Network()
+    executed = [0] * replicas
+
+    def executor(i):
+        def execute(b):
+            executed[i] += len(b['votes'])
+        return execute
+
+    with tempfile.TemporaryDirectory() as keys:
+        generate_keys(keys, [f"replica-{i}" for i in range(replicas)])
+        group = [Replica(i, replicas, executor(i), network, keys, batch_size=batch) for i in range(replicas)]
+    votes = [{"node": f"honest-{i % 3 + 1}", "message": f"CUSTOM ATTACK: Port Scan Detected #{i}",
+              "fingerprint": 0x1234567890abcdef + i} for i in range(n)]
+
+    messages = 0
+    started = time.perf_counter()
+    for vote in votes:
+        for replica in group:
+            replica.submit(vote)
+    while min(executed) < n:
+        group[0].propose()
+        while network.queue:
+            peer, msg = network.queue.popleft()
+            group[peer].receive([msg])
+            messages += 1
+    elapsed = time.perf_counter() - started
+    batches = group[0].stats['batches']
+    return n, elapsed, {'replicas': replicas, 'batches': batches, 'messages_per_batch': round(messages / batches, 1)}
+
+
+@benchmark("coordinator_receive_alert", size=5000)
+def bench_receive_alert(n):
+    coordinator = quiet_coordinator()
+    coordinator.admission = None  # Handle votes inline: there is no admission worker here
+    client = coordinator.app.test_client()
+    nodes = ("rp6", "rp8", "rp8-virtual")
+    payloads = [{"node": nodes[i % 3], "message": f"CUSTOM ATTACK: Event {i // 3}"} for i in range(n)]
+    ops, seconds = timed(lambda p: client.post('/alert', json=p), payloads)
+    coordinator.votes.clear()
+    coordinator.processed_alerts.clear()
+    return ops, seconds
+
+
+@benchmark("admission_schedule", size=200000)
+def bench_admission_schedule(n):
+    """Admit a mixed-severity vote stream and drain it in weighted order"""
+    from admission import AdmissionQueue
+    queue = AdmissionQueue(handler=None, capacity=n, overload=n, node_rate=0)
+    rng = random.Random(11)
+    # Flood mix: mostly INFO/LOW scan votes, a few CRITICAL
+    mix = ["INFO"] * 60 + ["LOW"] * 20 + ["MEDIUM"] * 10 + ["HIGH"] * 7 + ["CRITICAL"] * 3
+    votes = [({"node": f"rp{i % 3}"}, f"rp{i % 3}", rng.choice(mix)) for i in range(n)]
+    started = time.perf_counter()
+    for vote, node, severity in votes:
+        queue.offer(vote, node, severity)
+    order = [queue.take()[0] for _ in range(n)]
+    seconds = time.perf_counter() - started
+    # CRITICAL is 3% of the stream but gets 16/31 of the service while it has votes queued
+    head = order[:1000]
+    return n, seconds, {'critical_share_first_1000': round(head.count("CRITICAL") / len(head), 3)}
+
+
+@benchmark("send_queue_storm", size=200000)
+def bench_send_queue_storm(n):
+    """Detector send queue in a scan storm: alerts arrive twice as fast as they are sent, 1 in 1000 CRITICAL"""
+    from send_queue import PrioritySendQueue
+    waits = {}
+    for mode in ("fifo", "priority"):
+        outbox = PrioritySendQueue(mode=mode, capacity=n)
+        queued_at, sent, critical_waits = {}, 0, []
+        started = time.perf_counter()
+        for i in range(n):
+            critical = i % 1000 == 999
+            if critical:
+                queued_at[i] = sent
+            outbox.put(i, "CRITICAL" if critical else "INFO")
+            if i % 2:
+                [(severity, item)] = outbox.get(limit=1)
+                sent += 1
+                if severity == "CRITICAL":
+                    critical_waits.append(sent - 1 - queued_at[item])
+        seconds = time.perf_counter() - started
+        waits[mode] = round(sum(critical_waits) / len(critical_waits), 1)
+    # Alerts sent ahead of a CRITICAL one after it was queued (0 = it jumped the whole backlog)
+    return n, seconds, {'critical_sent_behind_fifo': waits['fifo'], 'critical_sent_behind_priority': waits['priority']}
+
+
+@benchmark("dashboard_render", size=200)
+def bench_dashboard_render(n):
+    import io
+    from alert_dashboard import AlertDashboard, TerminalRenderer
+    from suricata_detector import SuricataAlertParser
+    os.environ.setdefault("LINES", "200")  # Frame must fit the (virtual) terminal
+    os.environ.setdefault("COLUMNS", "120")
+
+    alerts = parsed_alerts(n * 5 + 500)
+    for alert in alerts:
+        alert['category'] = SuricataAlertParser.categorize_attack(alert['signature'], alert['classification'])
+    dashboard = AlertDashboard()
+    dashboard.renderer = TerminalRenderer(out=io.StringIO())
+    for alert in alerts[:500]:
+        dashboard.update_stats(alert)
+    dashboard.render()  # Initial full paint is not counted
+    painted = dashboard.renderer.bytes_written
+
+    # Five new alerts per refresh, like a steady trickle of traffic
+    full_bytes = 0
+    start = time.perf_counter()
+    for i in range(n):
+        for alert in alerts[500 + i * 5:505 + i * 5]:
+            dashboard.update_stats(alert)
+        dashboard.render()
+        full_bytes += len(('\033[H\033[2J' + '\n'.join(dashboard.renderer.frame)).encode('utf-8'))
+    seconds = time.perf_counter() - start
+    busy = dashboard.renderer.bytes_written
+
+    # Quiet period: no new alerts, only the header clock may change
+    for _ in range(10):
+        dashboard.render()
+    return n, seconds, {
+        'full_redraw_bytes_per_frame': full_bytes // n,
+        'diff_bytes_per_frame': (busy - painted) // n,
+        'idle_diff_bytes_per_frame': (dashboard.renderer.bytes_written - busy) // 10,
+    }
+
+
+@benchmark("live_feed_fanout", size=20000)
+def bench_live_feed_fanout(n, clients=100, batch=10):
+    import live_feed
+    hub = live_feed.FeedHub()
+    fast = [hub.subscribe()[0] for _ in range(clients - 1)]
+    slow, _ = hub.subscribe()  # Never reads until the end
+    now = time.time()
+    decisions = [{'seq': i, 'message': f"CUSTOM ATTACK: Port Scan Detected #{i}",
+                  'nodes': ['rp6', 'rp8'], 'first_vote': now, 'decided_at': now + 0.05}
+                 for i in range(n)]
+
+    payload_bytes = 0
+    start = time.perf_counter()
+    for i in range(0, n, batch):
+        hub.publish(decisions[i:i + batch])
+        for client in fast:
+            payload_bytes += len(client.take(0))
+    seconds = time.perf_counter() - start
+
+    backlog = json.loads(slow.take(0))
+    frames = (n // batch) * len(fast)
+    return n, seconds, {
+        'clients': clients,
+        'usec_per_client_delta': round(seconds / frames * 1e6, 2),
+        'bytes_per_delta': payload_bytes // frames,
+        'slow_client_events_pending': len(backlog['events']),
+        'slow_client_coalesced': backlog['coalesced'],
+    }
+
+
+def bench_top_counter(counter, n):
+    """Feed n flood sources in 1M chunks (constant generator memory)"""
+    seconds = 0.0
+    for start in range(0, n, 1000000):
+        chunk = flood_sources(start, min(1000000, n - start))
+        _, elapsed = timed(counter.add, chunk)
+        seconds += elapsed
+    top = [ip for ip, _ in counter.most_common(5)]
+    return n, seconds, {
+        'tracked_keys': len(counter),
+        'structure_mb': round(structure_bytes(counter) / 1048576, 2),
+        'error_bound': counter.error_bound(),
+        'top5_exact': sorted(top) == [f"203.0.113.{i}" for i in range(1, 6)],
+    }
+
+
+@benchmark("topn_space_saving", size=1000000)
+def bench_topn_space_saving(n):
+    from heavy_hitters import SpaceSaving
+    return bench_top_counter(SpaceSaving(1000), n)
+
+
+@benchmark("topn_exact", size=1000000)
+def bench_topn_exact(n):
+    from heavy_hitters import ExactCounter
+    return bench_top_counter(ExactCounter(), n)
+
+
+@benchmark("rollup_add", size=200000)
+def bench_rollup_add(n):
+    from rollups import RollupStore
+    store = RollupStore()
+    alerts = parsed_alerts(min(n, 20000))
+    base = time.time() - 3600
+    # One alert per 20ms of event time so every resolution rolls over buckets
+    items = [(base + i * 0.02, alerts[i % len(alerts)]) for i in range(n)]
+    started = time.perf_counter()
+    for ts, a in items:
+        store.add(ts, category=a['classification'], severity=a['severity'],
+                  protocol=a['protocol'], node='rp6')
+    return n, time.perf_counter() - started
+
+
+@benchmark("rollup_query", size=2000)
+def bench_rollup_query(n):
+    """Per-minute, by-category range query over a full day of minute buckets"""
+    from rollups import RollupStore
+    store = RollupStore()
+    now = time.time()
+    for i in range(100000):
+        store.add(now - i * 0.864, category=("SCAN", "DOS", "WEB")[i % 3])
+    started = time.perf_counter()
+    for _ in range(n):
+        store.query('minute', now - 86400, now, by='category')
+    seconds = time.perf_counter() - started
+    return n, seconds, {'buckets_per_query': len(store.query('minute', now - 86400, now))}
+
+
+@benchmark("alert_store_scan", size=5000000)
+def bench_alert_store_scan(n, chunk=5000000):
+    """Rows/sec for a day-long SID scan over mmap'd segments (--scale 20 = 100M rows)"""
+    import shutil
+    import tempfile
+    import numpy as np
+    from alert_store import AlertStore, ROW_DTYPE
+
+    root = tempfile.mkdtemp(prefix="bft-store-")
+    try:
+        store = AlertStore(root)
+        for node in ("rp6", "rp7", "rp8"):
+            store.dicts['node'].code(node)  # Bits 0-2 of the nodes bitmap
+        rng = np.random.default_rng(7)
+        day_start = 1705276800.0  # 2024-01-15 00:00 UTC, 24 hourly segments
+        write_seconds = 0.0
+        for start in range(0, n, chunk):
+            rows = np.zeros(min(chunk, n - start), dtype=ROW_DTYPE)
+            rows['ts'] = day_start + (np.arange(start, start + len(rows)) * 86400.0 / n)
+            rows['sid'] = rng.integers(2000000, 2000050, len(rows))
+            rows['src_ip'] = rng.integers(0x0A000000, 0x0A00FFFF, len(rows))
+            rows['dst_port'] = rng.choice([22, 80, 443, 3389], len(rows))
+            rows['severity'] = rng.integers(1, 4, len(rows))
+            rows['nodes'] = rng.integers(1, 8, len(rows))
+            started = time.perf_counter()
+            store.write_rows(rows)
+            write_seconds += time.perf_counter() - started
+            del rows
+
+        started = time.perf_counter()
+        matches = store.count(day_start, day_start + 86400, sid=2000007)
+        seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        hour = store.count(day_start + 3 * 3600 + 1800, day_start + 4 * 3600 + 1800, node='rp6')
+        hour_seconds = time.perf_counter() - started
+        return n, seconds, {
+            'sid_matches': matches,
+            'scan_mb_per_sec': round(n * 4 / seconds / 1048576, 1),  # sid column only: whole segments skip ts
+            'write_rows_per_sec': round(n / write_seconds),
+            'one_hour_node_filter_ms': round(hour_seconds * 1000, 2),
+            'bytes_per_row': ROW_DTYPE.itemsize,
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+@benchmark("recent_alerts_query", size=20000)
+def bench_recent_alerts_query(n, retained=100000, ingest_rate=2000):
+    """Indexed /alerts queries against a full index while a thread keeps ingesting"""
+    import threading
+    from recent_alerts import RecentAlertIndex
+
+    corpus = corpus_alerts(20000)
+    nodes = [["rp6", "rp7"], ["rp6", "rp8"], ["rp7", "rp8"], ["rp6", "rp7", "rp8"]]
+    index = RecentAlertIndex(capacity=retained, max_age=10 ** 9)
+    state = {'seq': 0, 'ingested': 0}
+
+    def decision():
+        state['seq'] += 1
+        a = corpus[state['seq'] % len(corpus)]
+        return {'seq': state['seq'], 'decided_at': time.time(), 'message': a['signature'],
+                'nodes': nodes[state['seq'] % 4], 'category': a['classification'],
+                'sid': a['sid'], 'src_ip': a['src_ip'], 'dst_ip': a['dst_ip']}
+
+    for _ in range(retained):
+        index.add(decision())
+
+    stop = threading.Event()
+
+    def ingest():
+        # Paced in 10ms slices; evicts one old alert per insert once full
+        while not stop.is_set():
+            for _ in range(ingest_rate // 100):
+                index.add(decision())
+                state['ingested'] += 1
+            time.sleep(0.01)
+
+    rng = random.Random(5)
+    queries = []
+    for i in range(n):
+        a = corpus[rng.randrange(len(corpus))]
+        kind = i % 4
+        if kind == 0:
+            queries.append({'src_ip': a['src_ip'], 'limit': 100})
+        elif kind == 1:
+            queries.append({'sid': a['sid'], 'limit': 100})
+        elif kind == 2:
+            queries.append({'node': "rp8", 'sid': a['sid'], 'start': time.time() - 5, 'limit': 50})
+        else:
+            queries.append({'dst_ip': a['dst_ip'], 'category': a['classification'],
+                            'cursor': state['seq'] - retained // 2, 'limit': 100})
+
+    writer = threading.Thread(target=ingest, daemon=True)
+    writer.start()
+    latencies = []
+    started = time.perf_counter()
+    for q in queries:
+        t = time.perf_counter()
+        index.query(**q)
+        latencies.append(time.perf_counter() - t)
+    seconds = time.perf_counter() - started
+    stop.set()
+    writer.join()
+
+    latencies.sort()
+    return n, seconds, {
+        'retained': len(index),
+        'ingest_per_sec': round(state['ingested'] / seconds),
+        'p50_us': round(latencies[len(latencies) // 2] * 1e6, 1),
+        'p99_us': round(latencies[int(len(latencies) * 0.99)] * 1e6, 1),
+        'max_ms': round(latencies[-1] * 1000, 2),
+    }
+
+
+@benchmark("eve_analytics", size=200000)
+def bench_eve_analytics(n):
+    """Chunked batch analytics over an eve.json file (half alerts, half flows)"""
+    import tempfile
+    from eve_analytics import analyze
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as f:
+        f.write("\n".join(corpus_eve_json(n)) + "\n")
+        path = f.name
+    try:
+        analytics, seconds = analyze([path], chunk_bytes=8 * 1024 * 1024)
+        return n, seconds, {
+            'alerts': analytics.totals['alerts'],
+            'mb_per_sec': round(analytics.totals['bytes'] / 1048576 / seconds, 1),
+        }
+    finally:
+        os.unlink(path)
+
+
+@benchmark("incident_coalesce", size=200000)
+def bench_incident_coalesce(n):
+    """Fold alerts into incidents, expiring quiet ones every 1000 alerts"""
+    from incidents import IncidentCoalescer
+    coalescer = IncidentCoalescer(window=1.0, max_alerts=1000, max_seconds=10)
+    alerts = parsed_alerts(min(n, 20000))
+    base = time.time()
+    started = time.perf_counter()
+    for i in range(n):
+        now = base + i * 0.001
+        coalescer.add(alerts[i % len(alerts)], now)
+        if i % 1000 == 0:
+            coalescer.expire(now)
+    coalescer.flush()
+    seconds = time.perf_counter() - started
+    return n, seconds, {'alerts_per_incident': round(n / coalescer.stats['incidents'], 1)}
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_case(name, scale, repeat):
+    """Run one case `repeat` times and keep the fastest run"""
+    func, size = BENCHMARKS[name]
+    n = max(1, int(size * scale))
+    best = None
+    for _ in range(repeat):
+        ops, seconds, *extra = func(n)
+        rate = ops / seconds if seconds > 0 else float('inf')
+        if best is None or rate > best['ops_per_sec']:
+            best = {'operations': ops, 'seconds': round(seconds, 6), 'ops_per_sec': round(rate, 1),
+                    'usec_per_op': round(seconds / ops * 1e6, 3)}
+            if extra:
+                best.update(extra[0])
+    return best
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return the list of cases that regressed below the stored baseline"""
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        floor = expected * (1 - tolerance)
+        result['baseline_ops_per_sec'] = expected
+        result['regressed'] = result['ops_per_sec'] < floor
+        if result['regressed']:
+            regressions.append((name, result['ops_per_sec'], floor))
+    return regressions
+
+
+def main():
+    """Run selected benchmarks, emit JSON and enforce regression thresholds"""
+    parser = argparse.ArgumentParser(description="BFT-IDS microbenchmarks")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Run only these cases")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply corpus sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case (fastest is kept)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE), help="Baseline ops/sec file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed fractional drop below baseline")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store this run's throughput as the new baseline")
+    args = parser.parse_args()
+
+    names = args.only or list(BENCHMARKS)
+    results = {}
+    print(f"{'BENCHMARK':<32} {'OPS':>10} {'OPS/SEC':>14} {'USEC/OP':>10}")
+    print("-" * 70)
+    for name in names:
+        result = run_case(name, args.scale, args.repeat)
+        results[name] = result
+        print(f"{name:<32} {result['operations']:>10,} {result['ops_per_sec']:>14,.0f} {result['usec_per_op']:>10.2f}")
+        for key, value in result.items():
+            if key not in ('operations', 'seconds', 'ops_per_sec', 'usec_per_op'):
+                print(f"    {key:<28} {value}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'scale': args.scale,
+        'tolerance': args.tolerance,
+        'results': results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.update_baseline:
+        baseline.update({name: r['ops_per_sec'] for name, r in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline updated: {args.baseline}")
+        return 0
+
+    if regressions:
+        print("\nREGRESSIONS (below baseline minus tolerance):")
+        for name, rate, floor in regressions:
+            print(f"  ✗ {name}: {rate:,.0f} ops/sec < {floor:,.0f}")
+        return 1
+
+    print("All benchmarks within baseline tolerance.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+"""
+Byzantine IDS - Local Cluster Load Harness
+Runs the coordinator plus N honest and M Byzantine detectors on one machine,
+replays a recorded or synthetic fast.log and reports consensus performance
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import signal
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import psutil
+import requests
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_ROOT / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+from detector_virtual import parse_line  # Same message extraction as the detectors
+from rules import RuleTable
+from suricata_detector import SuricataAlertParser, SEVERITY_MAP
+from incidents import incident_message, subnet_of
+from vote_auth import generate_keys
+
+# The detectors' SID prefilter covers config/custom.rules plus harness.rules. Detectors vote
+# on the rule msg and deduplicate by it, so the synthetic events and noise lines use
+# harness-only rules (a copy of a custom.rules signature with a numbered msg) rather than
+# the six real SIDs. At most HARNESS_RULES are written per kind and line i uses rule
+# i % HARNESS_RULES, so a msg comes back only after HARNESS_RULES lines; rates above
+# HARNESS_RULES / DEDUP_SECONDS (about 1300 lines/s) would see reused ones deduplicated.
+EVENT_SID_BASE = 9100000
+NOISE_SID_BASE = 9500000
+HARNESS_RULES = 4096
+NOISE_MSG = "CUSTOM ATTACK: Scan Noise"
+FLOOD_GRACE = 10  # Seconds of --flood noise provisioned beyond the replay itself
+
+# --reload-every flips one harmless setting per component back and forth
+RELOAD_TOGGLES = {
+    'coordinator.py': ('VOTE_WINDOW', (20, 21)),
+    'detector_bft.py': ('DEDUP_SECONDS', (3, 2)),
+    'detector_virtual.py': ('DEDUP_SECONDS', (3, 2)),
+}
+CONFIG_RE = re.compile(r'\[CONFIG\] \S+ (applied|rejected).*?(?: in ([\d.]+) ms)?$')
+
+# Signatures from config/custom.rules used for synthetic traffic
+SYNTHETIC_RULES = [
+    (9000001, "CUSTOM ATTACK: Port Scan Detected", "Attempted Information Leak", 2, "TCP"),
+    (9000002, "CUSTOM ATTACK: SSH Connection Attempts", "Attempted Administrator Privilege Gain", 1, "TCP"),
+    (9000003, "CUSTOM ATTACK: HTTP Request Flood", "Attempted Denial of Service", 2, "TCP"),
+    (9000004, "CUSTOM ATTACK: Possible SYN Flood", "Attempted Denial of Service", 2, "TCP"),
+    (9000005, "CUSTOM ATTACK: ICMP Ping Sweep", "Misc activity", 3, "ICMP"),
+    (9000006, "CUSTOM ATTACK: Multiple Connection Attempts", "Attempted Information Leak", 2, "TCP"),
+]
+
+
+def event_rule(sid, msg, priority, proto):
+    """Rule text for one harness-generated signature"""
+    return (f'alert {proto.lower()} any any -> $HOME_NET any '
+            f'(msg:"{msg}"; priority:{priority}; sid:{sid}; rev:1;)\n')
+
+
+def harness_rules(lines, noise):
+    """Rules for `lines` synthetic events and `noise` --flood lines (HARNESS_RULES at most of each)"""
+    rules = []
+    for i in range(min(lines, HARNESS_RULES)):
+        _, msg, _, priority, proto = SYNTHETIC_RULES[i % len(SYNTHETIC_RULES)]
+        rules.append(event_rule(EVENT_SID_BASE + i, f"{msg} #{i:07d}", priority, proto))
+    for i in range(min(noise, HARNESS_RULES)):
+        rules.append(event_rule(NOISE_SID_BASE + i, f"{NOISE_MSG} #F{i:07d}", 5, "TCP"))
+    return "".join(rules)
+
+
+def synthetic_line(i, storm=0):
+    """
+    Build a unique fast.log line so every injected alert is a distinct event
+    (its own 5-tuple, and a harness rule no recent line shares).
+    With storm=N, N attackers sweep 192.168.1.0/24 instead: the rule message
+    repeats and only hosts and ports change, like a real scan or flood.
+    """
+    rule = i % HARNESS_RULES
+    sid, msg, classification, priority, proto = SYNTHETIC_RULES[(i if storm else rule) % len(SYNTHETIC_RULES)]
+    ts = datetime.now().strftime("%m/%d/%Y-%H:%M:%S.%f")
+    if storm:
+        src = f"10.0.0.{1 + (i // len(SYNTHETIC_RULES)) % storm}"
+        return (f"{ts}  [**] [1:{sid}:1] {msg} [**] "
+                f"[Classification: {classification}] [Priority: {priority}] "
+                f"{{{proto}}} {src}:{40000 + i % 20000} -> 192.168.1.{1 + i % 254}:{1 + i % 1024}\n")
+    src = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+    return (f"{ts}  [**] [1:{EVENT_SID_BASE + rule}:1] {msg} #{rule:07d} [**] "
+            f"[Classification: {classification}] [Priority: {priority}] "
+            f"{{{proto}}} {src}:{40000 + i % 20000} -> 192.168.1.237:22\n")
+
+
+def noise_line(i):
+    """Unique INFO-priority scan alert for --flood (every detector votes on it)"""
+    ts = datetime.now().strftime("%m/%d/%Y-%H:%M:%S.%f")
+    src = f"172.{16 + (i >> 16) % 16}.{(i >> 8) & 255}.{i & 255}"
+    rule = i % HARNESS_RULES
+    return (f"{ts}  [**] [1:{NOISE_SID_BASE + rule}:1] {NOISE_MSG} #F{rule:07d} [**] "
+            f"[Classification: Not Suspicious Traffic] [Priority: 5] "
+            f"{{TCP}} {src}:{40000 + i % 20000} -> 192.168.1.237:80\n")
+
+
+def line_severity(line):
+    alert = SuricataAlertParser.parse_fast_log(line)
+    return SEVERITY_MAP.get(alert['priority'], "INFO") if alert else "INFO"
+
+
+def expected_message(line, coalesce, rules):
+    """Vote message the detectors will use for a line (incident message when coalescing)"""
+    if not coalesce:
+        rule = rules.match(line)
+        return rule['msg'] if rule and rule['msg'] else parse_line(line)
+    alert = SuricataAlertParser.parse_fast_log(line)
+    return incident_message(dict(alert, dst_net=subnet_of(alert['dst_ip'])))
+
+
+def recorded_lines(path):
+    """Yield lines from a recorded fast.log forever"""
+    while True:
+        with open(path, 'r', errors='replace') as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[k]
+
+
+class Cluster:
+    """Coordinator, detectors and forwarder running as local processes"""
+
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = Path(workdir)
+        self.fast_log = self.workdir / "fast.log"
+        self.lagging_log = self.workdir / "fast-lagging.log"  # Same lines, --lagging-detector seconds later
+        self.replica_urls = [f"http://127.0.0.1:{args.coordinator_port + i}" for i in range(args.replicas)]
+        # With replicas the watcher follows the last one, which no fault targets
+        self.coord_url = self.replica_urls[-1] if self.replica_urls else f"http://127.0.0.1:{args.coordinator_port}"
+        self.sub_urls = []
+        self.procs = {}
+        self.samples = {}
+        self.configs = {}  # name -> (CONFIG_FILE, setting, values, admin URL or None for SIGHUP)
+        self.reload_rounds = 0
+
+    def spawn(self, name, script, **env):
+        """Start one component with its own environment and log file"""
+        if self.args.reload_every and script in RELOAD_TOGGLES:
+            key, values = RELOAD_TOGGLES[script]
+            env['CONFIG_FILE'] = self.workdir / f"{name}.config.json"
+            env['CONFIG_FILE'].write_text(json.dumps({key: values[0]}))
+            url = f"http://127.0.0.1:{env['COORDINATOR_PORT']}" if 'COORDINATOR_PORT' in env else None
+            self.configs[name] = (env['CONFIG_FILE'], key, values, url)
+        full_env = dict(os.environ, PYTHONUNBUFFERED="1", **{k: str(v) for k, v in env.items()})
+        log = open(self.workdir / f"{name}.log", "w")
+        proc = subprocess.Popen([sys.executable, str(SRC_DIR / script)],
+                                env=full_env, stdout=log, stderr=subprocess.STDOUT,
+                                cwd=str(REPO_ROOT))
+        self.procs[name] = proc
+        self.samples[name] = {'rss_peak': 0, 'cpu_samples': []}
+
+    def start(self):
+        """Bring up the coordinator first, then detectors and the forwarder"""
+        self.fast_log.touch()
+        self.lagging_log.touch()
+        rules = self.workdir / "harness.rules"
+        noise = int(self.args.flood * (self.args.lines / self.args.rate + FLOOD_GRACE))
+        rules.write_text(harness_rules(0 if self.args.log or self.args.storm else self.args.lines, noise))
+        self.noise_lines = noise
+        self.rules = RuleTable([REPO_ROOT / 'config' / 'custom.rules', rules])
+        detector_env = {'COALESCE_WINDOW': self.args.coalesce_window, 'SEND_QUEUE': self.args.send_queue,
+                        'RULES_FILES': f"{REPO_ROOT / 'config' / 'custom.rules'},{rules}"}
+        window = {'VOTE_WINDOW_MODE': self.args.vote_window_mode, 'ADMISSION': self.args.admission}
+        subs = [f"sub-{k + 1}" for k in range(self.args.subcoordinators)]
+        replicas = [f"replica-{i}" for i in range(self.args.replicas)]
+        auth = {}
+        if replicas:
+            # Replicas sign their agreement messages whether or not votes are authenticated
+            generate_keys(self.workdir / "keys", replicas)
+        if self.args.auth:
+            # Every node (Byzantine ones included) holds a trusted key
+            names = ["coordinator"] + subs + [f"honest-{i + 1}" for i in range(self.args.honest)] \
+                + [f"byzantine-{i + 1}" for i in range(self.args.byzantine)]
+            generate_keys(self.workdir / "keys", names)
+            auth = {'VOTE_AUTH': "required", 'AUTH_KEYS_DIR': self.workdir / "keys"}
+        # Detectors are spread round-robin over the sub-coordinators; the root
+        # only counts a sub's votes for the detectors it was given
+        detectors = [f"honest-{i + 1}" for i in range(self.args.honest)] \
+            + [f"byzantine-{i + 1}" for i in range(self.args.byzantine)]
+        members = {sub: detectors[k::len(subs)] for k, sub in enumerate(subs)}
+        (self.workdir / "subcoordinators.json").write_text(json.dumps(members, indent=2))
+        if replicas:
+            self.start_replicas(replicas, auth)
+        else:
+            self.spawn("coordinator", "coordinator.py",
+                       COORDINATOR_PORT=self.args.coordinator_port,
+                       THRESHOLD=self.args.threshold,
+                       ALERT_STORE_DIR=self.workdir / "alert_store",
+                       SUBCOORDINATORS_FILE=self.workdir / "subcoordinators.json", **window, **auth)
+            self.wait_for_coordinator(self.coord_url)
+
+        # Two-level topology: the sub-coordinators forward vote batches to the root
+        parents = [{'COORDINATOR_URL': self.coord_url, 'COORDINATOR_KEY': "coordinator"}]
+        if replicas:
+            # Every detector sends every vote to all replicas
+            parents = [{'COORDINATOR_URL': ",".join(self.replica_urls), 'COORDINATOR_KEY': ",".join(replicas)}]
+        if subs:
+            parents = []
+            for k, sub in enumerate(subs):
+                port = self.args.coordinator_port + 1 + k
+                self.spawn(sub, "coordinator.py", COORDINATOR_PORT=port,
+                           THRESHOLD=self.args.threshold, ALERT_STORE_DIR="",
+                           COORDINATOR_ID=sub, COORDINATOR_KEY=sub, UPSTREAM_URL=self.coord_url,
+                           **window, **auth)
+                self.sub_urls.append(f"http://127.0.0.1:{port}")
+                self.wait_for_coordinator(self.sub_urls[-1])
+                parents.append({'COORDINATOR_URL': self.sub_urls[-1], 'COORDINATOR_KEY': sub})
+
+        if self.args.daemon:
+            self.start_daemon(parents, detector_env, auth)
+        else:
+            self.start_detectors(parents, detector_env, auth)
+
+        # Tailers start at end of file; give everyone time to open it
+        time.sleep(self.args.warmup)
+        for name, proc in self.procs.items():
+            if proc.poll() is not None:
+                raise RuntimeError(f"{name} exited early (see {self.workdir / name}.log)")
+
+    def start_detectors(self, parents, detector_env, auth):
+        """One detector_bft.py per honest and one detector_virtual.py per Byzantine detector"""
+        for i in range(self.args.honest):
+            lagging = self.args.lagging_detector and i == self.args.honest - 1
+            self.spawn(f"honest-{i + 1}", "detector_bft.py",
+                       NODE_ID=f"honest-{i + 1}", FAST_LOG=self.lagging_log if lagging else self.fast_log,
+                       **parents[i % len(parents)], **detector_env, **auth)
+
+        ports = []
+        for i in range(self.args.byzantine):
+            port = self.args.udp_base_port + i
+            ports.append(str(port))
+            self.spawn(f"byzantine-{i + 1}", "detector_virtual.py",
+                       NODE_ID=f"byzantine-{i + 1}", LISTEN_PORT=port,
+                       LIE_PROBABILITY=self.args.lie_probability,
+                       **parents[(self.args.honest + i) % len(parents)], **detector_env, **auth)
+        if ports:
+            self.spawn("forwarder", "log_forwarder.py", FAST_LOG=self.fast_log,
+                       FORWARD_HOST="127.0.0.1", FORWARD_PORTS=",".join(ports))
+
+    def start_daemon(self, parents, detector_env, auth):
+        """Every honest and Byzantine detector as a logical detector of one detector_daemon.py"""
+        entries = []
+        for i in range(self.args.honest + self.args.byzantine):
+            byzantine = i >= self.args.honest
+            parent = parents[i % len(parents)]
+            entries.append({
+                'node': f"byzantine-{i - self.args.honest + 1}" if byzantine else f"honest-{i + 1}",
+                'coordinator_url': parent['COORDINATOR_URL'],
+                'coordinator_key': parent['COORDINATOR_KEY'],
+                'lie_probability': self.args.lie_probability if byzantine else 0.0,
+            })
+        config = self.workdir / "detectors.json"
+        config.write_text(json.dumps(entries, indent=2))
+        self.spawn("detectors", "detector_daemon.py", FAST_LOG=self.fast_log, DETECTORS_FILE=config,
+                   **detector_env, **auth)
+
+    def detector_resources(self):
+        """CPU seconds and peak RSS of all detector-side processes, total and per logical detector"""
+        report = self.resource_report()
+        names = [n for n in report if n == "detectors" or n == "forwarder" or n.startswith(("honest-", "byzantine-"))]
+        logical = self.args.honest + self.args.byzantine
+        cpu = sum(report[n]['cpu_seconds'] or 0 for n in names)
+        rss = sum(report[n]['rss_peak_mb'] for n in names)
+        return {'processes': len(names), 'logical_detectors': logical,
+                'cpu_seconds': round(cpu, 3), 'rss_peak_mb': round(rss, 1),
+                'cpu_seconds_per_detector': round(cpu / logical, 3) if logical else None,
+                'rss_mb_per_detector': round(rss / logical, 1) if logical else None}
+
+    def start_replicas(self, names, auth):
+        """3f+1 coordinator replicas on consecutive ports"""
+        # Byzantine faults are configured at start-up; crashes happen mid-run (see crash_replica)
+        faults = {'byzantine-primary': (0, "inject"), 'byzantine-backup': (1, "equivocate"),
+                  'byzantine-viewchange': (0, "inflate")}
+        faulty, fault = faults.get(self.args.replica_fault, (None, ""))
+        for i, name in enumerate(names):
+            self.spawn(name, "coordinator.py",
+                       COORDINATOR_PORT=self.args.coordinator_port + i,
+                       THRESHOLD=self.args.threshold, ALERT_STORE_DIR="",
+                       COORDINATOR_ID=name, COORDINATOR_KEY=name,
+                       REPLICAS=",".join(self.replica_urls), REPLICA_ID=i,
+                       REPLICA_FAULT=fault if i == faulty else "", VOTE_WINDOW_MODE=self.args.vote_window_mode,
+                       **dict(auth, AUTH_KEYS_DIR=self.workdir / "keys"))
+        for url in self.replica_urls:
+            self.wait_for_coordinator(url)
+
+    def crash_replica(self):
+        """Kill the replica picked by --replica-fault"""
+        name = {'crash-primary': "replica-0", 'crash-backup': "replica-1"}[self.args.replica_fault]
+        self.procs[name].kill()
+        print(f"[HARNESS] Killed {name}")
+
+    def wait_for_coordinator(self, url, timeout=15):
+        """Poll /status until the coordinator answers"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                requests.get(f"{url}/status", timeout=0.5)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise RuntimeError("Coordinator did not start")
+
+    def sample_resources(self, stop):
+        """Sample CPU and RSS of every process once per second"""
+        handles = {name: psutil.Process(p.pid) for name, p in self.procs.items()}
+        while not stop.is_set():
+            for name, proc in handles.items():
+                try:
+                    rss = proc.memory_info().rss
+                    cpu = proc.cpu_percent(None)
+                except psutil.Error:
+                    continue
+                sample = self.samples[name]
+                sample['rss_peak'] = max(sample['rss_peak'], rss)
+                sample['cpu_samples'].append(cpu)
+                sample['cpu_times'] = proc.cpu_times()
+            stop.wait(1.0)
+
+    def resource_report(self):
+        """Per-process CPU and memory summary"""
+        report = {}
+        for name, sample in self.samples.items():
+            cpu_times = sample.get('cpu_times')
+            cpu_samples = sample['cpu_samples'][1:]  # First cpu_percent() is always 0
+            report[name] = {
+                'cpu_seconds': round(cpu_times.user + cpu_times.system, 3) if cpu_times else None,
+                'cpu_percent_avg': round(sum(cpu_samples) / len(cpu_samples), 1) if cpu_samples else None,
+                'cpu_percent_peak': max(cpu_samples) if cpu_samples else None,
+                'rss_peak_mb': round(sample['rss_peak'] / 1048576, 1),
+            }
+        return report
+
+    def reload_loop(self, stop):
+        """Every --reload-every seconds rewrite each component's config and reload it"""
+        while not stop.wait(self.args.reload_every):
+            self.reload_rounds += 1
+            for name, (path, key, values, url) in self.configs.items():
+                tmp = path.with_suffix(".tmp")
+                tmp.write_text(json.dumps({key: values[self.reload_rounds % 2]}))
+                os.replace(tmp, path)  # Never let a reload read a half-written file
+                if url:
+                    try:
+                        requests.post(f"{url}/admin/reload", timeout=2)
+                    except requests.RequestException:
+                        pass
+                else:
+                    self.procs[name].send_signal(signal.SIGHUP)
+
+    def reload_report(self):
+        """Reloads applied/rejected and their duration, from the components' [CONFIG] log lines"""
+        results = []
+        for name in self.configs:
+            with open(self.workdir / f"{name}.log", errors="replace") as f:
+                matches = [m for m in (CONFIG_RE.search(line.rstrip()) for line in f) if m]
+            results.extend(matches[1:])  # The first is the start-up load
+        ms = [float(m.group(2)) for m in results if m.group(2)]
+        return {'rounds': self.reload_rounds, 'components': len(self.configs),
+                'applied': sum(1 for m in results if m.group(1) == "applied"),
+                'rejected': sum(1 for m in results if m.group(1) == "rejected"),
+                'ms_p50': percentile(ms, 50), 'ms_p99': percentile(ms, 99), 'ms_max': max(ms, default=None)}
+
+    def stop(self):
+        """Terminate every process"""
+        for proc in self.procs.values():
+            proc.terminate()
+        for proc in self.procs.values():
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+class ConsensusWatcher:
+    """Polls the coordinator decision feed and matches it to injected alerts"""
+
+    def __init__(self, coord_url):
+        self.coord_url = coord_url
+        self.last_seq = 0
+        self.pending = {}      # message -> injection time, awaiting consensus
+        self.injected = set()  # every real message injected this run
+        self.latencies = []
+        self.severity = {}     # message -> severity class of the injected line
+        self.latencies_by_severity = {}
+        self.true_consensus = 0
+        self.false_consensus = 0
+        self.repeat_consensus = 0
+        self.fingerprinted = 0  # Decisions keyed by a detector fingerprint
+        self.pending_alerts = []  # Undecided alerts held by the coordinator, per poll
+        self.lock = threading.Lock()
+
+    def injected_alert(self, message, ts, severity="MEDIUM"):
+        """Record that a real alert was written to fast.log"""
+        with self.lock:
+            self.injected.add(message)
+            self.pending.setdefault(message, ts)
+            self.severity[message] = severity
+
+    def poll(self):
+        """Fetch new decisions and classify them"""
+        try:
+            resp = requests.get(f"{self.coord_url}/consensus",
+                                params={'since': self.last_seq}, timeout=2)
+            decisions = resp.json()['decisions']
+        except (requests.RequestException, ValueError, KeyError):
+            return
+        with self.lock:
+            for d in decisions:
+                self.last_seq = max(self.last_seq, d['seq'])
+                self.fingerprinted += 'fingerprint' in d
+                message = d['message']
+                if message not in self.injected:
+                    self.false_consensus += 1
+                elif message in self.pending:
+                    self.true_consensus += 1
+                    latency = d['decided_at'] - self.pending.pop(message)
+                    self.latencies.append(latency)
+                    self.latencies_by_severity.setdefault(self.severity[message], []).append(latency)
+                else:
+                    self.repeat_consensus += 1
+
+    def poll_status(self):
+        """Sample how many undecided alerts the coordinator is holding"""
+        try:
+            pending = requests.get(f"{self.coord_url}/status", timeout=2).json()['pending_alerts']
+        except (requests.RequestException, ValueError, KeyError):
+            return
+        self.pending_alerts.append(pending)
+
+    def run(self, stop, interval=0.25):
+        """Poll until stopped"""
+        while not stop.is_set():
+            self.poll()
+            self.poll_status()
+            stop.wait(interval)
+
+
+def lagging_writer(path, lines, delay, stop):
+    """Append queued (time, line) pairs to path `delay` seconds after they were written"""
+    with open(path, "a") as out:
+        while not (stop.is_set() and not lines):
+            if lines and lines[0][0] + delay <= time.time():
+                out.write(lines.popleft()[1])
+                out.flush()
+            else:
+                time.sleep(0.01)
+
+
+def flood_writer(path, watcher, rate, limit, stop):
+    """Append INFO scan noise at `rate` lines/s until stopped or `limit` lines (runs beside replay)"""
+    written, start = 0, time.time()
+    with open(path, "a") as out:
+        while not stop.is_set() and written < limit:
+            due = min(int((time.time() - start) * rate), limit)
+            lines = [noise_line(i) for i in range(written, due)]
+            if lines:
+                out.write("".join(lines))
+                out.flush()
+                now = time.time()
+                for line in lines:
+                    watcher.injected_alert(parse_line(line), now, "INFO")
+                written = due
+            time.sleep(0.01)
+
+
+def replay(cluster, watcher, args):
+    """Append lines to fast.log at the configured rate"""
+    source = recorded_lines(args.log) if args.log else None
+    crash_at = int(args.fault_at * args.lines) if args.replica_fault.startswith("crash") else None
+    written = 0
+    start = time.time()
+    lagging, done = deque(), threading.Event()
+    if args.flood:
+        threading.Thread(target=flood_writer, daemon=True,
+                         args=(cluster.fast_log, watcher, args.flood, cluster.noise_lines, done)).start()
+    if args.lagging_detector:
+        writer = threading.Thread(target=lagging_writer, daemon=True,
+                                  args=(cluster.lagging_log, lagging, args.lagging_detector, done))
+        writer.start()
+    with open(cluster.fast_log, "a") as out:
+        while written < args.lines:
+            line = next(source) if source else synthetic_line(written, args.storm)
+            out.write(line)
+            out.flush()
+            now = time.time()
+            if args.lagging_detector:
+                lagging.append((now, line))
+            if "CUSTOM ATTACK" in line:
+                watcher.injected_alert(expected_message(line, args.coalesce_window > 0, cluster.rules), now, line_severity(line))
+            written += 1
+            if written == crash_at:
+                cluster.crash_replica()
+
+            delay = start + written / args.rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+    done.set()  # The lagging writer still delivers what is queued
+    return written, time.time() - start
+
+
+def main():
+    """Run the harness and write the JSON report"""
+    parser = argparse.ArgumentParser(description="Local multi-node BFT-IDS load harness")
+    parser.add_argument("--honest", type=int, default=2, help="Honest detectors (detector_bft.py)")
+    parser.add_argument("--byzantine", type=int, default=1, help="Byzantine detectors (detector_virtual.py)")
+    parser.add_argument("--lie-probability", type=float, default=0.30)
+    parser.add_argument("--threshold", type=int, default=2, help="Votes needed for consensus")
+    parser.add_argument("--log", help="Recorded fast.log to replay (default: synthetic alerts)")
+    parser.add_argument("--rate", type=float, default=20.0, help="Lines per second written to fast.log")
+    parser.add_argument("--lines", type=int, default=200, help="Total lines to replay")
+    parser.add_argument("--storm", type=int, default=0, metavar="N",
+                        help="Synthetic scan storm from N attackers (repeated rule messages)")
+    parser.add_argument("--coalesce-window", type=float, default=0.0,
+                        help="Detector COALESCE_WINDOW in seconds (0 = one vote per alert)")
+    parser.add_argument("--subcoordinators", type=int, default=0, metavar="K",
+                        help="Put K sub-coordinators between the detectors and the root (0 = flat)")
+    parser.add_argument("--replicas", type=int, default=0, metavar="N",
+                        help="Run N coordinator replicas with PBFT ordering (N = 3f+1, 0 = single coordinator)")
+    parser.add_argument("--replica-fault", default="none",
+                        choices=["none", "crash-backup", "crash-primary", "byzantine-backup", "byzantine-primary",
+                                 "byzantine-viewchange"])
+    parser.add_argument("--fault-at", type=float, default=0.5,
+                        help="Fraction of the lines after which a crash fault is injected")
+    parser.add_argument("--vote-window-mode", default="fixed", choices=["fixed", "adaptive"],
+                        help="Coordinator VOTE_WINDOW_MODE")
+    parser.add_argument("--lagging-detector", type=float, default=0.0, metavar="SECONDS",
+                        help="The last honest detector sees every line this many seconds late")
+    parser.add_argument("--admission", default="on", choices=["on", "off"],
+                        help="Coordinator priority admission control (ADMISSION)")
+    parser.add_argument("--flood", type=float, default=0.0, metavar="RATE",
+                        help="Also write unique INFO-priority scan alerts at RATE lines/s")
+    parser.add_argument("--send-queue", default="priority", choices=["priority", "fifo"],
+                        help="Detector outbound queue order (SEND_QUEUE)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Run all detectors as logical detectors of one detector_daemon.py process")
+    parser.add_argument("--reload-every", type=float, default=0.0, metavar="SECONDS",
+                        help="Rewrite every component's CONFIG_FILE and hot-reload it this often")
+    parser.add_argument("--auth", action="store_true",
+                        help="Generate node keys and require session-MAC authenticated votes")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds to let tailers attach")
+    parser.add_argument("--drain", type=float, default=5.0, help="Seconds to wait for late consensus")
+    parser.add_argument("--coordinator-port", type=int, default=5055)
+    parser.add_argument("--udp-base-port", type=int, default=19998)
+    parser.add_argument("--report", default="harness_report.json", help="Output JSON report")
+    parser.add_argument("--keep-logs", action="store_true", help="Keep per-process logs")
+    args = parser.parse_args()
+    if args.daemon and args.lagging_detector:
+        parser.error("--daemon shares one tail between detectors and cannot lag one of them")
+    if args.reload_every and (args.daemon or args.replicas):
+        parser.error("--reload-every needs separate detector processes and an unreplicated coordinator")
+    if args.replicas and args.subcoordinators:
+        parser.error("--replicas and --subcoordinators cannot be combined")
+    if args.replica_fault != "none" and args.replicas < 4:
+        parser.error("--replica-fault needs --replicas 4 or more")
+
+    workdir = tempfile.mkdtemp(prefix="bft-harness-")
+    cluster = Cluster(args, workdir)
+    watcher = ConsensusWatcher(cluster.coord_url)
+    stop = threading.Event()
+
+    print(f"[HARNESS] {args.honest} honest + {args.byzantine} Byzantine detectors, "
+          f"{args.subcoordinators or 'no'} sub-coordinators, "
+          f"{args.replicas or 'no'} replicas (fault: {args.replica_fault}), "
+          f"threshold {args.threshold}, {args.lines} lines @ {args.rate}/s")
+    try:
+        cluster.start()
+        threads = [threading.Thread(target=cluster.sample_resources, args=(stop,), daemon=True),
+                   threading.Thread(target=watcher.run, args=(stop,), daemon=True)]
+        if args.reload_every:
+            threads.append(threading.Thread(target=cluster.reload_loop, args=(stop,), daemon=True))
+        for t in threads:
+            t.start()
+
+        written, elapsed = replay(cluster, watcher, args)
+        time.sleep(args.drain)
+        stop.set()
+        for t in threads:
+            t.join()
+        watcher.poll()
+        coord_status = requests.get(f"{cluster.coord_url}/status", timeout=2).json()
+    finally:
+        stop.set()
+        cluster.stop()
+
+    total_consensus = watcher.true_consensus + watcher.false_consensus
+    latencies_ms = [l * 1000 for l in watcher.latencies]
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'config': vars(args),
+        'lines_written': written,
+        'replay_seconds': round(elapsed, 3),
+        'injection_rate': round(written / elapsed, 1) if elapsed else None,
+        'alerts_injected': len(watcher.injected),
+        'votes_received': coord_status['votes_received'],
+        'root_vote_requests': coord_status.get('vote_requests'),
+        'rejected_nodes': coord_status.get('rejected_nodes', 0),
+        'pending_alerts_peak': max(watcher.pending_alerts, default=0),
+        'pending_alerts_avg': round(sum(watcher.pending_alerts) / len(watcher.pending_alerts), 1)
+        if watcher.pending_alerts else 0,
+        'expired_alerts': coord_status.get('expired_alerts', 0),
+        'adaptive_window': coord_status.get('adaptive_window'),
+        'replication': coord_status.get('replication'),
+        'auth_failures': coord_status.get('auth_failures', 0),
+        # One vote per alert per detector is the uncoalesced, undeduplicated cost
+        'votes_per_line': round(coord_status['votes_received'] / (written * (args.honest + args.byzantine)), 4),
+        'incidents_decided': coord_status.get('incidents_decided', 0),
+        'incident_alerts': coord_status.get('incident_alerts', 0),
+        'votes_per_second': round(coord_status['votes_received'] / (elapsed + args.drain), 1),
+        'consensus': {
+            'true': watcher.true_consensus,
+            'false': watcher.false_consensus,
+            'repeat': watcher.repeat_consensus,
+            'missed': len(watcher.pending),
+            'fingerprinted': watcher.fingerprinted,
+            'false_consensus_rate': round(watcher.false_consensus / total_consensus, 4) if total_consensus else 0.0,
+            'per_second': round(total_consensus / (elapsed + args.drain), 2),
+        },
+        'time_to_consensus_ms': {
+            'p50': percentile(latencies_ms, 50),
+            'p90': percentile(latencies_ms, 90),
+            'p99': percentile(latencies_ms, 99),
+            'max': max(latencies_ms) if latencies_ms else None,
+        },
+        'time_to_consensus_by_severity': {
+            severity: {'decided': len(lat), 'p50_ms': percentile([l * 1000 for l in lat], 50),
+                       'p99_ms': percentile([l * 1000 for l in lat], 99)}
+            for severity, lat in sorted(watcher.latencies_by_severity.items())
+        },
+        'missed_by_severity': {
+            severity: sum(1 for m in watcher.pending if watcher.severity[m] == severity)
+            for severity in sorted(set(watcher.severity[m] for m in watcher.pending))
+        },
+        'admission': coord_status.get('admission'),
+        'config_reloads': cluster.reload_report() if args.reload_every else None,
+        'processes': cluster.resource_report(),
+        'detector_resources': cluster.detector_resources(),
+    }
+
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+
+    print(json.dumps({k: report[k] for k in ('injection_rate', 'votes_per_second', 'votes_per_line', 'root_vote_requests',
+                                             'pending_alerts_peak', 'consensus', 'time_to_consensus_ms')}, indent=2))
+    print(f"[HARNESS] Report written to {args.report}")
+
+    if args.keep_logs:
+        print(f"[HARNESS] Process logs kept in {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()